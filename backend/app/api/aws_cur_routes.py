@@ -1,67 +1,62 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import List, Dict, Any
-from app.services.athena_service import athena_service
-from app.core.config import settings
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from typing import List, Dict, Any, Optional
+from app.services.athena_scheduler import AthenaQueueFullError
+from app.services.athena_service import AthenaQueryAbortedError, AthenaQueryTimeoutError, athena_service
+from app.services.aws_executor import AWSCallTimeoutError
+from app.services.cur_query_builder import MAX_LIMIT, CurQuery, cur_query_builder, trailing_days
 
 router = APIRouter()
 
-@router.get("/top-resources", response_model=List[Dict[str, Any]])
-async def get_top_resources(limit: int = 10):
-    """
-    Get the top most expensive resources from AWS CUR.
+RESULT_SOURCE_HEADER = "X-Result-Source"
+
+
+async def _run_cur_query(query: CurQuery, request: Request, response: Response) -> List[Dict[str, Any]]:
     """
-    query = f"""
-        SELECT 
-            line_item_resource_id,
-            line_item_product_code,
-            line_item_usage_type,
-            SUM(line_item_unblended_cost) as total_cost,
-            line_item_currency_code
-        FROM "{settings.AWS_ATHENA_TABLE}"
-        WHERE 
-            line_item_line_item_type = 'Usage' 
-            AND line_item_unblended_cost > 0
-            AND date_parse(line_item_usage_start_date, '%Y-%m-%d %H:%i:%s') >= date_add('day', -30, current_date)
-        GROUP BY 
-            line_item_resource_id, 
-            line_item_product_code, 
-            line_item_usage_type,
-            line_item_currency_code
-        ORDER BY total_cost DESC
-        LIMIT {limit}
+    Runs a CUR query through the result cache and reports in the
+    X-Result-Source header whether the rows came from the local cache, an
+    Athena result reuse or a fresh execution.
     """
-    
     try:
-        execution_id = athena_service.execute_query(query)
-        results = athena_service.get_query_results(execution_id)
-        return results
+        rows, source = await athena_service.run_cached_query(
+            query.sql, query.parameters, is_disconnected=request.is_disconnected
+        )
+    except AthenaQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except AthenaQueryAbortedError as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except (AthenaQueryTimeoutError, AWSCallTimeoutError) as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    response.headers[RESULT_SOURCE_HEADER] = source
+    return rows
+
+@router.get("/top-resources", response_model=List[Dict[str, Any]])
+async def get_top_resources(
+    request: Request,
+    response: Response,
+    limit: int = Query(10, ge=1, le=MAX_LIMIT),
+    days: int = Query(30, ge=1, le=366, description="Number of trailing days to include"),
+    product_code: Optional[str] = Query(None, description="e.g. AmazonEC2")
+):
+    """
+    Get the top most expensive resources from AWS CUR.
+    """
+    start, end = trailing_days(days)
+    query = cur_query_builder.top_resources(start, end, limit=limit, product_code=product_code)
+    return await _run_cur_query(query, request, response)
 
 @router.get("/usage-by-operation", response_model=List[Dict[str, Any]])
-async def get_usage_by_operation(limit: int = 10):
+async def get_usage_by_operation(
+    request: Request,
+    response: Response,
+    limit: int = Query(10, ge=1, le=MAX_LIMIT),
+    days: int = Query(30, ge=1, le=366, description="Number of trailing days to include"),
+    product_code: Optional[str] = Query(None, description="e.g. AmazonEC2")
+):
     """
     Get cost breakdown by operation (e.g., RunInstances, PutObject).
     """
-    query = f"""
-        SELECT 
-            line_item_operation,
-            line_item_product_code,
-            SUM(line_item_unblended_cost) as total_cost
-        FROM "{settings.AWS_ATHENA_TABLE}"
-        WHERE 
-            line_item_line_item_type = 'Usage'
-            AND date_parse(line_item_usage_start_date, '%Y-%m-%d %H:%i:%s') >= date_add('day', -30, current_date)
-        GROUP BY 
-            line_item_operation,
-            line_item_product_code
-        ORDER BY total_cost DESC
-        LIMIT {limit}
-    """
-    
-    try:
-        execution_id = athena_service.execute_query(query)
-        results = athena_service.get_query_results(execution_id)
-        return results
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    start, end = trailing_days(days)
+    query = cur_query_builder.usage_by_operation(start, end, limit=limit, product_code=product_code)
+    return await _run_cur_query(query, request, response)
@@ -1,13 +1,13 @@
 """API routes for Azure cost management."""
 import os
-from typing import List
-from datetime import date
+from datetime import date, timedelta
 from fastapi import APIRouter, HTTPException, Query
-from azure.identity import ClientSecretCredential
-from azure.mgmt.costmanagement import CostManagementClient
-from azure.mgmt.costmanagement.models import QueryDefinition, GranularityType, QueryTimePeriod
 from azure.core.exceptions import ClientAuthenticationError
 from app.api.azure_models import AzureCostResponse, ResourceGroupCost
+from app.services.client_registry import client_registry
+from app.services.azure_query_planner import UsageColumnsError, azure_query_planner, merge_resource_groups
+from app.services.cost_store import cost_store
+from app.services.single_flight import single_flight
 
 azure_router = APIRouter()
 
@@ -62,12 +62,11 @@ async def get_azure_costs(
         )
 
     try:
-        credential = ClientSecretCredential(
+        client = client_registry.get_azure_cost_client(
             tenant_id=tenant_id,
             client_id=client_id,
             client_secret=client_secret
         )
-        client = CostManagementClient(credential, subscription_id)
     except ClientAuthenticationError as exc:
         raise HTTPException(
             status_code=401,
@@ -79,74 +78,64 @@ async def get_azure_costs(
             detail=f"Failed to initialize Azure client: {exc}"
         ) from exc
 
+    scope = f"/subscriptions/{subscription_id}"
+    # Azure treats the end of the time period as inclusive
+    range_end = end_date + timedelta(days=1)
+
+    async def fetch_range(fetch_start: date, fetch_end: date) -> None:
+        writer = cost_store.writer('azure', subscription_id, fetch_start, fetch_end)
+        windows = azure_query_planner.iter_windows(client, scope, fetch_start, fetch_end)
+        try:
+            # Each window is staged as it arrives; the days are replaced once all are in
+            async for rows in windows:
+                await azure_query_planner.run(writer.add, rows)
+            await azure_query_planner.run(writer.commit)
+        except BaseException:  # including cancellation
+            azure_query_planner.submit(writer.discard)
+            raise
+        finally:
+            await windows.aclose()
+
+    def merge_stored():
+        return merge_resource_groups(cost_store.iter_rows('azure', subscription_id, start_date, range_end))
+
     try:
-        scope = f"/subscriptions/{subscription_id}"
-        query_definition = QueryDefinition(
-            type="ActualCost",
-            timeframe="Custom",
-            time_period=QueryTimePeriod(
-                from_property=start_date.isoformat(),
-                to=end_date.isoformat()
-            ),
-            dataset={
-                "granularity": GranularityType.DAILY,
-                "aggregation": {
-                    "totalCost": {
-                        "name": "Cost",
-                        "function": "Sum"
-                    }
-                },
-                "grouping": [
-                    {
-                        "type": "Dimension",
-                        "name": "ResourceGroupName"
-                    }
-                ]
-            }
+        # Only days that are missing or not yet settled go to Cost Management,
+        # and identical concurrent requests share one fetch per range. The
+        # SQLite store blocks, so it is used from the planner's threads.
+        missing = await azure_query_planner.run(
+            cost_store.missing_ranges, 'azure', subscription_id, start_date, range_end
         )
-        response = client.query.usage(scope=scope, parameters=query_definition)
-        
-        total_cost = 0.0
-        costs_by_resource_group: List[ResourceGroupCost] = []
-        currency = "USD"  # Default to USD
-        
-        time_period_start = start_date.isoformat()
-        time_period_end = end_date.isoformat()
+        for fetch_start, fetch_end in missing:
+            await single_flight.do(
+                ('azure-usage', subscription_id, fetch_start, fetch_end),
+                lambda start=fetch_start, end=fetch_end: fetch_range(start, end)
+            )
 
-        if response and response.rows:
-            # Assuming the currency is in the 3rd column (index 2)
-            currency_column_index = 2
-            cost_column_index = 0
-            resource_group_column_index = 1
-            
-            # Get currency from the first row if available
-            if len(response.rows[0]) > currency_column_index:
-                currency = response.rows[0][currency_column_index]
+        amounts_by_resource_group, total_cost, currency = await azure_query_planner.run(merge_stored)
+
+        costs_by_resource_group = [
+            ResourceGroupCost(resource_group=resource_group, amount=amount, currency=currency)
+            for resource_group, amount in sorted(
+                amounts_by_resource_group.items(), key=lambda item: item[1], reverse=True)
+        ]
 
-            for row in response.rows:
-                amount = float(row[cost_column_index])  # Cost value
-                resource_group = row[resource_group_column_index]  # ResourceGroupName
-                if amount > 0:
-                    total_cost += amount
-                    costs_by_resource_group.append(
-                        ResourceGroupCost(
-                            resource_group=resource_group or "Unassigned",
-                            amount=amount,
-                            currency=currency
-                        )
-                    )
-        
         return AzureCostResponse(
             start_date=start_date,
             end_date=end_date,
             total_cost=total_cost,
             currency=currency,
             costs_by_resource_group=costs_by_resource_group,
-            time_period_start=time_period_start,
-            time_period_end=time_period_end
+            time_period_start=start_date.isoformat(),
+            time_period_end=end_date.isoformat()
         )
     except HTTPException as exc:
         raise exc
+    except UsageColumnsError as exc:
+        raise HTTPException(
+            status_code=502,
+            detail=f"Unexpected Azure Cost Management response: {exc}"
+        ) from exc
     except ClientAuthenticationError as exc:
         raise HTTPException(
             status_code=401,
@@ -1,4 +1,5 @@
 from datetime import date
+from enum import Enum
 from typing import List, Optional
 from pydantic import BaseModel, field_validator
 
@@ -19,6 +20,15 @@ class ServiceCost(BaseModel):
     amount: float
     currency: str
 
+class CostAggregation(str, Enum):
+    SERVICE = "service"
+    DAILY = "daily"
+
+class DailyCost(BaseModel):
+    date: str
+    total_cost: float
+    costs_by_service: List[ServiceCost]
+
 class CostResponse(BaseModel):
     start_date: date
     end_date: date
@@ -27,3 +37,4 @@ class CostResponse(BaseModel):
     costs_by_service: List[ServiceCost]
     time_period_start: Optional[str]
     time_period_end: Optional[str]
+    daily_costs: Optional[List[DailyCost]] = None
@@ -1,18 +1,25 @@
 """API routes for cost recommendations."""
+import asyncio
+import json
 import os
 import sys
+import time
 import traceback
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-import torch
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
-MODEL_PATH = os.getenv("RECOMMENDER_MODEL_PATH", "../../nlp/model")
-# Resolve to absolute path to avoid HFValidationError with relative paths
-if not os.path.isabs(MODEL_PATH):
-    MODEL_PATH = os.path.abspath(MODEL_PATH)
+from app.core import metrics
+from app.core.config import settings
+from app.services.generation_streaming import GenerationStreamer
+from app.services.inference_batcher import InferenceBatcher
+from app.services.model_manager import LOADING, MODEL_PATH, model_manager
+from app.services.recommendation_cache import recommendation_cache
+from app.services.recommendation_rules import RuleMatch, recommendation_rules
+from app.services.recommender import (DEFAULT_INPUT_MAX_LENGTH, DEFAULT_MAX_LENGTH, Recommender, cost_data_to_text,
+                                      model_input)
 
 
 class RecommendationRequest(BaseModel):
@@ -25,88 +32,367 @@ class RecommendationResponse(BaseModel):
     """Response model for recommendation endpoint."""
 
     recommendation: str
+    # What answered: "rules", "cache", "model" or "mock"
+    source: str = "model"
+    # How sure the rules are; None for generated text
+    confidence: Optional[float] = None
+
+
+class BatchRecommendationRequest(BaseModel):
+    """Request model for the batch recommendation endpoint."""
+
+    cost_data: List[Dict[str, Any]] = Field(..., min_length=1, max_length=1000)
+
+
+class BatchRecommendationResponse(BaseModel):
+    """Recommendations in the same order as the request's cost_data."""
+
+    recommendations: List[str]
+    sources: List[str]
+    confidences: List[Optional[float]]
 
 
 router = APIRouter()
 
-# Load model and tokenizer once at startup
-try:
-    if os.path.exists(MODEL_PATH) and os.listdir(MODEL_PATH):
-         TOKENIZER = AutoTokenizer.from_pretrained(MODEL_PATH)
-         MODEL = AutoModelForSeq2SeqLM.from_pretrained(MODEL_PATH)
-         DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-         MODEL = MODEL.to(DEVICE)
+
+# Shared with the offline scripts in nlp/recommend.py
+preprocess_cost_data = cost_data_to_text
+
+# Part of the recommendation cache key: changing them must not serve old text
+GENERATION_SETTINGS = {"input_max_length": DEFAULT_INPUT_MAX_LENGTH, "max_length": DEFAULT_MAX_LENGTH}
+
+
+def model_version() -> str:
+    """Identifies the loaded model for the recommendation cache key."""
+    if settings.RECOMMENDER_MODEL_VERSION:
+        return settings.RECOMMENDER_MODEL_VERSION
+    config_path = os.path.join(MODEL_PATH, "config.json")
+    modified = os.path.getmtime(config_path) if os.path.exists(config_path) else 0
+    return f"{MODEL_PATH}@{modified:.0f}"
+
+
+def canonical_input(cost_data: Dict[str, Any]) -> str:
+    """
+    The model input for cost_data with keys sorted and numbers bucketed.
+    Both the cache key and generation use it, so a cached recommendation
+    depends only on its key, not on which request in the bucket came first.
+    """
+    return model_input(cost_data, settings.RECOMMENDER_CACHE_SIGNIFICANT_DIGITS)
+
+
+def cache_key(cost_data: Dict[str, Any]) -> str:
+    # Quantized and exported models may word things differently from fp32
+    generation = {**GENERATION_SETTINGS, "backend": model_manager.backend}
+    return recommendation_cache.key(canonical_input(cost_data), model_version(), generation)
+
+
+def rule_recommendation(cost_data: Dict[str, Any]) -> Optional[RuleMatch]:
+    """The keyword rules' answer, when they are enabled and cover the whole input."""
+    if not settings.RECOMMENDER_RULES_ENABLED:
+        return None
+    return recommendation_rules.match(cost_data)
+
+
+def _answer(recommendation: str, source: str, confidence: Optional[float] = None) -> Dict[str, Any]:
+    return {"recommendation": recommendation, "source": source, "confidence": confidence}
+
+
+def current_recommender() -> Recommender:
+    """The in-process model as a Recommender with the API's generation settings."""
+    return Recommender(model_manager.model, model_manager.tokenizer, model_manager.device,
+                       significant_digits=settings.RECOMMENDER_CACHE_SIGNIFICANT_DIGITS, **GENERATION_SETTINGS)
+
+
+def generate_recommendations(input_texts: List[str]) -> List[str]:
+    """Runs one padded, batched generate call over the preprocessed inputs."""
+    if model_manager.pool is not None:
+        return model_manager.pool.submit(input_texts, **GENERATION_SETTINGS).result()
+    return current_recommender().generate(input_texts)
+
+
+# Concurrent requests share forward passes instead of competing for CPU cores
+recommendation_batcher = InferenceBatcher(
+    generate_recommendations,
+    max_batch_size=settings.RECOMMENDER_BATCH_MAX_SIZE,
+    max_wait_ms=settings.RECOMMENDER_BATCH_WAIT_MS,
+    name="recommendation-batcher",
+    # One batch in flight per worker process
+    workers=max(1, settings.RECOMMENDER_WORKERS)
+)
+metrics.register("recommendation_batcher", recommendation_batcher.stats)
+
+# Streamed generations run one input at a time beside the batcher
+recommendation_streamer = GenerationStreamer(settings.RECOMMENDER_STREAM_MAX_CONCURRENT,
+                                             name="recommendation-stream")
+metrics.register("recommendation_streams", recommendation_streamer.stats)
+
+
+def length_sorted_chunks(texts: List[str], chunk_size: int) -> List[List[int]]:
+    """
+    Groups input positions into chunks of similar length, so each padded
+    batch wastes little compute on padding. Character length is used as a
+    cheap stand-in for token count.
+    """
+    order = sorted(range(len(texts)), key=lambda index: len(texts[index]))
+    return [order[start:start + chunk_size] for start in range(0, len(order), chunk_size)]
+
+
+def mock_recommendation(input_text: str) -> str:
+    """Returns a canned recommendation for when the model is not loaded."""
+    mock_recommendations = [
+        "Consider using Reserved Instances for EC2 to save up to 75% on compute costs.",
+        "Switch to spot instances for non-critical workloads to reduce costs by 70-90%.",
+        "Move infrequently accessed S3 data to Glacier storage class for 80% savings.",
+        "Right-size your RDS instances based on actual usage patterns.",
+        "Enable auto-scaling to optimize resource utilization and reduce costs."
+    ]
+    # Simple mock logic based on input
+    if "ec2" in input_text.lower() or "compute" in input_text.lower():
+        return mock_recommendations[0]
+    elif "s3" in input_text.lower() or "storage" in input_text.lower():
+        return mock_recommendations[2]
+    elif "rds" in input_text.lower() or "database" in input_text.lower():
+        return mock_recommendations[3]
     else:
-         print(f"[WARNING] Model directory {MODEL_PATH} not found or empty. Skipping model load.", file=sys.stderr)
-         TOKENIZER = None
-         MODEL = None
-         DEVICE = None
-except Exception as e:
-    print(f"[ERROR] Failed to load recommendation model: {e}", file=sys.stderr)
-    TOKENIZER = None
-    MODEL = None
-    DEVICE = None
-
-
-def preprocess_cost_data(cost_data: Dict[str, Any]) -> str:
-    """Preprocesses cost data into a string for the model."""
-    # Simple preprocessing: extract high-cost services/resources
-    # (You can improve this logic as needed)
-    if not isinstance(cost_data, dict):
-        return str(cost_data)
-    items = []
-    for k, v in cost_data.items():
-        if isinstance(v, (int, float)) and v > 0:
-            items.append(f"{k}: {v}")
-        elif isinstance(v, str):
-            items.append(f"{k}: {v}")
-    return ", ".join(items)
+        return mock_recommendations[4]
 
 
-@router.post("/recommendations", response_model=RecommendationResponse)
-def get_recommendation(request: RecommendationRequest):
-    """Generates a cost optimization recommendation."""
+def _use_mock_recommendations() -> bool:
+    """
+    Whether to fall back to canned answers. Without mock data, raises 503
+    while the model is still loading and 500 if it could not be loaded.
+    """
+    if model_manager.ready:
+        return False
     # Check if mock data is enabled
-    use_mock_data = os.getenv('USE_MOCK_DATA', 'false').lower() == 'true'
-
-    if MODEL is None or TOKENIZER is None:
-        if use_mock_data:
-            # Return mock recommendation when model is not loaded
-            input_text = preprocess_cost_data(request.cost_data)
-            mock_recommendations = [
-                "Consider using Reserved Instances for EC2 to save up to 75% on compute costs.",
-                "Switch to spot instances for non-critical workloads to reduce costs by 70-90%.",
-                "Move infrequently accessed S3 data to Glacier storage class for 80% savings.",
-                "Right-size your RDS instances based on actual usage patterns.",
-                "Enable auto-scaling to optimize resource utilization and reduce costs."
-            ]
-            # Simple mock logic based on input
-            if "ec2" in input_text.lower() or "compute" in input_text.lower():
-                return {"recommendation": mock_recommendations[0]}
-            elif "s3" in input_text.lower() or "storage" in input_text.lower():
-                return {"recommendation": mock_recommendations[2]}
-            elif "rds" in input_text.lower() or "database" in input_text.lower():
-                return {"recommendation": mock_recommendations[3]}
-            else:
-                return {"recommendation": mock_recommendations[4]}
+    if os.getenv('USE_MOCK_DATA', 'false').lower() == 'true':
+        return True
+    if model_manager.state == LOADING:
         raise HTTPException(
-            status_code=500, detail="Recommendation model not loaded."
+            status_code=503, detail="Recommendation model is still loading.",
+            headers={"Retry-After": "5"}
         )
+    raise HTTPException(
+        status_code=500, detail="Recommendation model not loaded."
+    )
+
+
+@router.post("/recommendations", response_model=RecommendationResponse)
+async def get_recommendation(request: RecommendationRequest):
+    """Generates a cost optimization recommendation."""
+    match = rule_recommendation(request.cost_data)
+    if match is not None:
+        return _answer(match.recommendation, "rules", match.confidence)
+    if _use_mock_recommendations():
+        # Return mock recommendation when model is not loaded
+        return _answer(mock_recommendation(preprocess_cost_data(request.cost_data)), "mock")
+    key = cache_key(request.cost_data)
+    rec = recommendation_cache.get(key)
+    if rec is not None:
+        return _answer(rec, "cache")
     try:
-        input_text = preprocess_cost_data(request.cost_data)
-        inputs = TOKENIZER(
-            [input_text],
-            return_tensors="pt",
-            padding=True,
-            truncation=True,
-            max_length=64,
-        )
-        inputs = {k: v.to(DEVICE) for k, v in inputs.items()}
-        summary_ids = MODEL.generate(**inputs, max_length=32)
-        rec = TOKENIZER.decode(summary_ids[0], skip_special_tokens=True)
-        return {"recommendation": rec}
+        input_text = canonical_input(request.cost_data)
+        started = time.perf_counter()
+        rec = await recommendation_batcher.run(input_text)
+        recommendation_cache.set(key, rec, time.perf_counter() - started)
+        return _answer(rec, "model")
     except Exception as exc:
         print(f"[ERROR] Model inference failed: {traceback.format_exc()}", file=sys.stderr)
         raise HTTPException(
             status_code=500, detail="Failed to generate recommendation."
         ) from exc
+
+
+@router.post("/recommendations/batch", response_model=BatchRecommendationResponse)
+async def get_batch_recommendations(
+    request: BatchRecommendationRequest,
+    stream: bool = Query(False, description="Stream one NDJSON line per recommendation as chunks finish")
+):
+    """
+    Generates recommendations for many cost_data objects at once.
+
+    Inputs the rules or the cache can answer are answered straight away;
+    the rest are sorted by length and generated in chunks of
+    RECOMMENDER_BATCH_CHUNK_SIZE. The plain response keeps request order;
+    the streamed one emits {"index", "recommendation", "source",
+    "confidence"} lines as results become available, rule and cached ones
+    first, so the order is not the request order.
+    """
+    input_texts = [canonical_input(cost_data) for cost_data in request.cost_data]
+    answers: List[Optional[Dict[str, Any]]] = []
+    for cost_data in request.cost_data:
+        match = rule_recommendation(cost_data)
+        answers.append(None if match is None else _answer(match.recommendation, "rules", match.confidence))
+    unanswered = [index for index, answer in enumerate(answers) if answer is None]
+    if unanswered and _use_mock_recommendations():
+        for index in unanswered:
+            answers[index] = _answer(mock_recommendation(preprocess_cost_data(request.cost_data[index])), "mock")
+        unanswered = []
+
+    keys: List[Optional[str]] = [None] * len(answers)
+    for index in unanswered:
+        keys[index] = cache_key(request.cost_data[index])
+        rec = recommendation_cache.get(keys[index])
+        if rec is not None:
+            answers[index] = _answer(rec, "cache")
+    misses = [index for index in unanswered if answers[index] is None]
+    chunks = [
+        [misses[position] for position in chunk]
+        for chunk in length_sorted_chunks([input_texts[index] for index in misses],
+                                          settings.RECOMMENDER_BATCH_CHUNK_SIZE)
+    ]
+    # Chunks queue on the batcher's workers (one per inference process) behind
+    # any single requests, which run first: an interactive request arriving
+    # mid-batch waits for at most the chunk in progress
+    pending = [
+        asyncio.wrap_future(recommendation_batcher.submit_batch([input_texts[index] for index in chunk]))
+        for chunk in chunks
+    ]
+    results = _chunk_results(chunks, pending, keys)
+    if stream:
+        answered = [(index, answer) for index, answer in enumerate(answers) if answer is not None]
+        return StreamingResponse(_stream_results(answered, results), media_type="application/x-ndjson")
+
+    try:
+        async for chunk, chunk_results in results:
+            if isinstance(chunk_results, Exception):
+                raise HTTPException(
+                    status_code=500, detail="Failed to generate recommendation."
+                ) from chunk_results
+            for index, recommendation in zip(chunk, chunk_results):
+                answers[index] = _answer(recommendation, "model")
+    finally:
+        await results.aclose()
+    return {
+        "recommendations": [answer["recommendation"] for answer in answers],
+        "sources": [answer["source"] for answer in answers],
+        "confidences": [answer["confidence"] for answer in answers],
+    }
+
+
+async def _chunk_results(chunks: List[List[int]], pending: List["asyncio.Future[List[str]]"],
+                         keys: List[Optional[str]]) -> AsyncIterator[Tuple[List[int], Any]]:
+    """
+    Yields each chunk with its recommendations, or the exception it failed
+    with, and caches the results. With a single worker chunks finish in
+    order, so the time since the previous chunk finished is this chunk's
+    generation time; with several it is an underestimate.
+    """
+    previous = time.perf_counter()
+    try:
+        for chunk, future in zip(chunks, pending):
+            try:
+                chunk_results = await future
+            except Exception as exc:  # pylint: disable=broad-except
+                print(f"[ERROR] Batch inference failed: {traceback.format_exc()}", file=sys.stderr)
+                previous = time.perf_counter()
+                yield chunk, exc
+                continue
+            finished = time.perf_counter()
+            for index, recommendation in zip(chunk, chunk_results):
+                recommendation_cache.set(keys[index], recommendation, (finished - previous) / len(chunk))
+            previous = finished
+            yield chunk, chunk_results
+    finally:
+        # Drop chunks that have not started if the caller went away
+        for future in pending:
+            future.cancel()
+
+
+async def _stream_results(answered: List[Tuple[int, Dict[str, Any]]],
+                          results: AsyncIterator[Tuple[List[int], Any]]) -> AsyncIterator[str]:
+    for index, answer in answered:
+        yield json.dumps({"index": index, **answer}) + "\n"
+    async for chunk, chunk_results in results:
+        if isinstance(chunk_results, Exception):
+            # The status line is already sent; report the failure per item
+            for index in chunk:
+                yield json.dumps({"index": index, "error": "Failed to generate recommendation."}) + "\n"
+            continue
+        for index, recommendation in zip(chunk, chunk_results):
+            yield json.dumps({"index": index, **_answer(recommendation, "model")}) + "\n"
+
+
+@router.get("/recommendations/stream")
+async def stream_recommendation_get(
+    cost_data: str = Query(..., description='cost_data as a JSON object, e.g. {"EC2": "high usage"}')
+):
+    """Streams a recommendation as Server-Sent Events; see the POST variant."""
+    try:
+        parsed = json.loads(cost_data)
+    except json.JSONDecodeError as exc:
+        raise HTTPException(status_code=422, detail=f"cost_data is not valid JSON: {exc}") from exc
+    if not isinstance(parsed, dict):
+        raise HTTPException(status_code=422, detail="cost_data must be a JSON object")
+    return _sse_response(parsed)
+
+
+@router.post("/recommendations/stream")
+async def stream_recommendation(request: RecommendationRequest):
+    """
+    Streams a recommendation as Server-Sent Events while it is generated:
+    "token" events carry {"text"} as each word is decoded, then one "done"
+    event carries the whole {"recommendation", "source", "confidence"}, or
+    an "error" event {"detail"} if generation fails. Generation stops when
+    the client disconnects. Rule, cached and mock answers arrive as a single
+    token.
+    """
+    return _sse_response(request.cost_data)
+
+
+def _sse_response(cost_data: Dict[str, Any]) -> StreamingResponse:
+    match = rule_recommendation(cost_data)
+    # Raised here, the model's 503/500 still reach the client as a status code
+    use_mock = match is None and _use_mock_recommendations()
+    return StreamingResponse(
+        _recommendation_events(cost_data, match, use_mock),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _recommendation_events(cost_data: Dict[str, Any], match: Optional[RuleMatch],
+                                 use_mock: bool) -> AsyncIterator[str]:
+    input_text = canonical_input(cost_data)
+    key = None
+    answer = None
+    if match is not None:
+        answer = _answer(match.recommendation, "rules", match.confidence)
+    elif use_mock:
+        answer = _answer(mock_recommendation(preprocess_cost_data(cost_data)), "mock")
+    else:
+        key = cache_key(cost_data)
+        rec = recommendation_cache.get(key)
+        if rec is not None:
+            answer = _answer(rec, "cache")
+    if answer is not None:
+        yield _sse_event("token", {"text": answer["recommendation"]})
+        yield _sse_event("done", answer)
+        return
+
+    pieces: List[str] = []
+    started = time.perf_counter()
+    try:
+        if model_manager.pool is not None:
+            # Worker processes cannot stream words back; send the result whole
+            pieces.append(await recommendation_batcher.run(input_text))
+            yield _sse_event("token", {"text": pieces[0]})
+        else:
+            recommender = current_recommender()
+            async for piece in recommendation_streamer.stream(
+                recommender.model, recommender.tokenizer, recommender.device, input_text,
+                **recommender.generation
+            ):
+                pieces.append(piece)
+                yield _sse_event("token", {"text": piece})
+    except Exception:  # pylint: disable=broad-except
+        print(f"[ERROR] Streaming inference failed: {traceback.format_exc()}", file=sys.stderr)
+        yield _sse_event("error", {"detail": "Failed to generate recommendation."})
+        return
+    rec = "".join(pieces)
+    recommendation_cache.set(key, rec, time.perf_counter() - started)
+    yield _sse_event("done", _answer(rec, "model"))
@@ -2,14 +2,16 @@
 from datetime import date
 import os
 import logging
-from typing import List
 
 from botocore.exceptions import ClientError, NoCredentialsError
 from fastapi import APIRouter, HTTPException, Query
 
-from app.api.models import CostResponse, ServiceCost
-
-import boto3
+from app.api.models import CostAggregation, CostResponse, ServiceCost
+from app.services.aws_executor import AWSCallTimeoutError, aws_executor
+from app.services.client_registry import client_registry
+from app.services.cost_explorer import CostAggregator, iter_cost_pages, iter_cost_rows
+from app.services.cost_store import cost_store
+from app.services.single_flight import single_flight
 
 aws_router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -19,6 +21,10 @@ logger = logging.getLogger(__name__)
 async def get_aws_costs(
     start_date: date = Query(..., description="Start date"),
     end_date: date = Query(..., description="End date"),
+    aggregate: CostAggregation = Query(
+        CostAggregation.SERVICE,
+        description="Response shape: per-service totals, or totals plus a per-day breakdown"
+    ),
 ):
     """Retrieves AWS cost and usage data."""
     if end_date < start_date:
@@ -63,11 +69,11 @@ async def get_aws_costs(
         )
 
     try:
-        client = boto3.client(
+        client = client_registry.get_aws_client(
             'ce',
+            region=aws_region,
             aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            region_name=aws_region
+            aws_secret_access_key=aws_secret_access_key
         )
     except NoCredentialsError as exc:
         logger.error("Invalid AWS credentials")
@@ -82,50 +88,66 @@ async def get_aws_costs(
             detail=f"Failed to initialize AWS client: {e}"
         ) from e
 
-    try:
-        response = client.get_cost_and_usage(
+    # Stored costs are keyed by account; fall back to the access key when the
+    # account id is not configured
+    account = os.getenv('AWS_ACCOUNT_ID') or aws_access_key_id
+
+    async def fetch_range(range_start: date, range_end: date) -> None:
+        writer = cost_store.writer('aws', account, range_start, range_end)
+        pages = iter_cost_pages(
+            client,
             TimePeriod={
-                'Start': start_date.isoformat(),
-                'End': end_date.isoformat()
+                'Start': range_start.isoformat(),
+                'End': range_end.isoformat()
             },
             Granularity='DAILY',
             Metrics=['UnblendedCost'],
             GroupBy=[{'Type': 'DIMENSION', 'Key': 'SERVICE'}]
         )
-        results = response.get('ResultsByTime', [])
-        total_cost = 0.0
-        daily_costs_by_service: List[ServiceCost] = []
-        currency = 'USD'  # Default to USD as CE API typically returns costs in USD
-        
-        time_period_start = None
-        time_period_end = None
-        if results:
-            time_period_start = results[0]['TimePeriod']['Start']
-            time_period_end = results[-1]['TimePeriod']['End']
-
-        for result in results:
-            for group in result.get('Groups', []):
-                amount = float(group['Metrics']['UnblendedCost']['Amount'])
-                if amount > 0:  # Only include services with costs
-                    service_name = group['Keys'][0]
-                    total_cost += amount
-                    currency = group['Metrics']['UnblendedCost']['Unit']
-                    daily_costs_by_service.append(
-                        ServiceCost(
-                            service_name=service_name,
-                            amount=amount,
-                            currency=currency
-                        )
-                    )
+        try:
+            # Each page is staged as it arrives; the days are replaced once all are in
+            async for page in pages:
+                await aws_executor.run(writer.add, iter_cost_rows(page))
+            await aws_executor.run(writer.commit)
+        except BaseException:  # including cancellation
+            aws_executor.submit(writer.discard)
+            raise
+
+    def aggregate_stored() -> CostAggregator:
+        aggregator = CostAggregator(include_daily=aggregate == CostAggregation.DAILY)
+        for row in cost_store.iter_rows('aws', account, start_date, end_date):
+            aggregator.add(*row)
+        return aggregator
+
+    try:
+        # Only days that are missing or not yet settled go to Cost Explorer,
+        # and identical concurrent requests share one fetch per range. The
+        # SQLite store blocks, so it is used from the executor's threads.
+        missing = await aws_executor.run(cost_store.missing_ranges, 'aws', account, start_date, end_date)
+        for range_start, range_end in missing:
+            await single_flight.do(
+                ('aws-cost-explorer', account, range_start, range_end),
+                lambda start=range_start, end=range_end: fetch_range(start, end)
+            )
+
+        aggregator = await aws_executor.run(aggregate_stored)
+
         return CostResponse(
             start_date=start_date,
             end_date=end_date,
-            total_cost=total_cost,
-            currency=currency,
-            costs_by_service=daily_costs_by_service,
-            time_period_start=time_period_start,
-            time_period_end=time_period_end
+            total_cost=aggregator.total_cost,
+            currency=aggregator.currency,
+            costs_by_service=aggregator.costs_by_service(),
+            time_period_start=start_date.isoformat(),
+            time_period_end=end_date.isoformat(),
+            daily_costs=aggregator.daily_costs()
         )
+    except AWSCallTimeoutError as e:
+        logger.error("Cost Explorer request timed out: %s", e)
+        raise HTTPException(
+            status_code=504,
+            detail="AWS Cost Explorer did not respond in time. Please try again."
+        ) from e
     except ClientError as e:
         error_code = e.response['Error']['Code']
         if error_code == 'AccessDeniedException':
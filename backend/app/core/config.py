@@ -17,19 +17,70 @@ class Settings(BaseSettings):
     AWS_SECRET_ACCESS_KEY: str = os.getenv("AWS_SECRET_ACCESS_KEY", "")
     AWS_REGION: str = os.getenv("AWS_REGION", "us-east-1")
 
+    # AWS SDK execution (thread pool size doubles as the concurrency cap)
+    AWS_SDK_MAX_WORKERS: int = int(os.getenv("AWS_SDK_MAX_WORKERS", "16"))
+    AWS_SDK_CALL_TIMEOUT: float = float(os.getenv("AWS_SDK_CALL_TIMEOUT", "30"))
+
     # Azure Credentials
     AZURE_SUBSCRIPTION_ID: str = os.getenv("AZURE_SUBSCRIPTION_ID", "")
     AZURE_TENANT_ID: str = os.getenv("AZURE_TENANT_ID", "")
     AZURE_CLIENT_ID: str = os.getenv("AZURE_CLIENT_ID", "")
     AZURE_CLIENT_SECRET: str = os.getenv("AZURE_CLIENT_SECRET", "")
 
+    # Month-aligned Cost Management queries run in parallel up to this cap
+    AZURE_QUERY_MAX_CONCURRENCY: int = int(os.getenv("AZURE_QUERY_MAX_CONCURRENCY", "4"))
+
+    # Daily cost store (days older than the settle window are never refetched)
+    COST_STORE_PATH: str = os.getenv("COST_STORE_PATH", "data/cost_store.sqlite3")
+    COST_STORE_SETTLE_DAYS: int = int(os.getenv("COST_STORE_SETTLE_DAYS", "3"))
+
     # NLP Model
     RECOMMENDER_MODEL_PATH: str = os.getenv("RECOMMENDER_MODEL_PATH", "models/recommender")
+    # Requests arriving within the window share one batched generate call
+    RECOMMENDER_BATCH_MAX_SIZE: int = int(os.getenv("RECOMMENDER_BATCH_MAX_SIZE", "16"))
+    RECOMMENDER_BATCH_WAIT_MS: float = float(os.getenv("RECOMMENDER_BATCH_WAIT_MS", "10"))
+    # Chunk size for POST /api/recommendations/batch
+    RECOMMENDER_BATCH_CHUNK_SIZE: int = int(os.getenv("RECOMMENDER_BATCH_CHUNK_SIZE", "32"))
+    # Memoized recommendations; set RECOMMENDER_CACHE_PATH to keep them across restarts
+    RECOMMENDER_CACHE_TTL: float = float(os.getenv("RECOMMENDER_CACHE_TTL", "86400"))
+    RECOMMENDER_CACHE_MAX_ENTRIES: int = int(os.getenv("RECOMMENDER_CACHE_MAX_ENTRIES", "10000"))
+    RECOMMENDER_CACHE_MAX_BYTES: int = int(os.getenv("RECOMMENDER_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    RECOMMENDER_CACHE_PATH: str = os.getenv("RECOMMENDER_CACHE_PATH", "")
+    RECOMMENDER_CACHE_SIGNIFICANT_DIGITS: int = int(os.getenv("RECOMMENDER_CACHE_SIGNIFICANT_DIGITS", "2"))
+    # Part of the cache key; defaults to the model directory and its config.json mtime
+    RECOMMENDER_MODEL_VERSION: str = os.getenv("RECOMMENDER_MODEL_VERSION", "")
+    # torch (fp32), int8 (dynamically quantized torch) or onnx (graphs from nlp/scripts/export_onnx.py)
+    RECOMMENDER_BACKEND: str = os.getenv("RECOMMENDER_BACKEND", "torch")
+    # Inference worker processes (0 runs the model in the API process) and
+    # torch intra-op threads per worker (0 splits the cores evenly)
+    RECOMMENDER_WORKERS: int = int(os.getenv("RECOMMENDER_WORKERS", "0"))
+    RECOMMENDER_WORKER_THREADS: int = int(os.getenv("RECOMMENDER_WORKER_THREADS", "0"))
+    # Concurrent /recommendations/stream generations; more wait for a free thread
+    RECOMMENDER_STREAM_MAX_CONCURRENT: int = int(os.getenv("RECOMMENDER_STREAM_MAX_CONCURRENT", "4"))
+    # Well-known cost patterns are answered by keyword rules instead of the model
+    RECOMMENDER_RULES_ENABLED: bool = os.getenv("RECOMMENDER_RULES_ENABLED", "true").lower() == "true"
+    RECOMMENDER_RULES_MIN_CONFIDENCE: float = float(os.getenv("RECOMMENDER_RULES_MIN_CONFIDENCE", "0.8"))
 
     # AWS Athena (CUR)
     AWS_ATHENA_DATABASE: str = os.getenv("AWS_ATHENA_DATABASE", "athenacurcfn_my_cur_report")
     AWS_ATHENA_TABLE: str = os.getenv("AWS_ATHENA_TABLE", "my_cur_report")
     AWS_ATHENA_OUTPUT_LOCATION: str = os.getenv("AWS_ATHENA_OUTPUT_LOCATION", "s3://my-athena-results-bucket/")
+    # year_month (legacy CUR), billing_period (CUR 2.0) or none
+    AWS_CUR_PARTITION_SCHEME: str = os.getenv("AWS_CUR_PARTITION_SCHEME", "year_month")
+    ATHENA_QUERY_TIMEOUT: float = float(os.getenv("ATHENA_QUERY_TIMEOUT", "300"))
+    ATHENA_POLL_INITIAL_DELAY: float = float(os.getenv("ATHENA_POLL_INITIAL_DELAY", "0.05"))
+    ATHENA_POLL_MAX_DELAY: float = float(os.getenv("ATHENA_POLL_MAX_DELAY", "2"))
+    # Results at least this large are streamed from the S3 CSV instead of paged
+    ATHENA_CSV_RESULT_MIN_BYTES: int = int(os.getenv("ATHENA_CSV_RESULT_MIN_BYTES", "262144"))
+    ATHENA_RESULT_READ_TIMEOUT: float = float(os.getenv("ATHENA_RESULT_READ_TIMEOUT", "300"))
+    # CUR data only changes a few times a day; 0 disables the local cache / Athena reuse
+    ATHENA_RESULT_CACHE_TTL: float = float(os.getenv("ATHENA_RESULT_CACHE_TTL", "3600"))
+    ATHENA_RESULT_CACHE_MAX_ENTRIES: int = int(os.getenv("ATHENA_RESULT_CACHE_MAX_ENTRIES", "256"))
+    ATHENA_RESULT_CACHE_MAX_BYTES: int = int(os.getenv("ATHENA_RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    ATHENA_RESULT_REUSE_MAX_AGE_MINUTES: int = int(os.getenv("ATHENA_RESULT_REUSE_MAX_AGE_MINUTES", "60"))
+    # Stay below the account's active DML query quota; extra queries wait in a queue
+    ATHENA_MAX_CONCURRENT_QUERIES: int = int(os.getenv("ATHENA_MAX_CONCURRENT_QUERIES", "20"))
+    ATHENA_MAX_QUEUED_QUERIES: int = int(os.getenv("ATHENA_MAX_QUEUED_QUERIES", "100"))
 
     class Config:
         case_sensitive = True
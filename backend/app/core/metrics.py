@@ -0,0 +1,25 @@
+"""Registry of runtime statistics served by the /metrics endpoint.
+
+Services register a zero-argument callable returning a dict of counters; the
+endpoint calls every provider when it is scraped, so providers should be cheap.
+"""
+import threading
+from typing import Any, Callable, Dict
+
+MetricsProvider = Callable[[], Dict[str, Any]]
+
+_providers: Dict[str, MetricsProvider] = {}
+_lock = threading.Lock()
+
+
+def register(name: str, provider: MetricsProvider) -> None:
+    """Registers (or replaces) the statistics provider for a component."""
+    with _lock:
+        _providers[name] = provider
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    """Returns the current statistics of every registered component."""
+    with _lock:
+        providers = dict(_providers)
+    return {name: provider() for name, provider in sorted(providers.items())}
@@ -1,19 +1,44 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from app.api.routes import aws_router
 from app.api.azure_routes import azure_router
-from app.api.recommendation_routes import router as recommendation_router
+from app.api.recommendation_routes import (
+    recommendation_batcher, recommendation_streamer, router as recommendation_router
+)
 
 from app.api.aws_cur_routes import router as aws_cur_router
+from app.core import metrics
+from app.services.aws_executor import aws_executor
+from app.services.azure_query_planner import azure_query_planner
+from app.services.model_manager import LOADING, model_manager
+from app.services.recommendation_cache import recommendation_cache
 
 # Load environment variables from .env file
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Application startup and shutdown hooks"""
+    recommendation_cache.load()
+    # The model loads in the background; cost endpoints serve meanwhile
+    model_manager.start()
+    yield
+    recommendation_cache.save()
+    aws_executor.shutdown()
+    azure_query_planner.shutdown()
+    recommendation_batcher.shutdown()
+    recommendation_streamer.shutdown()
+    model_manager.shutdown()
+
 app = FastAPI(
     title="CloudSathi API",
     description="Cloud cost optimization API for Nepal's startups",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -35,6 +60,28 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "message": "CloudSathi API is running"}
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Per-component readiness with load timings. Returns 503 while a component
+    is still starting up; a model that is unavailable or failed to load does
+    not block the cost endpoints, so it is reported but not waited for.
+    """
+    components = {
+        "api": {"ready": True, "state": "ready"},
+        "recommendation_model": model_manager.status(),
+    }
+    starting = any(component["state"] == LOADING for component in components.values())
+    return JSONResponse(
+        status_code=503 if starting else 200,
+        content={"ready": not starting, "components": components}
+    )
+
+@app.get("/metrics")
+async def get_metrics():
+    """Runtime statistics (cache hit rates, queue depths) per component"""
+    return metrics.snapshot()
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
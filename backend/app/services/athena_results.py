@@ -0,0 +1,128 @@
+"""Readers for the results of finished Athena queries.
+
+Athena writes every DML result as a CSV object under the query's output
+location. Streaming that object from S3 and parsing it incrementally needs a
+couple of requests in total, whereas ``GetQueryResults`` returns at most 1000
+rows per call. The paginated API is still used for small results, where the
+extra S3 requests are not worth it.
+"""
+import codecs
+import csv
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+Converter = Callable[[str], Any]
+
+_INTEGER_TYPES = {"tinyint", "smallint", "integer", "int", "bigint"}
+_FLOAT_TYPES = {"float", "real", "double", "decimal"}
+
+
+def _to_bool(value: str) -> bool:
+    return value.lower() == "true"
+
+
+def converter_for(athena_type: str) -> Optional[Converter]:
+    """
+    Returns the Python converter for an Athena column type, or None for
+    types that are kept as strings (varchar, dates, timestamps, ...).
+    """
+    base_type = athena_type.split("(", 1)[0].strip().lower()
+    if base_type in _INTEGER_TYPES:
+        return int
+    if base_type in _FLOAT_TYPES:
+        return float
+    if base_type == "boolean":
+        return _to_bool
+    return None
+
+
+def column_converters(column_info: List[Dict[str, Any]]) -> List[Optional[Converter]]:
+    """Builds one converter per column from ``ResultSetMetadata.ColumnInfo``."""
+    return [converter_for(column.get("Type", "varchar")) for column in column_info]
+
+
+def convert_row(values: List[Optional[str]], converters: List[Optional[Converter]]) -> List[Any]:
+    """Applies column converters; empty values of typed columns become None."""
+    row = []
+    for value, convert in zip(values, converters):
+        if convert is None or value is None:
+            row.append(value)
+        elif value == "":
+            row.append(None)
+        else:
+            row.append(convert(value))
+    return row
+
+
+def parse_s3_uri(uri: str) -> Tuple[str, str]:
+    """Splits ``s3://bucket/key`` into its bucket and key."""
+    parsed = urlparse(uri)
+    if parsed.scheme != "s3" or not parsed.netloc:
+        raise ValueError(f"Not an S3 URI: {uri}")
+    return parsed.netloc, parsed.path.lstrip("/")
+
+
+def _iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    # Only "\n" ends a line, and it is kept, so csv.reader can rebuild quoted
+    # fields that contain newlines or other line-separator characters.
+    decode = codecs.getincrementaldecoder("utf-8")().decode
+    pending = ""
+    for chunk in chunks:
+        parts = (pending + decode(chunk)).split("\n")
+        pending = parts.pop()
+        for part in parts:
+            yield part + "\n"
+    pending += decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+class CsvResultReader:
+    """
+    Streams an Athena result CSV from S3 and yields typed rows.
+
+    Only one chunk of the object is held in memory at a time, so memory use
+    does not grow with the size of the result.
+    """
+
+    def __init__(self, s3_client: Any, output_location: str,
+                 converters: Optional[List[Optional[Converter]]] = None,
+                 chunk_size: int = 1024 * 1024):
+        self.s3_client = s3_client
+        self.bucket, self.key = parse_s3_uri(output_location)
+        self.converters = converters
+        self.chunk_size = chunk_size
+        self.columns: List[str] = []
+
+    def size(self) -> int:
+        """Returns the size of the result object in bytes."""
+        return self.s3_client.head_object(Bucket=self.bucket, Key=self.key)["ContentLength"]
+
+    def iter_rows(self) -> Iterator[List[Any]]:
+        """Yields each data row as a list; ``columns`` is set from the header row."""
+        body = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)["Body"]
+        try:
+            reader = csv.reader(_iter_lines(body.iter_chunks(self.chunk_size)))
+            self.columns = next(reader, [])
+            converters = self.converters or [None] * len(self.columns)
+            for values in reader:
+                if values:
+                    yield convert_row(values, converters)
+        finally:
+            body.close()
+
+    def iter_dicts(self) -> Iterator[Dict[str, Any]]:
+        """Yields each data row as a dict keyed by column name."""
+        for row in self.iter_rows():
+            yield dict(zip(self.columns, row))
+
+    def iter_column_batches(self, batch_size: int = 10000) -> Iterator[Dict[str, List[Any]]]:
+        """Yields column-oriented batches of up to ``batch_size`` rows."""
+        batch: List[List[Any]] = []
+        for row in self.iter_rows():
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield dict(zip(self.columns, (list(column) for column in zip(*batch))))
+                batch = []
+        if batch:
+            yield dict(zip(self.columns, (list(column) for column in zip(*batch))))
@@ -0,0 +1,160 @@
+"""Admission control for Athena queries.
+
+Athena caps the number of concurrently active DML queries per account and
+rejects ``StartQueryExecution`` calls beyond it with a throttling error. The
+scheduler holds a fixed number of slots; queries beyond them wait in a bounded
+priority queue (interactive dashboards ahead of exports) and are rejected with
+a retry hint once the queue is full, so latency degrades predictably under
+load instead of turning into errors.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+# Assumed query duration for the Retry-After hint before any query has finished
+DEFAULT_QUERY_SECONDS = 5.0
+
+
+class QueryPriority(IntEnum):
+    """Lower values are scheduled first."""
+    INTERACTIVE = 0
+    EXPORT = 10
+
+
+class AthenaQueueFullError(Exception):
+    """Raised when every slot is busy and the wait queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many Athena queries are queued; retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+
+
+def _wake(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AthenaScheduler:
+    def __init__(self, max_slots: int, max_queue: int):
+        self.max_slots = max_slots
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queue: List[Tuple[int, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._rejected = 0
+        self._completed = 0
+        self._waits = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._avg_query_seconds: Optional[float] = None
+
+    @asynccontextmanager
+    async def slot(self, priority: QueryPriority = QueryPriority.INTERACTIVE) -> AsyncIterator[float]:
+        """Holds one Athena slot for the body of the block; yields the time spent queued."""
+        waited = await self.acquire(priority)
+        started = time.monotonic()
+        try:
+            yield waited
+        finally:
+            self.release(time.monotonic() - started)
+
+    async def acquire(self, priority: QueryPriority = QueryPriority.INTERACTIVE) -> float:
+        """
+        Waits for a free slot and returns how long that took. Raises
+        AthenaQueueFullError straight away when the queue is already full.
+        """
+        enqueued = time.monotonic()
+        with self._lock:
+            if self._active < self.max_slots and not self._queue:
+                self._active += 1
+                self._record_wait(0.0)
+                return 0.0
+            if len(self._queue) >= self.max_queue:
+                self._rejected += 1
+                raise AthenaQueueFullError(self._retry_after())
+            waiter = _Waiter(asyncio.get_running_loop())
+            heapq.heappush(self._queue, (int(priority), next(self._sequence), waiter))
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+                    heapq.heapify(self._queue)
+            if granted:
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            raise
+
+        waited = time.monotonic() - enqueued
+        with self._lock:
+            self._record_wait(waited)
+        return waited
+
+    def release(self, held: Optional[float] = None) -> None:
+        """Frees a slot, handing it straight to the highest-priority waiter if any."""
+        with self._lock:
+            if held is not None:
+                self._completed += 1
+                if self._avg_query_seconds is None:
+                    self._avg_query_seconds = held
+                else:
+                    self._avg_query_seconds = 0.8 * self._avg_query_seconds + 0.2 * held
+            while self._queue:
+                _, _, waiter = heapq.heappop(self._queue)
+                try:
+                    waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+                except RuntimeError:
+                    continue  # The waiter's event loop has been closed
+                waiter.granted = True
+                return
+            self._active -= 1
+
+    def _record_wait(self, waited: float) -> None:
+        self._waits += 1
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+
+    def _retry_after(self) -> int:
+        query_seconds = self._avg_query_seconds or DEFAULT_QUERY_SECONDS
+        rounds = (len(self._queue) + 1) / max(self.max_slots, 1)
+        return max(1, math.ceil(query_seconds * rounds))
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "slots": self.max_slots,
+                "active": self._active,
+                "queue_depth": len(self._queue),
+                "max_queue": self.max_queue,
+                "rejected": self._rejected,
+                "completed": self._completed,
+                "avg_wait_seconds": self._total_wait / self._waits if self._waits else 0.0,
+                "max_wait_seconds": self._max_wait,
+            }
+
+
+athena_scheduler = AthenaScheduler(
+    max_slots=settings.ATHENA_MAX_CONCURRENT_QUERIES,
+    max_queue=settings.ATHENA_MAX_QUEUED_QUERIES
+)
+metrics.register("athena_scheduler", athena_scheduler.stats)
@@ -1,94 +1,345 @@
-import boto3
-import time
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+from datetime import date, datetime
+from typing import Awaitable, Callable, Iterator, List, Dict, Any, Optional, Sequence, Tuple
 from botocore.exceptions import ClientError
+from app.core import metrics
 from app.core.config import settings
+from app.services.athena_results import Converter, CsvResultReader, column_converters, convert_row
+from app.services.athena_scheduler import AthenaScheduler, QueryPriority, athena_scheduler
+from app.services.aws_executor import AWSCallTimeoutError, aws_executor
+from app.services.client_registry import client_registry
+from app.services.result_cache import ResultCache, query_cache_key
+from app.services.single_flight import single_flight
 
 logger = logging.getLogger(__name__)
 
+# Where the rows of a run_cached_query call came from
+RESULT_SOURCE_LOCAL_CACHE = "local-cache"
+RESULT_SOURCE_ATHENA_REUSE = "athena-reuse"
+RESULT_SOURCE_FRESH = "fresh"
+
+
+class AthenaQueryError(Exception):
+    """Raised when an Athena query ends in the FAILED or CANCELLED state."""
+
+
+class AthenaQueryTimeoutError(AthenaQueryError):
+    """Raised when a query is still running at its deadline."""
+
+
+class AthenaQueryAbortedError(AthenaQueryError):
+    """Raised when the client that asked for a query goes away."""
+
+
+def sql_literal(value: Any) -> str:
+    """
+    Formats a Python value as the SQL literal Athena expects in
+    ExecutionParameters, which are substituted as literal text.
+    """
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, datetime):
+        return f"TIMESTAMP '{value.strftime('%Y-%m-%d %H:%M:%S')}'"
+    if isinstance(value, date):
+        return f"DATE '{value.isoformat()}'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
 class AthenaService:
-    def __init__(self):
+    def __init__(self, client: Optional[Any] = None, s3_client: Optional[Any] = None,
+                 result_cache: Optional[ResultCache] = None,
+                 scheduler: Optional[AthenaScheduler] = None):
+        self._client = client
+        self._s3_client = s3_client
+        self.result_cache = result_cache
+        self.scheduler = scheduler
         self.database = settings.AWS_ATHENA_DATABASE
         self.table = settings.AWS_ATHENA_TABLE
         self.output_location = settings.AWS_ATHENA_OUTPUT_LOCATION
         self.region = settings.AWS_REGION
         
-        # Initialize Athena client only if credentials are present
-        if settings.AWS_ACCESS_KEY_ID and settings.AWS_SECRET_ACCESS_KEY:
-            self.client = boto3.client(
-                'athena',
-                region_name=self.region,
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
-            )
-        else:
-            self.client = None
+        if not (settings.AWS_ACCESS_KEY_ID and settings.AWS_SECRET_ACCESS_KEY):
             logger.warning("AWS credentials not found. AthenaService will run in mock mode.")
 
-    def execute_query(self, query_string: str) -> str:
+    @property
+    def client(self):
+        """
+        Returns the shared Athena client, or None when running in mock mode.
+        """
+        if self._client is not None:
+            return self._client
+        if not (settings.AWS_ACCESS_KEY_ID and settings.AWS_SECRET_ACCESS_KEY):
+            return None
+        return client_registry.get_aws_client(
+            'athena',
+            region=self.region,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
+        )
+
+    @property
+    def s3_client(self):
+        """
+        Returns the shared S3 client used to read result files, or None in mock mode.
+        """
+        if self._s3_client is not None:
+            return self._s3_client
+        if not (settings.AWS_ACCESS_KEY_ID and settings.AWS_SECRET_ACCESS_KEY):
+            return None
+        return client_registry.get_aws_client(
+            's3',
+            region=self.region,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
+        )
+
+    def execute_query(self, query_string: str, parameters: Optional[Sequence[Any]] = None) -> str:
         """
         Submits a query to Athena and returns the execution ID.
+
+        With ATHENA_RESULT_REUSE_MAX_AGE_MINUTES set, Athena may answer from
+        the results of an identical query run within that many minutes
+        instead of scanning the data again.
         """
         if not self.client:
             return "mock-execution-id"
 
+        request: Dict[str, Any] = {
+            'QueryString': query_string,
+            'QueryExecutionContext': {'Database': self.database},
+            'ResultConfiguration': {'OutputLocation': self.output_location},
+        }
+        if parameters:
+            request['ExecutionParameters'] = [sql_literal(value) for value in parameters]
+        if settings.ATHENA_RESULT_REUSE_MAX_AGE_MINUTES > 0:
+            request['ResultReuseConfiguration'] = {'ResultReuseByAgeConfiguration': {
+                'Enabled': True,
+                'MaxAgeInMinutes': settings.ATHENA_RESULT_REUSE_MAX_AGE_MINUTES,
+            }}
+
         try:
-            response = self.client.start_query_execution(
-                QueryString=query_string,
-                QueryExecutionContext={'Database': self.database},
-                ResultConfiguration={'OutputLocation': self.output_location}
-            )
+            response = self.client.start_query_execution(**request)
             return response['QueryExecutionId']
         except ClientError as e:
             logger.error(f"Athena query execution failed: {e}")
             raise
 
-    def get_query_results(self, query_execution_id: str) -> List[Dict[str, Any]]:
+    async def run_cached_query(self, query_string: str, parameters: Optional[Sequence[Any]] = None,
+                               is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+                               timeout: Optional[float] = None,
+                               priority: QueryPriority = QueryPriority.INTERACTIVE
+                               ) -> Tuple[List[Dict[str, Any]], str]:
         """
-        Waits for the query to complete and returns the results.
+        Returns a query's results and where they came from: the local result
+        cache, a result Athena reused from an earlier run, or a fresh execution.
         """
-        if not self.client or query_execution_id == "mock-execution-id":
-            return self._get_mock_results()
+        key = query_cache_key(query_string, parameters)
+        if self.result_cache is not None:
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return list(cached), RESULT_SOURCE_LOCAL_CACHE
+
+        async def run_and_cache() -> Tuple[List[Dict[str, Any]], str]:
+            # Shared by every concurrent caller, so it cannot watch any single
+            # caller's connection; each caller watches its own below instead
+            rows, source = await self._run(query_string, parameters, None, timeout, priority)
+            if self.result_cache is not None:
+                self.result_cache.set(key, rows)
+            return rows, source
+
+        rows, source = await self._await_while_connected(
+            single_flight.do(('athena', key), run_and_cache), is_disconnected
+        )
+        return list(rows), source
 
+    async def _await_while_connected(self, awaitable: Awaitable[Any],
+                                     is_disconnected: Optional[Callable[[], Awaitable[bool]]]) -> Any:
+        """
+        Awaits a shared query, giving up with AthenaQueryAbortedError if this
+        caller disconnects. The query itself is only stopped once every
+        caller waiting on it has gone.
+        """
+        if is_disconnected is None:
+            return await awaitable
+        task = asyncio.ensure_future(awaitable)
         try:
-            # Wait for query to complete
             while True:
-                response = self.client.get_query_execution(QueryExecutionId=query_execution_id)
-                state = response['QueryExecution']['Status']['State']
-                
-                if state in ['SUCCEEDED', 'FAILED', 'CANCELLED']:
-                    break
-                time.sleep(1)  # Wait before polling again
-
-            if state != 'SUCCEEDED':
-                raise Exception(f"Query failed with status: {state}")
-
-            # Fetch results
-            results_paginator = self.client.get_paginator('get_query_results')
-            results_iter = results_paginator.paginate(
-                QueryExecutionId=query_execution_id,
-                PaginationConfig={'PageSize': 1000}
+                done, _ = await asyncio.wait({task}, timeout=settings.ATHENA_POLL_MAX_DELAY)
+                if done:
+                    return task.result()
+                if await is_disconnected():
+                    raise AthenaQueryAbortedError("Client disconnected while its query was running")
+        finally:
+            task.cancel()
+
+    async def run_query(self, query_string: str,
+                        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+                        timeout: Optional[float] = None,
+                        parameters: Optional[Sequence[Any]] = None,
+                        priority: QueryPriority = QueryPriority.INTERACTIVE) -> List[Dict[str, Any]]:
+        """
+        Runs a query through its whole lifecycle and returns the results.
+
+        The execution is polled with exponential backoff so fast queries
+        return quickly without hammering the API. If the deadline passes, the
+        caller disconnects or the task is cancelled, the query is stopped so
+        Athena does not keep scanning (and billing for) S3 data nobody reads.
+
+        With a scheduler configured the query first waits for one of its
+        slots, and AthenaQueueFullError is raised when its queue is full.
+        """
+        rows, _ = await self._run(query_string, parameters, is_disconnected, timeout, priority)
+        return rows
+
+    async def _run(self, query_string: str, parameters: Optional[Sequence[Any]],
+                   is_disconnected: Optional[Callable[[], Awaitable[bool]]],
+                   timeout: Optional[float],
+                   priority: QueryPriority = QueryPriority.INTERACTIVE) -> Tuple[List[Dict[str, Any]], str]:
+        if not self.client:
+            return self._get_mock_results(), RESULT_SOURCE_FRESH
+
+        if self.scheduler is None:
+            execution_id, execution = await self._execute(query_string, parameters, is_disconnected, timeout)
+        else:
+            # The slot covers only the time the query is active in Athena;
+            # reading finished results does not count against the limit
+            async with self.scheduler.slot(priority):
+                execution_id, execution = await self._execute(query_string, parameters, is_disconnected, timeout)
+        rows = await aws_executor.run(
+            self.get_query_results, execution_id, execution,
+            timeout=settings.ATHENA_RESULT_READ_TIMEOUT
+        )
+        reuse = execution.get('Statistics', {}).get('ResultReuseInformation', {})
+        if reuse.get('ReusedPreviousResult'):
+            return rows, RESULT_SOURCE_ATHENA_REUSE
+        return rows, RESULT_SOURCE_FRESH
+
+    async def _execute(self, query_string: str, parameters: Optional[Sequence[Any]],
+                       is_disconnected: Optional[Callable[[], Awaitable[bool]]],
+                       timeout: Optional[float]) -> Tuple[str, Dict[str, Any]]:
+        execution_id = await aws_executor.run(self.execute_query, query_string, parameters)
+        try:
+            return execution_id, await self.wait_for_query(execution_id, is_disconnected, timeout)
+        except (AthenaQueryTimeoutError, AthenaQueryAbortedError, AWSCallTimeoutError):
+            await aws_executor.run(self.stop_query, execution_id)
+            raise
+        except asyncio.CancelledError:
+            # Awaiting inside a cancelled task is unreliable; stop in the background
+            aws_executor.submit(self.stop_query, execution_id)
+            raise
+
+    async def wait_for_query(self, query_execution_id: str,
+                             is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+                             timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Polls until the query succeeds, backing off from ATHENA_POLL_INITIAL_DELAY
+        up to ATHENA_POLL_MAX_DELAY between calls, and returns the execution.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (settings.ATHENA_QUERY_TIMEOUT if timeout is None else timeout)
+        delay = settings.ATHENA_POLL_INITIAL_DELAY
+        while True:
+            response = await aws_executor.run(
+                self.client.get_query_execution, QueryExecutionId=query_execution_id
             )
+            status = response['QueryExecution']['Status']
+            state = status['State']
+            if state == 'SUCCEEDED':
+                return response['QueryExecution']
+            if state in ('FAILED', 'CANCELLED'):
+                reason = status.get('StateChangeReason', 'no reason given')
+                raise AthenaQueryError(f"Query failed with status: {state} ({reason})")
+
+            if is_disconnected is not None and await is_disconnected():
+                raise AthenaQueryAbortedError(f"Client disconnected while query {query_execution_id} was running")
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise AthenaQueryTimeoutError(f"Query {query_execution_id} did not finish before its deadline")
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, settings.ATHENA_POLL_MAX_DELAY)
+
+    def stop_query(self, query_execution_id: str) -> None:
+        """
+        Cancels a running query; failures are logged rather than raised since
+        this only runs while another error is already being handled.
+        """
+        try:
+            self.client.stop_query_execution(QueryExecutionId=query_execution_id)
+            logger.info("Stopped Athena query %s", query_execution_id)
+        except ClientError as e:
+            logger.warning("Failed to stop Athena query %s: %s", query_execution_id, e)
 
-            results = []
-            for results_page in results_iter:
-                rows = results_page['ResultSet']['Rows']
-                # Skip header row if it's the first page
-                if len(results) == 0:
-                    headers = [col['VarCharValue'] for col in rows[0]['Data']]
-                    rows = rows[1:]
-                
-                for row in rows:
-                    data = [col.get('VarCharValue', None) for col in row['Data']]
-                    results.append(dict(zip(headers, data)))
-            
-            return results
+    def get_query_results(self, query_execution_id: str,
+                          execution: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Returns the results of a finished query.
+        """
+        return list(self.iter_query_results(query_execution_id, execution))
+
+    def iter_query_results(self, query_execution_id: str,
+                           execution: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the typed rows of a finished query.
+
+        Results of at least ATHENA_CSV_RESULT_MIN_BYTES are streamed from the
+        CSV file Athena wrote to S3; smaller ones are read with the paginated
+        GetQueryResults API.
+        """
+        if not self.client or query_execution_id == "mock-execution-id":
+            yield from self._get_mock_results()
+            return
+
+        try:
+            if execution is None:
+                execution = self.client.get_query_execution(
+                    QueryExecutionId=query_execution_id
+                )['QueryExecution']
+            output_location = execution.get('ResultConfiguration', {}).get('OutputLocation', '')
+
+            if output_location.endswith('.csv') and self.s3_client:
+                reader = CsvResultReader(self.s3_client, output_location)
+                if reader.size() >= settings.ATHENA_CSV_RESULT_MIN_BYTES:
+                    reader.converters = column_converters(self._column_info(query_execution_id))
+                    yield from reader.iter_dicts()
+                    return
+
+            yield from self._iter_paginated_results(query_execution_id)
 
         except ClientError as e:
             logger.error(f"Failed to get query results: {e}")
             raise
 
+    def _column_info(self, query_execution_id: str) -> List[Dict[str, Any]]:
+        response = self.client.get_query_results(QueryExecutionId=query_execution_id, MaxResults=1)
+        return response['ResultSet'].get('ResultSetMetadata', {}).get('ColumnInfo', [])
+
+    def _iter_paginated_results(self, query_execution_id: str) -> Iterator[Dict[str, Any]]:
+        results_paginator = self.client.get_paginator('get_query_results')
+        results_iter = results_paginator.paginate(
+            QueryExecutionId=query_execution_id,
+            PaginationConfig={'PageSize': 1000}
+        )
+
+        headers = None
+        converters: List[Optional[Converter]] = []
+        for results_page in results_iter:
+            rows = results_page['ResultSet']['Rows']
+            # The header row and column types only appear on the first page
+            if headers is None:
+                headers = [col['VarCharValue'] for col in rows[0]['Data']]
+                column_info = results_page['ResultSet'].get('ResultSetMetadata', {}).get('ColumnInfo', [])
+                converters = column_converters(column_info) or [None] * len(headers)
+                rows = rows[1:]
+
+            for row in rows:
+                data = [col.get('VarCharValue', None) for col in row['Data']]
+                yield dict(zip(headers, convert_row(data, converters)))
+
     def _get_mock_results(self) -> List[Dict[str, Any]]:
         """
         Returns mock CUR data for testing/demo purposes.
@@ -131,4 +382,11 @@ class AthenaService:
             }
         ]
 
-athena_service = AthenaService()
+athena_result_cache = ResultCache(
+    ttl=settings.ATHENA_RESULT_CACHE_TTL,
+    max_entries=settings.ATHENA_RESULT_CACHE_MAX_ENTRIES,
+    max_bytes=settings.ATHENA_RESULT_CACHE_MAX_BYTES
+)
+metrics.register("athena_result_cache", athena_result_cache.stats)
+
+athena_service = AthenaService(result_cache=athena_result_cache, scheduler=athena_scheduler)
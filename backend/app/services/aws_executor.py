@@ -0,0 +1,78 @@
+"""Async execution layer for blocking AWS SDK calls.
+
+boto3 clients are synchronous, so calling them directly from an ``async def``
+handler stalls the event loop for every other request. ``AWSExecutor`` runs the
+calls on a bounded thread pool instead, caps how many may be in flight at once
+and enforces a per-call deadline.
+"""
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AWSCallTimeoutError(Exception):
+    """Raised when an AWS SDK call does not complete before its deadline."""
+
+
+class AWSExecutor:
+    def __init__(self, max_workers: int, default_timeout: float):
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="aws-sdk"
+                )
+            return self._executor
+
+    async def run(self, func: Callable[..., Any], *args: Any,
+                  timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """
+        Runs ``func(*args, **kwargs)`` on the AWS thread pool and awaits it.
+
+        The pool size is the concurrency cap: calls beyond it queue until a
+        worker frees up, and the deadline covers that wait as well.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = self.default_timeout if timeout is None else timeout
+        future = loop.run_in_executor(
+            self._get_executor(),
+            functools.partial(func, *args, **kwargs)
+        )
+        try:
+            return await asyncio.wait_for(future, timeout=deadline)
+        except asyncio.TimeoutError as exc:
+            name = getattr(func, "__name__", repr(func))
+            logger.warning("AWS call %s timed out after %ss", name, deadline)
+            raise AWSCallTimeoutError(
+                f"AWS call {name} did not complete within {deadline} seconds"
+            ) from exc
+
+    def submit(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Schedules ``func`` without waiting for it, e.g. for best-effort cleanup."""
+        return self._get_executor().submit(func, *args, **kwargs)
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stops the worker threads; a new pool is created on next use."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+aws_executor = AWSExecutor(
+    max_workers=settings.AWS_SDK_MAX_WORKERS,
+    default_timeout=settings.AWS_SDK_CALL_TIMEOUT
+)
@@ -0,0 +1,159 @@
+"""Process-wide registry of reusable cloud SDK clients.
+
+Building a boto3 client or an Azure ``CostManagementClient`` resolves endpoints,
+sets up a session and opens new TLS connections, and a fresh Azure credential
+has to fetch an AAD token before its first call. The registry builds each
+client once per credential set and region and hands the same instance to every
+request. A client is rebuilt when the secret behind its identity changes.
+"""
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import boto3
+import requests
+from azure.core.credentials import AccessToken
+from azure.core.pipeline.transport import RequestsTransport
+from azure.identity import ClientSecretCredential
+from azure.mgmt.costmanagement import CostManagementClient
+from botocore.config import Config
+from requests.adapters import HTTPAdapter
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Refresh Azure tokens this many seconds before they actually expire
+TOKEN_REFRESH_MARGIN = 300
+
+
+def _fingerprint(*parts: Optional[str]) -> str:
+    """Hashes credential material so secrets are never kept as cache keys."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class CachedTokenCredential:
+    """Wraps an Azure credential and reuses each token until it nears expiry."""
+
+    def __init__(self, credential: Any):
+        self._credential = credential
+        self._tokens: Dict[Tuple[str, ...], AccessToken] = {}
+        self._lock = threading.Lock()
+
+    def get_token(self, *scopes: str, **kwargs: Any) -> AccessToken:
+        key = tuple(sorted(scopes))
+        with self._lock:
+            token = self._tokens.get(key)
+            if token and token.expires_on - TOKEN_REFRESH_MARGIN > time.time():
+                return token
+            token = self._credential.get_token(*scopes, **kwargs)
+            self._tokens[key] = token
+            return token
+
+    def close(self) -> None:
+        close = getattr(self._credential, "close", None)
+        if close:
+            close()
+
+
+class ClientRegistry:
+    def __init__(self, max_pool_connections: int):
+        self.max_pool_connections = max_pool_connections
+        # slot -> (credential fingerprint, client)
+        self._clients: Dict[Tuple[str, ...], Tuple[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._azure_session: Optional[requests.Session] = None
+
+    def get_aws_client(self, service: str, region: str,
+                       aws_access_key_id: str, aws_secret_access_key: str) -> Any:
+        """
+        Returns a boto3 client for ``service`` in ``region``.
+
+        boto3 clients are thread-safe, so one instance (and its connection
+        pool) is shared by every request using the same access key.
+        """
+        slot = ("aws", service, region, aws_access_key_id)
+        fingerprint = _fingerprint(aws_access_key_id, aws_secret_access_key)
+        with self._lock:
+            cached = self._clients.get(slot)
+            if cached and cached[0] == fingerprint:
+                return cached[1]
+            if cached:
+                logger.info("AWS credentials for %s in %s changed, rebuilding client", service, region)
+                self._close(cached[1])
+            client = boto3.client(
+                service,
+                region_name=region,
+                aws_access_key_id=aws_access_key_id,
+                aws_secret_access_key=aws_secret_access_key,
+                config=Config(max_pool_connections=self.max_pool_connections)
+            )
+            self._clients[slot] = (fingerprint, client)
+            return client
+
+    def get_azure_cost_client(self, tenant_id: str, client_id: str,
+                              client_secret: str) -> CostManagementClient:
+        """
+        Returns a ``CostManagementClient`` for the given service principal.
+
+        The client is scope-based, so one instance serves every subscription
+        the principal can read. All Azure clients share one HTTP session.
+        """
+        slot = ("azure", "costmanagement", tenant_id, client_id)
+        fingerprint = _fingerprint(tenant_id, client_id, client_secret)
+        with self._lock:
+            cached = self._clients.get(slot)
+            if cached and cached[0] == fingerprint:
+                return cached[1]
+            if cached:
+                logger.info("Azure credentials for client %s changed, rebuilding client", client_id)
+                self._close(cached[1])
+            credential = CachedTokenCredential(ClientSecretCredential(
+                tenant_id=tenant_id,
+                client_id=client_id,
+                client_secret=client_secret,
+                transport=self._azure_transport()
+            ))
+            client = CostManagementClient(credential, transport=self._azure_transport())
+            self._clients[slot] = (fingerprint, client)
+            return client
+
+    def _azure_transport(self) -> RequestsTransport:
+        # Each pipeline gets its own transport object, but they all wrap the
+        # same requests.Session and therefore the same connection pool.
+        if self._azure_session is None:
+            self._azure_session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=self.max_pool_connections,
+                pool_maxsize=self.max_pool_connections
+            )
+            self._azure_session.mount("https://", adapter)
+        return RequestsTransport(session=self._azure_session, session_owner=False)
+
+    @staticmethod
+    def _close(client: Any) -> None:
+        try:
+            close = getattr(client, "close", None)
+            if close:
+                close()
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.debug("Error closing SDK client: %s", exc)
+
+    def clear(self) -> None:
+        """Drops every cached client and the shared Azure session."""
+        with self._lock:
+            clients, self._clients = self._clients, {}
+            session, self._azure_session = self._azure_session, None
+        for _, client in clients.values():
+            self._close(client)
+        if session is not None:
+            session.close()
+
+
+client_registry = ClientRegistry(max_pool_connections=settings.AWS_SDK_MAX_WORKERS)
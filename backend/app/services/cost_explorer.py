@@ -0,0 +1,81 @@
+"""Streaming pagination and aggregation for AWS Cost Explorer results."""
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from app.api.models import DailyCost, ServiceCost
+from app.services.aws_executor import aws_executor
+from app.services.cost_store import CostRow
+
+
+async def iter_cost_pages(client: Any, **request: Any) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yields every page of a ``get_cost_and_usage`` request, following
+    ``NextPageToken`` until Cost Explorer reports no more pages.
+    """
+    next_page_token: Optional[str] = None
+    while True:
+        kwargs = dict(request)
+        if next_page_token:
+            kwargs['NextPageToken'] = next_page_token
+        page = await aws_executor.run(client.get_cost_and_usage, **kwargs)
+        yield page
+        next_page_token = page.get('NextPageToken')
+        if not next_page_token:
+            break
+
+
+def iter_cost_rows(page: Dict[str, Any]) -> Iterator[CostRow]:
+    """Flattens one Cost Explorer page into (day, service, amount, currency) rows."""
+    for result in page.get('ResultsByTime', []):
+        day = result['TimePeriod']['Start']
+        for group in result.get('Groups', []):
+            cost = group['Metrics']['UnblendedCost']
+            yield day, group['Keys'][0], float(cost['Amount']), cost['Unit']
+
+
+class CostAggregator:
+    """
+    Folds daily cost rows into per-service running totals as they arrive.
+
+    Only the totals are kept, so memory grows with the number of services
+    rather than days x services. The per-day breakdown is opt-in.
+    """
+
+    def __init__(self, include_daily: bool = False):
+        self.include_daily = include_daily
+        self.total_cost = 0.0
+        self.currency = 'USD'  # CE API typically returns costs in USD
+        self._by_service: Dict[str, float] = defaultdict(float)
+        self._by_day: Dict[str, Dict[str, float]] = {}
+
+    def add(self, day: str, service_name: str, amount: float, currency: str) -> None:
+        if amount <= 0:  # Only include services with costs
+            return
+        self.total_cost += amount
+        self.currency = currency
+        self._by_service[service_name] += amount
+        if self.include_daily:
+            day_costs = self._by_day.setdefault(day, defaultdict(float))
+            day_costs[service_name] += amount
+
+    def costs_by_service(self) -> List[ServiceCost]:
+        return _service_costs(self._by_service, self.currency)
+
+    def daily_costs(self) -> Optional[List[DailyCost]]:
+        if not self.include_daily:
+            return None
+        return [
+            DailyCost(
+                date=day,
+                total_cost=sum(services.values()),
+                costs_by_service=_service_costs(services, self.currency)
+            )
+            for day, services in sorted(self._by_day.items())
+        ]
+
+
+def _service_costs(amounts: Dict[str, float], currency: str) -> List[ServiceCost]:
+    return [
+        ServiceCost(service_name=name, amount=amount, currency=currency)
+        for name, amount in sorted(amounts.items(), key=lambda item: item[1], reverse=True)
+    ]
@@ -0,0 +1,247 @@
+"""Persistent store of daily cost rows used to avoid re-querying billing APIs.
+
+Cost Explorer charges per request and cost data for a day keeps changing until
+the provider's billing settles it. Days older than the settle window are
+treated as immutable once stored, so a request for an overlapping window only
+has to fetch the days that are missing or still open.
+
+Fetched rows can be written page by page through a ``DayWriter``: they are
+staged in a temporary table and only replace the stored days on ``commit``,
+so readers never see a half-written range and nothing accumulates in memory.
+The store is synchronous; async routes call it on an executor.
+"""
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from datetime import date, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# (day, dimension, amount, currency); dimension is a service or resource group
+CostRow = Tuple[str, str, float, str]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_costs (
+    provider TEXT NOT NULL,
+    account TEXT NOT NULL,
+    day TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    amount REAL NOT NULL,
+    currency TEXT NOT NULL,
+    PRIMARY KEY (provider, account, day, dimension)
+);
+CREATE TABLE IF NOT EXISTS fetched_days (
+    provider TEXT NOT NULL,
+    account TEXT NOT NULL,
+    day TEXT NOT NULL,
+    PRIMARY KEY (provider, account, day)
+);
+"""
+
+# Private to the connection, so concurrent processes never see each other's pages
+STAGING_SCHEMA = """
+CREATE TEMP TABLE IF NOT EXISTS staged_costs (
+    writer INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    amount REAL NOT NULL,
+    currency TEXT NOT NULL,
+    PRIMARY KEY (writer, day, dimension)
+);
+"""
+
+
+def iter_days(start: date, end: date) -> Iterator[date]:
+    """Yields every day in the half-open range [start, end)."""
+    day = start
+    while day < end:
+        yield day
+        day += timedelta(days=1)
+
+
+class CostStore:
+    def __init__(self, path: str, settle_days: int):
+        self.path = path
+        self.settle_days = settle_days
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._hits = 0
+        self._misses = 0
+        self._writers = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            if self.path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.executescript(STAGING_SCHEMA)
+        return self._conn
+
+    def settled_before(self, today: Optional[date] = None) -> date:
+        """Days strictly before the returned date are treated as immutable."""
+        return (today or date.today()) - timedelta(days=self.settle_days)
+
+    def missing_ranges(self, provider: str, account: str, start: date, end: date,
+                       today: Optional[date] = None) -> List[Tuple[date, date]]:
+        """
+        Returns the half-open ranges within [start, end) that must be fetched
+        from upstream: days never stored plus days still inside the settle
+        window. Adjacent days are merged so each range is a single request.
+        """
+        settled_before = self.settled_before(today)
+        with self._lock:
+            stored = {
+                row[0] for row in self._connection().execute(
+                    "SELECT day FROM fetched_days WHERE provider = ? AND account = ? "
+                    "AND day >= ? AND day < ?",
+                    (provider, account, start.isoformat(), end.isoformat())
+                )
+            }
+
+        ranges: List[Tuple[date, date]] = []
+        hits = misses = 0
+        for day in iter_days(start, end):
+            if day < settled_before and day.isoformat() in stored:
+                hits += 1
+                continue
+            misses += 1
+            if ranges and ranges[-1][1] == day:
+                ranges[-1] = (ranges[-1][0], day + timedelta(days=1))
+            else:
+                ranges.append((day, day + timedelta(days=1)))
+
+        with self._lock:
+            self._hits += hits
+            self._misses += misses
+        logger.debug("%s/%s: %d days from store, %d days to fetch", provider, account, hits, misses)
+        return ranges
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Holds the store lock for one transaction on its connection."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                yield conn
+
+    def writer(self, provider: str, account: str, start: date, end: date) -> "DayWriter":
+        """Starts replacing the stored days [start, end) with rows added as they are fetched."""
+        with self._lock:
+            self._writers += 1
+            return DayWriter(self, self._writers, provider, account, start, end)
+
+    def replace_days(self, provider: str, account: str, start: date, end: date,
+                     rows: Iterable[CostRow]) -> None:
+        """
+        Replaces everything stored for [start, end) with ``rows`` and marks
+        those days as fetched, including days that had no cost at all.
+        """
+        writer = self.writer(provider, account, start, end)
+        try:
+            writer.add(rows)
+            writer.commit()
+        except BaseException:
+            writer.discard()
+            raise
+
+    def iter_rows(self, provider: str, account: str, start: date, end: date) -> Iterator[CostRow]:
+        """
+        Yields the stored rows for [start, end) ordered by day. A file-backed
+        store streams them from a read connection of their own, so other
+        calls never wait for the consumer; an in-memory store has only one
+        connection and reads every row under the lock first.
+        """
+        query = ("SELECT day, dimension, amount, currency FROM daily_costs "
+                 "WHERE provider = ? AND account = ? AND day >= ? AND day < ? "
+                 "ORDER BY day, dimension")
+        parameters = (provider, account, start.isoformat(), end.isoformat())
+        if self.path == ":memory:":
+            with self._lock:
+                rows = self._connection().execute(query, parameters).fetchall()
+            yield from rows
+            return
+        with self._lock:
+            # Creates the database and its schema on first use
+            self._connection()
+        with closing(sqlite3.connect(self.path)) as reader:
+            yield from reader.execute(query, parameters)
+
+    def load(self, provider: str, account: str, start: date, end: date) -> List[CostRow]:
+        """Returns the stored rows for [start, end) ordered by day."""
+        return list(self.iter_rows(provider, account, start, end))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses}
+
+    def clear(self) -> None:
+        """Deletes every stored row and resets the hit/miss counters."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM daily_costs")
+                conn.execute("DELETE FROM fetched_days")
+                conn.execute("DELETE FROM staged_costs")
+            self._hits = 0
+            self._misses = 0
+
+
+class DayWriter:
+    """
+    Rows fetched for one range, staged as they arrive. ``commit`` swaps them
+    in for the stored days in one transaction; ``discard`` drops them and
+    leaves the store as it was.
+    """
+
+    def __init__(self, store: CostStore, writer_id: int, provider: str, account: str, start: date, end: date):
+        self.store = store
+        self.writer_id = writer_id
+        self.provider = provider
+        self.account = account
+        self.start = start
+        self.end = end
+
+    def add(self, rows: Iterable[CostRow]) -> None:
+        with self.store.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO staged_costs VALUES (?, ?, ?, ?, ?)",
+                ((self.writer_id, day, dimension, amount, currency)
+                 for day, dimension, amount, currency in rows)
+            )
+
+    def commit(self) -> None:
+        """Replaces the stored days with the staged rows and marks them as fetched."""
+        range_key = (self.provider, self.account, self.start.isoformat(), self.end.isoformat())
+        with self.store.transaction() as conn:
+            conn.execute(
+                "DELETE FROM daily_costs WHERE provider = ? AND account = ? "
+                "AND day >= ? AND day < ?",
+                range_key
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO daily_costs "
+                "SELECT ?, ?, day, dimension, amount, currency FROM staged_costs WHERE writer = ?",
+                (self.provider, self.account, self.writer_id)
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO fetched_days VALUES (?, ?, ?)",
+                ((self.provider, self.account, day.isoformat()) for day in iter_days(self.start, self.end))
+            )
+            conn.execute("DELETE FROM staged_costs WHERE writer = ?", (self.writer_id,))
+
+    def discard(self) -> None:
+        with self.store.transaction() as conn:
+            conn.execute("DELETE FROM staged_costs WHERE writer = ?", (self.writer_id,))
+
+
+cost_store = CostStore(settings.COST_STORE_PATH, settings.COST_STORE_SETTLE_DAYS)
+metrics.register("cost_store", cost_store.stats)
@@ -0,0 +1,166 @@
+"""SQL builder for queries against the AWS Cost and Usage Report (CUR) table.
+
+Athena bills by bytes scanned. A predicate that wraps the usage timestamp in a
+function (``date_parse(...) >= ...``) has to be evaluated on every row of every
+partition, so the whole table is read. The builder instead restricts the
+``year``/``month`` (legacy CUR) or ``billing_period`` (CUR 2.0) partition
+columns to the billing periods a time range touches, and compares the raw
+``line_item_usage_start_date`` column against the exact bounds. The column
+is a varchar, so the bounds are strings in its fixed-width
+``USAGE_START_FORMAT``, which sort the same way as the timestamps they spell.
+
+User-supplied filter values are never formatted into the SQL text: they are
+returned as positional parameters for the ``?`` placeholders.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+
+PARTITION_SCHEMES = ("year_month", "billing_period", "none")
+USAGE_START_FORMAT = "%Y-%m-%d %H:%M:%S"
+MAX_LIMIT = 1000
+
+
+class CurQueryError(ValueError):
+    """Raised when a CUR query is requested with invalid arguments."""
+
+
+class CurQuery(NamedTuple):
+    sql: str
+    parameters: List[Any]
+
+
+def quote_identifier(name: str) -> str:
+    """Quotes a table or column name, escaping embedded double quotes."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def billing_periods(start: date, end: date) -> List[Tuple[int, int]]:
+    """Returns the (year, month) of every month the half-open range [start, end) touches."""
+    periods = []
+    year, month = start.year, start.month
+    while date(year, month, 1) < end:
+        periods.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
+
+def validate_limit(limit: Any) -> int:
+    if isinstance(limit, bool) or not isinstance(limit, int) or not 1 <= limit <= MAX_LIMIT:
+        raise CurQueryError(f"limit must be an integer between 1 and {MAX_LIMIT}, got {limit!r}")
+    return limit
+
+
+class CurQueryBuilder:
+    def __init__(self, table: str, partition_scheme: str = "year_month"):
+        if partition_scheme not in PARTITION_SCHEMES:
+            raise CurQueryError(
+                f"Unknown CUR partition scheme {partition_scheme!r}; "
+                f"expected one of {', '.join(PARTITION_SCHEMES)}"
+            )
+        self.table = table
+        self.partition_scheme = partition_scheme
+
+    def partition_predicate(self, start: date, end: date) -> Optional[str]:
+        """
+        Returns the predicate selecting only the partitions that can hold
+        rows for [start, end). The values are derived from dates, not user
+        input, and are inlined so Athena prunes partitions while planning.
+        """
+        periods = billing_periods(start, end)
+        if self.partition_scheme == "billing_period":
+            values = ", ".join(f"'{year:04d}-{month:02d}'" for year, month in periods)
+            return f"billing_period IN ({values})"
+        if self.partition_scheme == "year_month":
+            # Legacy CUR partitions are strings without zero padding, e.g. month='6'
+            by_year: Dict[int, List[str]] = {}
+            for year, month in periods:
+                by_year.setdefault(year, []).append(f"'{month}'")
+            clauses = [
+                f"(year = '{year}' AND month IN ({', '.join(months)}))"
+                for year, months in by_year.items()
+            ]
+            return clauses[0] if len(clauses) == 1 else "(" + " OR ".join(clauses) + ")"
+        return None
+
+    def _where(self, start: date, end: date, product_code: Optional[str],
+               conditions: List[str]) -> Tuple[str, List[Any]]:
+        if not start < end:
+            raise CurQueryError(f"Empty CUR time range: {start} to {end}")
+        predicates = []
+        partitions = self.partition_predicate(start, end)
+        if partitions:
+            predicates.append(partitions)
+        predicates.append("line_item_usage_start_date >= ?")
+        predicates.append("line_item_usage_start_date < ?")
+        parameters: List[Any] = [
+            datetime.combine(start, time.min).strftime(USAGE_START_FORMAT),
+            datetime.combine(end, time.min).strftime(USAGE_START_FORMAT),
+        ]
+        predicates.extend(conditions)
+        if product_code:
+            predicates.append("line_item_product_code = ?")
+            parameters.append(product_code)
+        return "\n            AND ".join(predicates), parameters
+
+    def top_resources(self, start: date, end: date, limit: int = 10,
+                      product_code: Optional[str] = None) -> CurQuery:
+        """The most expensive resources with usage in [start, end)."""
+        where, parameters = self._where(start, end, product_code, [
+            "line_item_line_item_type = 'Usage'",
+            "line_item_unblended_cost > 0",
+        ])
+        sql = f"""
+        SELECT
+            line_item_resource_id,
+            line_item_product_code,
+            line_item_usage_type,
+            SUM(line_item_unblended_cost) AS total_cost,
+            line_item_currency_code
+        FROM {quote_identifier(self.table)}
+        WHERE
+            {where}
+        GROUP BY
+            line_item_resource_id,
+            line_item_product_code,
+            line_item_usage_type,
+            line_item_currency_code
+        ORDER BY total_cost DESC
+        LIMIT {validate_limit(limit)}
+        """
+        return CurQuery(sql, parameters)
+
+    def usage_by_operation(self, start: date, end: date, limit: int = 10,
+                           product_code: Optional[str] = None) -> CurQuery:
+        """Cost per API operation (e.g. RunInstances, PutObject) in [start, end)."""
+        where, parameters = self._where(start, end, product_code, [
+            "line_item_line_item_type = 'Usage'",
+        ])
+        sql = f"""
+        SELECT
+            line_item_operation,
+            line_item_product_code,
+            SUM(line_item_unblended_cost) AS total_cost
+        FROM {quote_identifier(self.table)}
+        WHERE
+            {where}
+        GROUP BY
+            line_item_operation,
+            line_item_product_code
+        ORDER BY total_cost DESC
+        LIMIT {validate_limit(limit)}
+        """
+        return CurQuery(sql, parameters)
+
+
+def trailing_days(days: int, today: Optional[date] = None) -> Tuple[date, date]:
+    """Returns the half-open range from ``days`` days ago through the end of today."""
+    today = today or date.today()
+    return today - timedelta(days=days), today + timedelta(days=1)
+
+
+cur_query_builder = CurQueryBuilder(
+    table=settings.AWS_ATHENA_TABLE,
+    partition_scheme=settings.AWS_CUR_PARTITION_SCHEME
+)
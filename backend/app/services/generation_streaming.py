@@ -0,0 +1,152 @@
+"""Word-by-word streaming of seq2seq generation.
+
+``model.generate`` blocks until the whole sequence is done, although the
+first words exist long before that. ``GenerationStreamer`` runs it on a
+bounded pool of worker threads and gives it two hooks:
+
+* a transformers ``TextStreamer`` that hands each decoded word to the
+  caller's event loop;
+* a stopping criterion that ends generation at the next step once the
+  consumer has gone away, so nothing is generated for a closed connection.
+
+Transformers is imported only when the first stream starts.
+"""
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+@functools.lru_cache(maxsize=None)
+def _stream_classes():
+    # pylint: disable=import-outside-toplevel
+    import torch
+    from transformers import StoppingCriteria, TextStreamer
+
+    class CallbackTextStreamer(TextStreamer):
+        """Passes each finished word to ``emit`` instead of printing it."""
+
+        def __init__(self, tokenizer, emit: Callable[[str], None]):
+            super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+            self.emit = emit
+
+        def on_finalized_text(self, text: str, stream_end: bool = False):
+            if text:
+                self.emit(text)
+
+    class CancelledCriteria(StoppingCriteria):
+        def __init__(self, cancelled: threading.Event):
+            self.cancelled = cancelled
+
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full((input_ids.shape[0],), self.cancelled.is_set(), dtype=torch.bool)
+
+    return CallbackTextStreamer, CancelledCriteria
+
+
+def generate_streaming(model, tokenizer, device, text: str, emit: Callable[[str], None],
+                       cancelled: threading.Event, input_max_length: int, **generate_kwargs: Any) -> None:
+    """Generates for one input, calling ``emit`` with each word, until done or ``cancelled`` is set."""
+    # pylint: disable=import-outside-toplevel
+    import torch
+    from transformers import StoppingCriteriaList
+
+    streamer_class, criteria_class = _stream_classes()
+    inputs = tokenizer([text], return_tensors="pt", padding=True, truncation=True, max_length=input_max_length)
+    inputs = {k: v.to(device) for k, v in inputs.items()}
+    with torch.inference_mode():
+        model.generate(**inputs, **generate_kwargs, streamer=streamer_class(tokenizer, emit),
+                       stopping_criteria=StoppingCriteriaList([criteria_class(cancelled)]))
+
+
+class GenerationStreamer:
+    def __init__(self, max_concurrent: int, name: str = "generation-stream"):
+        self.max_concurrent = max(1, max_concurrent)
+        self.name = name
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._active = 0
+        self._completed = 0
+        self._cancelled = 0
+        self._failed = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix=self.name)
+            return self._executor
+
+    async def stream(self, model, tokenizer, device, text: str, **generation: Any) -> AsyncIterator[str]:
+        """
+        Yields the generated text word by word. Closing the iterator early,
+        e.g. because the client disconnected, stops the generation; streams
+        beyond ``max_concurrent`` wait for a free thread.
+        """
+        loop = asyncio.get_running_loop()
+        pieces: "asyncio.Queue[Any]" = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def emit(item: Any) -> None:
+            try:
+                loop.call_soon_threadsafe(pieces.put_nowait, item)
+            except RuntimeError:
+                cancelled.set()  # The event loop has closed
+
+        def run() -> None:
+            if cancelled.is_set():
+                return
+            try:
+                generate_streaming(model, tokenizer, device, text, emit, cancelled, **generation)
+            except Exception as exc:  # pylint: disable=broad-except
+                emit(exc)
+            else:
+                emit(_DONE)
+
+        future = self._get_executor().submit(run)
+        with self._lock:
+            self._active += 1
+        outcome = "cancelled"
+        try:
+            while True:
+                item = await pieces.get()
+                if item is _DONE:
+                    outcome = "completed"
+                    return
+                if isinstance(item, Exception):
+                    outcome = "failed"
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+            future.cancel()
+            with self._lock:
+                self._active -= 1
+                if outcome == "completed":
+                    self._completed += 1
+                elif outcome == "failed":
+                    self._failed += 1
+                else:
+                    self._cancelled += 1
+                    logger.info("%s stopped generating for a closed stream", self.name)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "active": self._active,
+                "completed": self._completed,
+                "cancelled": self._cancelled,
+                "failed": self._failed,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,208 @@
+"""Dynamic micro-batching for model inference.
+
+A seq2seq ``generate`` call over a padded batch of N inputs costs far less
+than N single-input calls, and concurrent single-input calls only fight over
+the same CPU cores. ``InferenceBatcher`` queues inputs from any thread or
+event loop; a worker thread takes the first waiting input, gathers more for
+up to ``max_wait_ms`` or until ``max_batch_size`` are collected, runs one
+batched call and hands every caller its own result. With ``workers`` above
+one, that many threads form and run batches side by side, e.g. one per
+inference process.
+
+Caller-formed batches (``submit_batch``, e.g. the chunks of a large batch
+request) only run when no single input is waiting, so an interactive
+request queued behind a long batch waits for at most the chunk in progress.
+"""
+import asyncio
+import collections
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+BatchFunction = Callable[[List[Any]], Sequence[Any]]
+
+_STOP = object()
+
+
+class _Batch:
+    """A caller-formed batch that is processed on its own, never merged."""
+
+    def __init__(self, items: List[Any], future: Future):
+        self.items = items
+        self.future = future
+
+
+class InferenceBatcher:
+    def __init__(self, process_batch: BatchFunction, max_batch_size: int, max_wait_ms: float,
+                 name: str = "inference-batcher", workers: int = 1):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.name = name
+        self.workers = max(1, workers)
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._held: "collections.deque[_Batch]" = collections.deque()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._largest_batch = 0
+        self._busy_seconds = 0.0
+
+    def submit(self, item: Any) -> Future:
+        """Queues one input and returns a future for its result."""
+        future: Future = Future()
+        self._ensure_workers()
+        self._queue.put((item, future))
+        return future
+
+    async def run(self, item: Any) -> Any:
+        """Queues one input and awaits its result."""
+        return await asyncio.wrap_future(self.submit(item))
+
+    def submit_batch(self, items: List[Any]) -> Future:
+        """
+        Queues an already-formed batch, e.g. a length-sorted chunk, to run as
+        one call on the worker; the future resolves to the list of results.
+        """
+        future: Future = Future()
+        self._ensure_workers()
+        self._queue.put(_Batch(list(items), future))
+        return future
+
+    async def run_batch(self, items: List[Any]) -> List[Any]:
+        """Queues an already-formed batch and awaits its results."""
+        return await asyncio.wrap_future(self.submit_batch(items))
+
+    def _ensure_workers(self) -> None:
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"{self.name}-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _take(self, deadline: Optional[float]) -> Any:
+        """
+        The next single input (or stop marker), waiting until ``deadline``
+        or, when it is None, for as long as it takes. Caller-formed batches
+        met on the way are set aside to run once no single input is waiting.
+        """
+        while True:
+            if deadline is None:
+                entry = self._queue.get()
+            else:
+                remaining = deadline - time.monotonic()
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            if not isinstance(entry, _Batch):
+                return entry
+            self._held.append(entry)
+            if deadline is None:
+                # Something can run now; only take single inputs already queued
+                deadline = time.monotonic()
+
+    def _collect(self) -> Tuple[Union[_Batch, List[Tuple[Any, Future]]], bool]:
+        # Wait for the first single input only when no set-aside batch could run instead
+        while True:
+            try:
+                first = self._take(time.monotonic() if self._held else None)
+                break
+            except queue.Empty:
+                try:
+                    return self._held.popleft(), False
+                except IndexError:  # another worker took it
+                    continue
+        if first is _STOP:
+            try:
+                held = self._held.popleft()
+            except IndexError:
+                return [], True
+            # Run the batches accepted before the stop first
+            self._queue.put(_STOP)
+            return held, False
+        batch = [first]
+        # Keep the window open for max_wait
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                entry = self._take(deadline)
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(entry)
+        return batch, False
+
+    def _work(self) -> None:
+        while True:
+            batch, stop = self._collect()
+            if isinstance(batch, _Batch):
+                if batch.future.set_running_or_notify_cancel():
+                    self._process_batch(batch)
+                continue
+            # Callers that were cancelled while queued need no result
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if batch:
+                self._process(batch)
+            if stop:
+                return
+
+    def _call(self, items: List[Any]) -> List[Any]:
+        started = time.perf_counter()
+        try:
+            results = list(self.process_batch(items))
+            if len(results) != len(items):
+                raise RuntimeError(f"{self.name} returned {len(results)} results for {len(items)} inputs")
+            return results
+        except Exception:
+            logger.exception("%s failed on a batch of %d", self.name, len(items))
+            raise
+        finally:
+            with self._lock:
+                self._batches += 1
+                self._items += len(items)
+                self._largest_batch = max(self._largest_batch, len(items))
+                self._busy_seconds += time.perf_counter() - started
+
+    def _process(self, batch: List[Tuple[Any, Future]]) -> None:
+        try:
+            results = self._call([item for item, _ in batch])
+        except Exception as exc:  # pylint: disable=broad-except
+            for _, future in batch:
+                future.set_exception(exc)
+        else:
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def _process_batch(self, batch: _Batch) -> None:
+        try:
+            batch.future.set_result(self._call(batch.items))
+        except Exception as exc:  # pylint: disable=broad-except
+            batch.future.set_exception(exc)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": self._items / self._batches if self._batches else 0.0,
+                "largest_batch": self._largest_batch,
+                "queued": self._queue.qsize() + len(self._held),
+                "busy_seconds": self._busy_seconds,
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stops the workers after the inputs already queued; new ones start on next submit."""
+        with self._lock:
+            threads, self._threads = [thread for thread in self._threads if thread.is_alive()], []
+        for _ in threads:
+            self._queue.put(_STOP)
+        if wait:
+            for thread in threads:
+                thread.join()
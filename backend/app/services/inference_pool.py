@@ -0,0 +1,277 @@
+"""Process pool of model inference workers.
+
+With one model in the API process, every request thread shares it, and
+torch's intra-op threads compete for the same cores with each other and with
+the web server's threads. ``InferencePool`` runs ``workers`` processes
+instead. Each worker:
+
+* limits torch to ``threads_per_worker`` intra-op threads;
+* is pinned to its own block of cores when there are enough to go round;
+* builds its model once by calling ``setup``;
+* runs jobs under ``torch.inference_mode``.
+
+A job goes to the ready worker with the fewest jobs in flight. A worker that
+dies is restarted, and the jobs it held fail with InferenceWorkerError.
+
+Workers are spawned rather than forked. Forking a process that has already
+started OpenMP or torch threads can deadlock the child. As a result each
+worker holds its own copy of the weights.
+"""
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Runs in the worker and returns the job handler; must be picklable
+WorkerSetup = Callable[[], Callable[..., Any]]
+
+# Messages from workers, tagged with the worker index or the job id
+_READY = "ready"
+_FAILED = "failed"
+_RESULT = "result"
+_ERROR = "error"
+
+
+class InferenceWorkerError(RuntimeError):
+    """Raised when a worker fails to load, fails a job or exits while running one."""
+
+
+def available_cores() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def worker_cores(index: int, workers: int, threads_per_worker: int,
+                 cores: List[int]) -> Optional[List[int]]:
+    """
+    The cores worker ``index`` is pinned to, or None when the cores cannot
+    give every worker its own block and the OS should place the threads.
+    """
+    if workers * threads_per_worker > len(cores):
+        return None
+    return cores[index * threads_per_worker:(index + 1) * threads_per_worker]
+
+
+def _worker_main(index: int, setup: WorkerSetup, threads: int, cores: Optional[List[int]],
+                 requests: Any, results: Any) -> None:
+    # Before torch is imported, so its OpenMP pool is sized to match
+    os.environ["OMP_NUM_THREADS"] = os.environ["MKL_NUM_THREADS"] = str(threads)
+    try:
+        if cores and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+        import torch  # pylint: disable=import-outside-toplevel
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+        handler = setup()
+    except Exception:  # pylint: disable=broad-except
+        results.put((_FAILED, index, traceback.format_exc()))
+        return
+    results.put((_READY, index, os.getpid()))
+
+    while True:
+        job = requests.get()
+        if job is None:
+            return
+        job_id, args, kwargs = job
+        try:
+            with torch.inference_mode():
+                result = handler(*args, **kwargs)
+        except Exception:  # pylint: disable=broad-except
+            results.put((_ERROR, job_id, traceback.format_exc()))
+        else:
+            results.put((_RESULT, job_id, result))
+
+
+class _Worker:
+    def __init__(self, index: int, process: Any, requests: Any):
+        self.index = index
+        self.process = process
+        self.requests = requests
+        self.ready = False
+        self.in_flight: Set[int] = set()
+        self.completed = 0
+
+
+class InferencePool:
+    def __init__(self, setup: WorkerSetup, workers: int, threads_per_worker: int = 0,
+                 pin_cores: bool = True, name: str = "inference-pool", poll_interval: float = 0.5):
+        cores = available_cores()
+        self.setup = setup
+        self.workers = max(1, workers)
+        # 0 splits the cores evenly between the workers
+        self.threads_per_worker = threads_per_worker or max(1, len(cores) // self.workers)
+        self.name = name
+        self.poll_interval = poll_interval
+        self._cores = cores if pin_cores else []
+        self._context = multiprocessing.get_context("spawn")
+        self._results = self._context.Queue()
+        self._workers: List[_Worker] = []
+        self._jobs: Dict[int, Tuple[_Worker, Future]] = {}
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._collector: Optional[threading.Thread] = None
+        self._stopping = False
+        self._load_error: Optional[str] = None
+        self._dispatched = 0
+        self._failed = 0
+        self._restarts = 0
+
+    def start(self) -> None:
+        """Spawns the workers; they load their models in parallel."""
+        with self._lock:
+            if self._collector is not None:
+                return
+            self._workers = [self._spawn(index) for index in range(self.workers)]
+            self._collector = threading.Thread(target=self._collect, name=f"{self.name}-collector", daemon=True)
+            self._collector.start()
+
+    def _spawn(self, index: int) -> _Worker:
+        requests = self._context.Queue()
+        cores = worker_cores(index, self.workers, self.threads_per_worker, self._cores) if self._cores else None
+        process = self._context.Process(
+            target=_worker_main, name=f"{self.name}-{index}", daemon=True,
+            args=(index, self.setup, self.threads_per_worker, cores, requests, self._results)
+        )
+        process.start()
+        return _Worker(index, process, requests)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> None:
+        """Blocks until every worker has loaded; raises InferenceWorkerError if one could not."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while not all(worker.ready for worker in self._workers):
+                if self._load_error is not None:
+                    raise InferenceWorkerError(f"{self.name} worker failed to load:\n{self._load_error}")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise InferenceWorkerError(f"{self.name} workers did not load within {timeout}s")
+                self._changed.wait(remaining)
+
+    def submit(self, *args: Any, **kwargs: Any) -> Future:
+        """Sends a job to the least-loaded ready worker and returns a future for its result."""
+        future: Future = Future()
+        with self._lock:
+            candidates = [worker for worker in self._workers if worker.ready]
+            if self._stopping or not candidates:
+                raise InferenceWorkerError(f"{self.name} has no ready workers")
+            worker = min(candidates, key=lambda candidate: len(candidate.in_flight))
+            job_id = next(self._job_ids)
+            worker.in_flight.add(job_id)
+            self._jobs[job_id] = (worker, future)
+            self._dispatched += 1
+        worker.requests.put((job_id, args, kwargs))
+        return future
+
+    async def run(self, *args: Any, **kwargs: Any) -> Any:
+        return await asyncio.wrap_future(self.submit(*args, **kwargs))
+
+    def _collect(self) -> None:
+        last_check = time.monotonic()
+        while not self._stopping:
+            try:
+                kind, key, payload = self._results.get(timeout=self.poll_interval)
+            except queue.Empty:
+                kind = None
+            if kind is not None:
+                self._handle(kind, key, payload)
+            if time.monotonic() - last_check >= self.poll_interval:
+                self._check_workers()
+                last_check = time.monotonic()
+
+    def _handle(self, kind: str, key: int, payload: Any) -> None:
+        with self._changed:
+            if kind == _READY:
+                self._workers[key].ready = True
+                self._changed.notify_all()
+                return
+            if kind == _FAILED:
+                logger.error("%s worker %d failed to load:\n%s", self.name, key, payload)
+                self._load_error = payload
+                self._changed.notify_all()
+                return
+            worker, future = self._jobs.pop(key, (None, None))
+            if worker is None:
+                return  # Already failed when its worker died
+            worker.in_flight.discard(key)
+            worker.completed += 1
+            if kind == _ERROR:
+                self._failed += 1
+        if future.done():
+            return  # Cancelled by the caller
+        if kind == _ERROR:
+            future.set_exception(InferenceWorkerError(payload))
+        else:
+            future.set_result(payload)
+
+    def _check_workers(self) -> None:
+        failed: List[Future] = []
+        with self._changed:
+            for index, worker in enumerate(self._workers):
+                if self._stopping or worker.process.is_alive():
+                    continue
+                exitcode = worker.process.exitcode
+                failed.extend(self._jobs.pop(job_id)[1] for job_id in worker.in_flight)
+                if not worker.ready:
+                    # Died while loading; restarting would only fail again
+                    if self._load_error is None:
+                        self._load_error = f"exited with code {exitcode}"
+                    self._changed.notify_all()
+                    continue
+                logger.error("%s worker %d exited with code %s; restarting it", self.name, index, exitcode)
+                self._workers[index] = self._spawn(index)
+                self._restarts += 1
+            self._failed += len(failed)
+        for future in failed:
+            future.set_exception(InferenceWorkerError(f"{self.name} worker exited while running the job"))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": len(self._workers),
+                "ready": sum(worker.ready for worker in self._workers),
+                "threads_per_worker": self.threads_per_worker,
+                "in_flight": [len(worker.in_flight) for worker in self._workers],
+                "completed": [worker.completed for worker in self._workers],
+                "dispatched": self._dispatched,
+                "failed": self._failed,
+                "restarts": self._restarts,
+            }
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Stops the workers after their queued jobs; jobs still unanswered then fail."""
+        with self._lock:
+            if self._stopping:
+                return
+            self._stopping = True
+            workers = list(self._workers)
+        for worker in workers:
+            worker.requests.put(None)
+        deadline = time.monotonic() + timeout
+        for worker in workers:
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+        if self._collector is not None:
+            self._collector.join()
+        # Results that arrived before the workers exited
+        while True:
+            try:
+                self._handle(*self._results.get_nowait())
+            except queue.Empty:
+                break
+        for worker in workers:
+            if worker.process.is_alive():
+                worker.process.terminate()
+        with self._lock:
+            pending, self._jobs = list(self._jobs.values()), {}
+        for _, future in pending:
+            future.set_exception(InferenceWorkerError(f"{self.name} shut down before the job finished"))
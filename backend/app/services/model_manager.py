@@ -0,0 +1,157 @@
+"""Lazy, background loading of the recommendation model.
+
+Importing torch and transformers and reading the model weights takes seconds.
+``ModelManager`` defers all of it: nothing heavy is imported until ``start()``
+is called from the application's startup hook, and the load then runs on a
+background thread so cost endpoints serve immediately while the model warms up.
+"""
+import functools
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.inference_backends import load_model, load_text_generator, validate_backend
+from app.services.inference_pool import InferencePool
+
+logger = logging.getLogger(__name__)
+
+NOT_STARTED = "not_started"
+LOADING = "loading"
+READY = "ready"
+UNAVAILABLE = "unavailable"  # No model directory; mock mode may still answer
+FAILED = "failed"
+
+
+class ModelManager:
+    def __init__(self, model_path: str, backend: str = "torch", workers: int = 0, threads_per_worker: int = 0):
+        self.model_path = model_path
+        self.backend = validate_backend(backend)
+        # With workers, the model is loaded in that many processes instead of this one
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.model: Optional[Any] = None
+        self.tokenizer: Optional[Any] = None
+        self.device: Optional[Any] = None
+        self.pool: Optional[InferencePool] = None
+        self._state = NOT_STARTED
+        self._error: Optional[str] = None
+        self._timings: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._loaded = threading.Event()
+
+    @property
+    def state(self) -> str:
+        # Tests and tools may install a model or pool directly
+        if self.pool is not None or (self.model is not None and self.tokenizer is not None):
+            return READY
+        return self._state
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def start(self) -> None:
+        """Starts loading on a background thread; later calls are no-ops."""
+        with self._lock:
+            if self._state != NOT_STARTED:
+                return
+            self._state = LOADING
+            self._thread = threading.Thread(target=self._load, name="model-loader", daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until the load attempt has finished; returns whether the model is ready."""
+        self._loaded.wait(timeout)
+        return self.ready
+
+    def load(self) -> None:
+        """Loads synchronously, e.g. for scripts that need the model right away."""
+        with self._lock:
+            if self._state not in (NOT_STARTED, FAILED):
+                return
+            self._state = LOADING
+        self._load()
+
+    def _load(self) -> None:
+        started = time.perf_counter()
+        try:
+            if not (os.path.exists(self.model_path) and os.listdir(self.model_path)):
+                logger.warning("Model directory %s not found or empty. Skipping model load.", self.model_path)
+                self._finish(UNAVAILABLE)
+                return
+
+            if self.workers > 0:
+                self._start_pool(started)
+                return
+
+            # pylint: disable=import-outside-toplevel
+            import torch  # pylint: disable=unused-import
+            from transformers import AutoTokenizer
+            imported = time.perf_counter()
+            self._timings["import_seconds"] = imported - started
+
+            tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+            model, device = load_model(self.model_path, self.backend)
+            self._timings["load_seconds"] = time.perf_counter() - imported
+
+            self.tokenizer, self.model, self.device = tokenizer, model, device
+            self._finish(READY)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.exception("Failed to load recommendation model from %s", self.model_path)
+            self._error = str(exc)
+            self._finish(FAILED)
+        finally:
+            self._timings["total_seconds"] = time.perf_counter() - started
+
+    def _start_pool(self, started: float) -> None:
+        pool = InferencePool(
+            functools.partial(load_text_generator, self.model_path, self.backend),
+            workers=self.workers,
+            threads_per_worker=self.threads_per_worker,
+            name="recommendation-workers"
+        )
+        pool.start()
+        try:
+            pool.wait_ready()
+        except Exception:
+            pool.shutdown()
+            raise
+        self._timings["load_seconds"] = time.perf_counter() - started
+        self.pool = pool
+        metrics.register("recommendation_workers", pool.stats)
+        self._finish(READY)
+
+    def shutdown(self) -> None:
+        """Stops the inference workers, if any."""
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def _finish(self, state: str) -> None:
+        with self._lock:
+            self._state = state
+        self._loaded.set()
+
+    def status(self) -> Dict[str, Any]:
+        """Readiness, load timings and the last load error, for /ready."""
+        status: Dict[str, Any] = {"ready": self.ready, "state": self.state, "backend": self.backend, **self._timings}
+        if self._error:
+            status["error"] = self._error
+        return status
+
+
+MODEL_PATH = os.getenv("RECOMMENDER_MODEL_PATH", "../../nlp/model")
+# Resolve to absolute path to avoid HFValidationError with relative paths
+if not os.path.isabs(MODEL_PATH):
+    MODEL_PATH = os.path.abspath(MODEL_PATH)
+
+model_manager = ModelManager(
+    MODEL_PATH,
+    backend=settings.RECOMMENDER_BACKEND,
+    workers=settings.RECOMMENDER_WORKERS,
+    threads_per_worker=settings.RECOMMENDER_WORKER_THREADS
+)
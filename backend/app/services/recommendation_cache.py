@@ -0,0 +1,89 @@
+"""Memoization of generated recommendations.
+
+Many requests boil down to the same short model input ("EC2: high usage"), and
+each generation costs hundreds of milliseconds while a cache lookup costs
+microseconds. Inputs are canonicalized before keying: keys are sorted and
+numbers are rounded to a few significant digits, so 1234.56 and 1229.9 hit the
+same entry. The key also covers the model version and the generation settings,
+so a new model or new settings never serve stale text.
+"""
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+
+class RecommendationCache:
+    def __init__(self, cache: ResultCache, path: str = ""):
+        self.cache = cache
+        self.path = path
+        self._lock = threading.Lock()
+        self._saved_seconds = 0.0
+
+    @staticmethod
+    def key(canonical_input: str, model_version: str, generation: Mapping[str, Any]) -> str:
+        payload = json.dumps([canonical_input, model_version, dict(generation)], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached recommendation and counts the generation time it saved."""
+        entry: Optional[Tuple[str, float]] = self.cache.get(key)
+        if entry is None:
+            return None
+        recommendation, generation_seconds = entry
+        with self._lock:
+            self._saved_seconds += generation_seconds
+        return recommendation
+
+    def set(self, key: str, recommendation: str, generation_seconds: float) -> None:
+        self.cache.set(key, [recommendation, generation_seconds])
+
+    def load(self) -> int:
+        """Restores entries persisted by ``save``; a no-op without a path."""
+        if not self.path:
+            return 0
+        try:
+            return self.cache.load(self.path)
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning("Ignoring unreadable recommendation cache %s: %s", self.path, exc)
+            return 0
+
+    def save(self) -> int:
+        if not self.path:
+            return 0
+        try:
+            return self.cache.save(self.path)
+        except OSError as exc:
+            logger.warning("Failed to persist recommendation cache to %s: %s", self.path, exc)
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self.cache.stats())
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        with self._lock:
+            stats["latency_saved_seconds"] = self._saved_seconds
+        return stats
+
+    def clear(self) -> None:
+        self.cache.clear()
+        with self._lock:
+            self._saved_seconds = 0.0
+
+
+recommendation_cache = RecommendationCache(
+    ResultCache(
+        ttl=settings.RECOMMENDER_CACHE_TTL,
+        max_entries=settings.RECOMMENDER_CACHE_MAX_ENTRIES,
+        max_bytes=settings.RECOMMENDER_CACHE_MAX_BYTES
+    ),
+    path=settings.RECOMMENDER_CACHE_PATH
+)
+metrics.register("recommendation_cache", recommendation_cache.stats)
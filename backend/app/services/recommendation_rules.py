@@ -0,0 +1,244 @@
+"""Deterministic recommendations for well-known cost patterns.
+
+A lot of traffic describes findings with a textbook answer: unattached EBS
+volumes, idle load balancers, cold S3 data, a large on-demand EC2 bill.
+Generating those costs a seq2seq forward pass per token, while a keyword
+lookup costs microseconds. ``RuleEngine`` answers such inputs itself and
+leaves everything else to the model.
+
+Every cost item ("EC2: idle, low CPU" is two items) is scanned once with an
+Aho-Corasick automaton over all rule keywords, so matching time does not grow
+with the number of rules. A rule applies to an item that names one of its
+services and either one of its signals or, for cost thresholds, a dollar
+value of at least ``min_cost``. A signal preceded by a negation in the same
+item ("no unattached volumes", "not idle") does not count. The engine only
+answers when every item is covered by a rule and the least confident of
+those rules reaches ``min_confidence``; a single unexplained item sends the
+whole input to the model, so a rule answer never drops part of what was
+asked.
+"""
+import re
+import threading
+from collections import Counter, deque
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+
+class KeywordIndex:
+    """
+    Aho-Corasick automaton over lowercase keywords. ``occurrences`` reports
+    every keyword that occurs as whole words in a text with its start, in one
+    pass over it; ``find`` reports just the keywords.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        for keyword in keywords:
+            self._add(keyword.lower())
+        self._link()
+
+    def _add(self, keyword: str) -> None:
+        state = 0
+        for char in keyword:
+            following = self._goto[state].get(char)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][char] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = following
+        if keyword not in self._output[state]:
+            self._output[state].append(keyword)
+
+    def _link(self) -> None:
+        """Sets failure links breadth first, merging each state's outputs with its fallback's."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[following] = self._goto[fallback].get(char, 0)
+                self._output[following] = self._output[following] + self._output[self._fail[following]]
+
+    def find(self, text: str) -> Set[str]:
+        return {keyword for keyword, _ in self.occurrences(text)}
+
+    def occurrences(self, text: str) -> List[Tuple[str, int]]:
+        text = text.lower()
+        found = []
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for keyword in self._output[state]:
+                start = end - len(keyword) + 1
+                if _word_boundary(text, start - 1) and _word_boundary(text, end + 1):
+                    found.append((keyword, start))
+        return found
+
+
+def _word_boundary(text: str, position: int) -> bool:
+    return position < 0 or position >= len(text) or not text[position].isalnum()
+
+
+_NEGATION = re.compile(r"\b(?:no|not|never|without)\b|n['\u2019]t\b")
+
+
+class Rule(NamedTuple):
+    """
+    Applies to a cost item naming one of ``services`` that also mentions one
+    of ``signals`` (when given) and costs at least ``min_cost`` (when given).
+    """
+
+    name: str
+    services: Tuple[str, ...]
+    recommendation: str
+    confidence: float
+    signals: Tuple[str, ...] = ()
+    min_cost: Optional[float] = None
+
+
+class RuleMatch(NamedTuple):
+    recommendation: str
+    confidence: float
+    rules: Tuple[str, ...]
+
+
+_IDLE = ("idle", "unused", "underutilized", "underutilised", "low cpu")
+
+DEFAULT_RULES: Tuple[Rule, ...] = (
+    # AWS
+    Rule("unattached-ebs", ("ebs",), "Snapshot and delete the unattached EBS volumes.", 0.95,
+         signals=("unattached", "detached", "orphaned")),
+    Rule("ebs-gp2", ("ebs",), "Migrate gp2 volumes to gp3 for about 20% lower cost.", 0.9,
+         signals=("gp2",)),
+    Rule("idle-ec2", ("ec2",), "Downsize or consolidate the underutilized EC2 instances.", 0.9,
+         signals=_IDLE),
+    Rule("stopped-ec2", ("ec2",), "Terminate long-stopped EC2 instances after snapshotting them.", 0.85,
+         signals=("stopped",)),
+    Rule("ec2-batch", ("ec2",), "Switch interruptible batch and CI workloads to spot instances.", 0.85,
+         signals=("batch", "ci jobs")),
+    Rule("idle-rds", ("rds",), "Downsize the RDS instance or move it to Aurora Serverless.", 0.9,
+         signals=_IDLE),
+    Rule("rds-off-hours", ("rds",), "Stop non-production RDS instances outside working hours.", 0.85,
+         signals=("dev database", "non-production", "nights and weekends")),
+    Rule("cold-s3", ("s3",), "Add an S3 lifecycle rule to move infrequently accessed data to Standard-IA or Glacier.",
+         0.9, signals=("infrequent access", "infrequently accessed", "rarely accessed", "not accessed", "cold")),
+    Rule("unattached-eip", ("elastic ip", "elastic ips", "eip", "eips"), "Release the unattached Elastic IPs.", 0.95,
+         signals=("unattached", "unassociated", "unused", "idle")),
+    Rule("idle-load-balancer", ("load balancer", "load balancers", "elb", "alb", "nlb"),
+         "Delete load balancers that have no registered targets.", 0.9,
+         signals=("no targets", "idle", "unused")),
+    # Azure
+    Rule("unattached-azure-disk", ("managed disk", "managed disks", "azure disk", "azure disks"),
+         "Delete unattached Azure managed disks.", 0.95, signals=("unattached",)),
+    Rule("idle-azure-vm", ("azure vm", "azure vms", "virtual machine", "virtual machines"),
+         "Resize or deallocate the underutilized Azure VMs.", 0.9, signals=_IDLE),
+    Rule("cold-azure-blob", ("blob", "blobs", "blob storage"), "Move rarely accessed blobs to the Cool tier.", 0.9,
+         signals=("infrequently accessed", "rarely accessed", "cold")),
+    # Monthly spend thresholds
+    Rule("ec2-spend", ("ec2",), "Cover the steady EC2 baseline with a Compute Savings Plan or Reserved Instances.",
+         0.8, min_cost=10000),
+    Rule("rds-spend", ("rds",), "Buy RDS Reserved Instances for databases that run around the clock.", 0.8,
+         min_cost=5000),
+    Rule("data-transfer-spend", ("data transfer",),
+         "Serve static content through CloudFront to cut data transfer costs.", 0.8, min_cost=2000),
+)
+
+_FINDING_SEPARATOR = re.compile(r"[,;]")
+
+
+def cost_findings(cost_data: Any) -> List[Tuple[str, Optional[float]]]:
+    """
+    Splits cost data into (text, dollar value) items, skipping what
+    ``cost_data_to_text`` leaves out of the model input. Several findings in
+    one string value become separate items under the same key.
+    """
+    if not isinstance(cost_data, dict):
+        return [(part.strip(), None) for part in _FINDING_SEPARATOR.split(str(cost_data)) if part.strip()]
+    findings: List[Tuple[str, Optional[float]]] = []
+    for key, value in cost_data.items():
+        if isinstance(value, bool):
+            continue
+        if isinstance(value, (int, float)) and value > 0:
+            findings.append((f"{key}: {value}", float(value)))
+        elif isinstance(value, str):
+            parts = [part.strip() for part in _FINDING_SEPARATOR.split(value) if part.strip()]
+            findings.extend((f"{key}: {part}", None) for part in parts or [""])
+    return findings
+
+
+class RuleEngine:
+    def __init__(self, rules: Sequence[Rule], min_confidence: float):
+        self.rules = tuple(rules)
+        self.min_confidence = min_confidence
+        self._index = KeywordIndex(term for rule in self.rules for term in rule.services + rule.signals)
+        self._lock = threading.Lock()
+        self._checked = 0
+        self._matched = 0
+        self._hits: Counter = Counter()
+
+    def _rule_for(self, text: str, value: Optional[float]) -> Optional[Rule]:
+        """The most confident rule for one item; the earliest wins a tie."""
+        lowered = text.lower()
+        occurrences = self._index.occurrences(lowered)
+        terms = {keyword for keyword, _ in occurrences}
+        # "no unattached volumes" names the signal only to rule it out
+        affirmed = {keyword for keyword, start in occurrences if not _NEGATION.search(lowered, 0, start)}
+        best = None
+        for rule in self.rules:
+            if terms.isdisjoint(rule.services):
+                continue
+            if rule.signals and affirmed.isdisjoint(rule.signals):
+                continue
+            if rule.min_cost is not None and (value is None or value < rule.min_cost):
+                continue
+            if best is None or rule.confidence > best.confidence:
+                best = rule
+        return best
+
+    def match(self, cost_data: Any) -> Optional[RuleMatch]:
+        """The rules' recommendation, or None when the model has to answer."""
+        result = None
+        rules = [self._rule_for(text, value) for text, value in cost_findings(cost_data)]
+        if rules and all(rules):
+            confidence = min(rule.confidence for rule in rules)
+            if confidence >= self.min_confidence:
+                names = tuple(dict.fromkeys(rule.name for rule in rules))
+                recommendations = dict.fromkeys(rule.recommendation for rule in rules)
+                result = RuleMatch(" ".join(recommendations), confidence, names)
+        with self._lock:
+            self._checked += 1
+            if result is not None:
+                self._matched += 1
+                self._hits.update(result.rules)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rules": len(self.rules),
+                "checked": self._checked,
+                "matched": self._matched,
+                "fast_path_share": self._matched / self._checked if self._checked else 0.0,
+                "hits": dict(self._hits),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._checked = 0
+            self._matched = 0
+            self._hits.clear()
+
+
+recommendation_rules = RuleEngine(DEFAULT_RULES, settings.RECOMMENDER_RULES_MIN_CONFIDENCE)
+metrics.register("recommendation_rules", recommendation_rules.stats)
@@ -0,0 +1,138 @@
+"""Cost data in, recommendation text out.
+
+``Recommender`` is the one inference code path for the seq2seq recommender:
+the API wraps the model it has loaded in one, and ``nlp/recommend.py`` hands
+offline scripts one from ``Recommender.load``. Loading reads the tokenizer
+and weights from disk, so ``load`` keeps what it loaded for the life of the
+process, keyed by model directory, backend and device. Recommenders that
+only differ in generation settings share those weights.
+
+The API sorts cost data keys and rounds numbers to a few significant digits
+before generating, so inputs that share a cache entry share a prompt too. A
+Recommender made with the same ``significant_digits`` builds the same prompt.
+"""
+import functools
+import itertools
+import math
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.services.inference_backends import generate_texts, load_model
+
+DEFAULT_INPUT_MAX_LENGTH = 64
+DEFAULT_MAX_LENGTH = 32
+
+
+def cost_data_to_text(cost_data: Any) -> str:
+    """Turns cost data into the model's input text."""
+    # Simple preprocessing: extract high-cost services/resources
+    # (You can improve this logic as needed)
+    if not isinstance(cost_data, dict):
+        return str(cost_data)
+    items = []
+    for k, v in cost_data.items():
+        if isinstance(v, (int, float)) and v > 0:
+            items.append(f"{k}: {v}")
+        elif isinstance(v, str):
+            items.append(f"{k}: {v}")
+    return ", ".join(items)
+
+
+def bucket_number(value: float, significant_digits: int) -> float:
+    """Rounds a number to ``significant_digits`` significant digits."""
+    if value == 0 or not math.isfinite(value):
+        return value
+    digits = significant_digits - int(math.floor(math.log10(abs(value)))) - 1
+    rounded = round(value, digits)
+    return int(rounded) if float(rounded).is_integer() else rounded
+
+
+def canonicalize_cost_data(cost_data: Any, significant_digits: int) -> Any:
+    """Returns cost_data with keys sorted and numbers bucketed."""
+    if not isinstance(cost_data, dict):
+        return cost_data
+    canonical = {}
+    for key in sorted(cost_data, key=str):
+        value = cost_data[key]
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = bucket_number(value, significant_digits)
+        canonical[key] = value
+    return canonical
+
+
+def model_input(cost_data: Any, significant_digits: Optional[int] = None) -> str:
+    """
+    The model's input text for cost data, canonicalized first when
+    ``significant_digits`` is given.
+    """
+    if significant_digits is not None:
+        cost_data = canonicalize_cost_data(cost_data, significant_digits)
+    return cost_data_to_text(cost_data)
+
+
+@functools.lru_cache(maxsize=None)
+def _load(model_dir: str, backend: str, device: Optional[str]) -> Tuple[Any, Any, Any]:
+    from transformers import AutoTokenizer  # pylint: disable=import-outside-toplevel
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model, resolved_device = load_model(model_dir, backend, device)
+    return model, tokenizer, resolved_device
+
+
+class Recommender:
+    def __init__(self, model, tokenizer, device, input_max_length: int = DEFAULT_INPUT_MAX_LENGTH,
+                 max_length: int = DEFAULT_MAX_LENGTH, max_new_tokens: Optional[int] = None,
+                 num_beams: int = 1, significant_digits: Optional[int] = None):
+        """
+        ``max_new_tokens``, when set, takes precedence over ``max_length``.
+        ``num_beams`` 1 decodes greedily; more runs beam search.
+        ``significant_digits`` canonicalizes cost data the way the API does
+        (RECOMMENDER_CACHE_SIGNIFICANT_DIGITS); None uses it as given.
+        """
+        if num_beams < 1:
+            raise ValueError("num_beams must be at least 1")
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.significant_digits = significant_digits
+        self.generation: Dict[str, Any] = {"input_max_length": input_max_length}
+        if max_new_tokens is not None:
+            self.generation["max_new_tokens"] = max_new_tokens
+        else:
+            self.generation["max_length"] = max_length
+        if num_beams > 1:
+            self.generation["num_beams"] = num_beams
+
+    @classmethod
+    def load(cls, model_dir: str, backend: str = "torch", device: Optional[str] = None,
+             **generation: Any) -> "Recommender":
+        """
+        Wraps the model in ``model_dir``, loading it only the first time this
+        process asks for that directory, backend and device. ``device`` None
+        picks CUDA when available for the torch backend.
+        """
+        model, tokenizer, resolved_device = _load(os.path.abspath(model_dir), backend, device)
+        return cls(model, tokenizer, resolved_device, **generation)
+
+    def generate(self, input_texts: List[str]) -> List[str]:
+        """Runs one padded, batched generate call over already preprocessed inputs."""
+        return generate_texts(self.model, self.tokenizer, self.device, input_texts, **self.generation)
+
+    def recommend(self, cost_data: Any) -> str:
+        """Recommendation for a cost data dict (or a ready-made input string)."""
+        return self.generate([model_input(cost_data, self.significant_digits)])[0]
+
+    def recommend_many(self, cost_data: Iterable[Any], batch_size: int = 16) -> Iterator[str]:
+        """
+        Yields a recommendation per item, in order, generating ``batch_size``
+        items per call. The input is consumed lazily, so it may be a
+        generator over a large file.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        items = iter(cost_data)
+        while True:
+            batch = [model_input(item, self.significant_digits) for item in itertools.islice(items, batch_size)]
+            if not batch:
+                return
+            yield from self.generate(batch)
@@ -0,0 +1,154 @@
+"""In-process cache for query and inference results.
+
+Entries are keyed by a hash of the normalized query text and its parameters,
+expire after a TTL and are evicted least-recently-used first once either the
+entry count or the approximate total size in bytes exceeds its bound. A cache
+can be saved to and restored from a JSON file to survive restarts.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple
+
+# Single-quoted literals (with '' escapes) and double-quoted identifiers are
+# kept verbatim; everything else has its whitespace collapsed.
+_SQL_TOKENS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\s+|[^'\"\s]+")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Collapses whitespace outside quoted literals and drops a trailing
+    semicolon, so reformatting a query does not change its cache key.
+    """
+    parts = []
+    for token in _SQL_TOKENS.findall(sql):
+        parts.append(" " if token.isspace() else token)
+    return "".join(parts).strip().rstrip(";").rstrip()
+
+
+def query_cache_key(sql: str, parameters: Optional[Sequence[Any]] = None) -> str:
+    """Returns the cache key for a query and its execution parameters."""
+    payload = json.dumps([normalize_sql(sql), list(parameters or [])], default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def estimate_size(value: Any) -> int:
+    """Approximates the memory held by a JSON-like value by its serialized length."""
+    return len(json.dumps(value, default=str))
+
+
+class ResultCache:
+    """Thread-safe LRU cache with a TTL, an entry limit and a byte budget."""
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the cached value, or None when it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[2]
+
+    def set(self, key: Hashable, value: Any, size: Optional[int] = None) -> bool:
+        """
+        Stores a value and evicts the least recently used entries until the
+        bounds hold again. Values larger than the whole budget are not stored;
+        returns whether the value was cached.
+        """
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return False
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            self._insert(key, value, size, time.monotonic() + self.ttl)
+        return True
+
+    def _insert(self, key: Hashable, value: Any, size: int, expires: float) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires, size, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+    def save(self, path: str) -> int:
+        """
+        Writes the unexpired entries to a JSON file, least recently used
+        first, and returns how many were written. Keys and values must be
+        JSON-serializable.
+        """
+        now, wall_now = time.monotonic(), time.time()
+        with self._lock:
+            entries = [
+                [key, expires - now + wall_now, size, value]
+                for key, (expires, size, value) in self._entries.items()
+                if expires > now
+            ]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            json.dump({"entries": entries}, handle)
+        os.replace(temporary, path)
+        return len(entries)
+
+    def load(self, path: str) -> int:
+        """
+        Restores entries written by ``save`` that have not expired since and
+        returns how many were loaded; a missing file loads nothing.
+        """
+        if not os.path.exists(path):
+            return 0
+        with open(path, encoding="utf-8") as handle:
+            entries = json.load(handle)["entries"]
+        now, wall_now = time.monotonic(), time.time()
+        loaded = 0
+        with self._lock:
+            for key, expires_at, size, value in entries:
+                if expires_at > wall_now and size <= self.max_bytes:
+                    self._insert(key, value, size, now + expires_at - wall_now)
+                    loaded += 1
+        return loaded
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._hits = self._misses = self._evictions = 0
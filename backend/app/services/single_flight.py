@@ -0,0 +1,78 @@
+"""Coalescing of identical concurrent upstream calls.
+
+A dashboard reload fires several identical requests within milliseconds. With
+``single_flight.do(key, func)`` only the first caller for a key runs ``func``;
+callers arriving while it is in flight await the same call and share its
+result or exception. Nothing is kept once the call finishes, so a failure is
+seen by every waiter but never cached.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from app.core import metrics
+
+
+class _Call:
+    def __init__(self, loop: asyncio.AbstractEventLoop, task: "asyncio.Task[Any]"):
+        self.loop = loop
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._executed = 0
+        self._coalesced = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Returns the result of ``func()``, sharing one in-flight call among
+        all concurrent callers with the same key.
+
+        The call runs as its own task, so a waiter that is cancelled only
+        leaves it; the call itself is cancelled once no waiter is left.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            call = self._calls.get(key)
+            # Calls are bound to their event loop; never join one from another loop
+            if call is None or call.loop is not loop or call.task.done():
+                call = _Call(loop, loop.create_task(func()))
+                self._calls[key] = call
+                call.task.add_done_callback(lambda _, call=call: self._forget(key, call))
+                self._executed += 1
+            else:
+                self._coalesced += 1
+            call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            with self._lock:
+                call.waiters -= 1
+                abandoned = call.waiters == 0 and not call.task.done()
+            if abandoned:
+                call.task.cancel()
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executed": self._executed,
+                "coalesced": self._coalesced,
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._executed = self._coalesced = 0
+
+
+single_flight = SingleFlight()
+metrics.register("single_flight", single_flight.stats)
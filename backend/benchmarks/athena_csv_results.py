@@ -0,0 +1,78 @@
+"""Benchmark streaming Athena result CSVs against paging GetQueryResults.
+
+Writes a result CSV of ``--rows`` rows to a temporary directory and reads it
+through the filesystem-backed FakeS3Client, so no AWS account is needed. The
+paginated baseline is estimated from ``--page-latency`` per 1000-row page.
+From the backend directory:
+
+    python -m benchmarks.athena_csv_results --rows 3000000
+"""
+import argparse
+import csv
+import tempfile
+import time
+import tracemalloc
+
+from app.services.athena_results import CsvResultReader, converter_for
+from tests.fakes import FakeS3Client
+
+COLUMNS = [
+    ("line_item_usage_start_date", "timestamp"),
+    ("line_item_resource_id", "varchar"),
+    ("line_item_product_code", "varchar"),
+    ("line_item_usage_amount", "double"),
+    ("line_item_unblended_cost", "double"),
+]
+PRODUCTS = ["AmazonEC2", "AmazonS3", "AmazonRDS", "AWSLambda", "AmazonCloudWatch"]
+
+
+def write_results(s3: FakeS3Client, rows: int) -> str:
+    path = s3.path("athena-results", "benchmark.csv")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle, quoting=csv.QUOTE_ALL)
+        writer.writerow([name for name, _ in COLUMNS])
+        for index in range(rows):
+            writer.writerow([
+                f"2025-06-{index % 30 + 1:02d} 00:00:00.000",
+                f"arn:aws:ec2:us-east-1:123456789012:instance/i-{index:012x}",
+                PRODUCTS[index % len(PRODUCTS)],
+                f"{index % 24 + 1}.0",
+                f"{(index % 1000) * 0.0013:.6f}",
+            ])
+    return "s3://athena-results/benchmark.csv"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=3000000)
+    parser.add_argument("--page-latency", type=float, default=0.15,
+                        help="Seconds per GetQueryResults page for the estimate")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        s3 = FakeS3Client(root)
+        location = write_results(s3, args.rows)
+        size_mb = s3.head_object(Bucket="athena-results", Key="benchmark.csv")["ContentLength"] / 1e6
+        reader = CsvResultReader(s3, location, [converter_for(t) for _, t in COLUMNS])
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        rows = 0
+        total_cost = 0.0
+        for row in reader.iter_rows():
+            rows += 1
+            total_cost += row[4]
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    pages = -(-args.rows // 1000)
+    print(f"{rows} rows, {size_mb:.1f} MB CSV, total cost {total_cost:,.2f}")
+    print(f"csv stream   : {elapsed:7.2f}s  {rows / elapsed:,.0f} rows/s, peak {peak / 1e6:.1f} MB")
+    print(f"paged (est.) : {pages * args.page_latency:7.2f}s  {pages} GetQueryResults calls "
+          f"at {args.page_latency}s each")
+
+
+if __name__ == "__main__":
+    main()
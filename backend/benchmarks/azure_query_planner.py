@@ -0,0 +1,61 @@
+"""Benchmark the Azure query planner against one whole-range usage query.
+
+Runs against the local FakeCostManagementClient, so no Azure credentials are
+needed. From the backend directory:
+
+    python -m benchmarks.azure_query_planner --months 12 --latency 0.2
+"""
+import argparse
+import asyncio
+import time
+from datetime import date
+
+from app.services.azure_query_planner import AzureQueryPlanner, merge_resource_groups, plan_windows
+from tests.fakes import FakeCostManagementClient
+
+SCOPE = "/subscriptions/benchmark"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--resource-groups", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per API call")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    start = date(2025, 1, 1)
+    years, month = divmod(args.months, 12)
+    end = date(start.year + years, month + 1, 1)
+    windows = plan_windows(start, end)
+    resource_groups = [f"rg-{index:04d}" for index in range(args.resource_groups)]
+    print(f"{args.months} months, {len(windows)} windows, "
+          f"{(end - start).days * len(resource_groups)} rows, {args.latency}s per call")
+
+    fake = FakeCostManagementClient(start, (end - start).days, resource_groups,
+                                    page_size=args.page_size, latency=args.latency)
+    started = time.perf_counter()
+    rows = AzureQueryPlanner.fetch_window(fake, SCOPE, start, end)
+    baseline = time.perf_counter() - started
+    baseline_calls = fake.calls
+    expected, _, _ = merge_resource_groups(rows)
+
+    fake = FakeCostManagementClient(start, (end - start).days, resource_groups,
+                                    page_size=args.page_size, latency=args.latency)
+    planner = AzureQueryPlanner(max_concurrency=args.concurrency)
+    started = time.perf_counter()
+    rows = asyncio.run(planner.fetch_rows(fake, SCOPE, start, end))
+    planned = time.perf_counter() - started
+    planner.shutdown()
+    totals, _, _ = merge_resource_groups(rows)
+    assert totals == expected, "planner totals differ from the single-query totals"
+
+    print(f"single query : {baseline:7.3f}s  {baseline_calls} calls")
+    print(f"planner (x{args.concurrency}) : {planned:7.3f}s  {fake.calls} calls, "
+          f"max {fake.max_in_flight} in flight")
+    print(f"speedup      : {baseline / planned:7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
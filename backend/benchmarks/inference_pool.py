@@ -0,0 +1,83 @@
+"""Benchmark recommendation throughput of the worker pool as workers are added.
+
+For each worker count N it compares:
+- shared: one in-process model serving N request threads, with torch using
+  N * threads intra-op threads. This is what the API does without workers.
+- pool: N worker processes with ``--threads`` intra-op threads each, pinned
+  to their own cores when there are enough.
+
+Scaling is pool throughput divided by N times the one-worker throughput;
+1.00 is linear. Without ``--model-path`` a randomly initialised T5 forced to
+24 output tokens stands in for the trained model. From the backend directory:
+
+    python -m benchmarks.inference_pool --workers 1 2 4 8 16 --threads 1
+"""
+import argparse
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from app.services.inference_backends import load_text_generator
+from app.services.inference_pool import InferencePool, available_cores
+from benchmarks.recommendation_batching import INPUTS, report, run_clients
+from tests.fakes import tiny_model_worker
+
+GENERATION = {"input_max_length": 64, "max_length": 32}
+
+
+def worker_setup(model_path: str):
+    if model_path:
+        return functools.partial(load_text_generator, model_path)
+    return functools.partial(tiny_model_worker, fixed_length=24)
+
+
+def run_shared(model_path: str, workers: int, threads: int, requests: int) -> float:
+    generate = worker_setup(model_path)()
+    torch.set_num_threads(workers * threads)
+    generate(INPUTS[:1], **GENERATION)  # warm up
+    pool = ThreadPoolExecutor(max_workers=workers)
+    started = time.perf_counter()
+    latencies = run_clients(workers * 2, requests, lambda text: pool.submit(generate, [text], **GENERATION).result())
+    elapsed = time.perf_counter() - started
+    pool.shutdown()
+    report("shared", elapsed, latencies)
+    return len(latencies) / elapsed
+
+
+def run_pool(model_path: str, workers: int, threads: int, requests: int) -> float:
+    pool = InferencePool(worker_setup(model_path), workers=workers, threads_per_worker=threads)
+    pool.start()
+    pool.wait_ready()
+    for future in [pool.submit(INPUTS[:1], **GENERATION) for _ in range(workers)]:
+        future.result()  # warm up
+    started = time.perf_counter()
+    latencies = run_clients(workers * 2, requests, lambda text: pool.submit([text], **GENERATION).result()[0])
+    elapsed = time.perf_counter() - started
+    pool.shutdown()
+    report("pool", elapsed, latencies)
+    return len(latencies) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-path", default="", help="Trained model directory (default: tiny random T5)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--threads", type=int, default=1, help="Intra-op threads per worker")
+    parser.add_argument("--requests", type=int, default=0, help="Requests per run (default: 32 per worker)")
+    args = parser.parse_args()
+
+    print(f"{len(available_cores())} cores available, {args.threads} thread(s) per worker")
+    baseline = None
+    for workers in args.workers:
+        requests = args.requests or 32 * workers
+        print(f"workers {workers}:")
+        run_shared(args.model_path, workers, args.threads, requests)
+        throughput = run_pool(args.model_path, workers, args.threads, requests)
+        baseline = baseline or throughput / workers
+        print(f"  scaling    {throughput / (workers * baseline):8.2f}")
+
+
+if __name__ == "__main__":
+    main()
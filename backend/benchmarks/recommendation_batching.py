@@ -0,0 +1,111 @@
+"""Benchmark micro-batched recommendation inference against per-request generate.
+
+The baseline runs one ``generate`` call per request on a thread pool, which
+is what concurrent requests did before the batcher. Without ``--model-path``
+a randomly initialised T5 of similar size stands in for the trained model.
+From the backend directory:
+
+    python -m benchmarks.recommendation_batching --concurrency 1 4 16 32
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+import torch
+
+from app.services.inference_batcher import InferenceBatcher
+from tests.fakes import ByteTokenizer, tiny_seq2seq_model
+
+INPUTS = [
+    "EC2: high usage, S3: infrequent access",
+    "RDS: running 24/7, CPU: 4",
+    "EBS: unattached volumes",
+    "Lambda: 12000000 invocations",
+    "CloudFront: 850, S3: 1200",
+    "NAT Gateway: 310",
+]
+
+
+def load_model(model_path: str):
+    if not model_path:
+        return tiny_seq2seq_model(fixed_length=24), ByteTokenizer()
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer  # pylint: disable=import-outside-toplevel
+    return AutoModelForSeq2SeqLM.from_pretrained(model_path).eval(), AutoTokenizer.from_pretrained(model_path)
+
+
+def make_generate(model, tokenizer) -> Callable[[List[str]], List[str]]:
+    def generate(texts: List[str]) -> List[str]:
+        inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=64)
+        with torch.inference_mode():
+            output = model.generate(**inputs, max_length=32)
+        return [tokenizer.decode(ids, skip_special_tokens=True) for ids in output]
+    return generate
+
+
+def run_clients(concurrency: int, requests: int, call: Callable[[str], str]) -> List[float]:
+    """Runs ``concurrency`` closed-loop clients until ``requests`` calls are done."""
+    latencies: List[float] = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client():
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            started = time.perf_counter()
+            call(INPUTS[index % len(INPUTS)])
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def report(label: str, elapsed: float, latencies: List[float]) -> None:
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"  {label:<10} {len(latencies) / elapsed:8.1f} req/s   "
+          f"p50 {statistics.median(latencies) * 1000:8.1f} ms   p99 {p99 * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-path", default="", help="Trained model directory (default: tiny random T5)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--wait-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    model, tokenizer = load_model(args.model_path)
+    generate = make_generate(model, tokenizer)
+    generate(INPUTS[:1])  # warm up
+    print(f"torch threads: {torch.get_num_threads()}, batch size {args.batch_size}, window {args.wait_ms} ms")
+
+    for concurrency in args.concurrency:
+        print(f"concurrency {concurrency}:")
+        pool = ThreadPoolExecutor(max_workers=concurrency)
+        started = time.perf_counter()
+        latencies = run_clients(concurrency, args.requests,
+                                lambda text: pool.submit(generate, [text]).result()[0])
+        report("per-call", time.perf_counter() - started, latencies)
+        pool.shutdown()
+
+        batcher = InferenceBatcher(generate, max_batch_size=args.batch_size, max_wait_ms=args.wait_ms)
+        started = time.perf_counter()
+        latencies = run_clients(concurrency, args.requests, lambda text: batcher.submit(text).result())
+        report("batched", time.perf_counter() - started, latencies)
+        batcher.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import os
+
+# Keep the daily cost store in memory so tests never touch the working tree
+os.environ.setdefault("COST_STORE_PATH", ":memory:")
+
+import pytest  # pylint: disable=wrong-import-position
+from app.services.athena_service import athena_result_cache  # pylint: disable=wrong-import-position
+from app.services.client_registry import client_registry  # pylint: disable=wrong-import-position
+from app.services.cost_store import cost_store  # pylint: disable=wrong-import-position
+from app.services.recommendation_cache import recommendation_cache  # pylint: disable=wrong-import-position
+
+
+@pytest.fixture(autouse=True)
+def reset_client_registry():
+    """Each test patches the SDK constructors, so never reuse cached clients"""
+    client_registry.clear()
+    yield
+    client_registry.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_cost_store():
+    """Tests reuse the same date ranges, so start every test with an empty store"""
+    cost_store.clear()
+    yield
+    cost_store.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_athena_result_cache():
+    """CUR route tests run the same SQL against different fakes"""
+    athena_result_cache.clear()
+    yield
+    athena_result_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_recommendation_cache():
+    """Recommendation tests swap models without changing the model version"""
+    recommendation_cache.clear()
+    yield
+    recommendation_cache.clear()
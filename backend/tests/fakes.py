@@ -0,0 +1,321 @@
+"""Local stand-ins for cloud SDK clients and models used by tests and benchmarks."""
+import functools
+import itertools
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+from azure.mgmt.costmanagement.models import QueryColumn, QueryResult
+
+USAGE_COLUMNS = [
+    QueryColumn(name="Cost", type="Number"),
+    QueryColumn(name="UsageDate", type="Number"),
+    QueryColumn(name="ResourceGroupName", type="String"),
+    QueryColumn(name="Currency", type="String"),
+]
+
+
+class FakeHttpResponse:
+    def __init__(self, body):
+        self._body = body
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._body
+
+
+class FakeCostManagementClient:
+    """
+    Serves daily usage rows for a set of resource groups, ``page_size`` rows
+    per page with a ``next_link`` to the rest, sleeping ``latency`` seconds
+    per call to mimic the API round trip.
+    """
+
+    NEXT_LINK = "https://management.azure.com/fake/query?$skiptoken="
+
+    def __init__(self, start: date, days: int, resource_groups: List[str],
+                 page_size: int = 1000, latency: float = 0.0):
+        self.query = self
+        self.page_size = page_size
+        self.latency = latency
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._pending: Dict[str, List[list]] = {}
+        self._tokens = itertools.count()
+        self._rows: List[list] = []
+        for offset in range(days):
+            usage_date = int((start + timedelta(days=offset)).strftime("%Y%m%d"))
+            for index, resource_group in enumerate(resource_groups):
+                self._rows.append([float(index + 1), usage_date, resource_group, "USD"])
+
+    def usage(self, scope, parameters):
+        low = int(parameters.time_period.from_property.strftime("%Y%m%d"))
+        high = int(parameters.time_period.to.strftime("%Y%m%d"))
+        rows = [row for row in self._rows if low <= row[1] <= high]
+        return self._page(rows)
+
+    def _send_request(self, request):
+        token = parse_qs(urlparse(request.url).query)["$skiptoken"][0]
+        with self._lock:
+            rows = self._pending.pop(token)
+        return FakeHttpResponse(self._page(rows).serialize(keep_readonly=True))
+
+    def _page(self, rows: List[list]) -> QueryResult:
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            page, rest = rows[:self.page_size], rows[self.page_size:]
+            next_link = None
+            if rest:
+                with self._lock:
+                    token = str(next(self._tokens))
+                    self._pending[token] = rest
+                next_link = self.NEXT_LINK + token
+            return QueryResult(columns=USAGE_COLUMNS, rows=page, next_link=next_link)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class FakeAthenaClient:
+    """
+    Athena stand-in whose executions walk through a scripted list of states,
+    one state per ``get_query_execution`` call; the last state repeats.
+    """
+
+    def __init__(self, states: List[str], rows: List[List[str]] = None,
+                 page_size: int = 1000, reason: str = None,
+                 column_types: List[str] = None, output_location: str = None,
+                 reused: bool = False):
+        self.states = list(states)
+        self.rows = rows or [["line_item_product_code", "total_cost"]]
+        self.page_size = page_size
+        self.reason = reason
+        self.column_types = column_types or ["varchar"] * len(self.rows[0])
+        self.output_location = output_location
+        self.reused = reused
+        self.result_calls = 0
+        self.started: List[dict] = []
+        self.stopped: List[str] = []
+        self.poll_times: List[float] = []
+        self._executions = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start_query_execution(self, **kwargs):
+        with self._lock:
+            self.started.append(kwargs)
+            return {'QueryExecutionId': f"fake-execution-{next(self._executions)}"}
+
+    def get_query_execution(self, QueryExecutionId):
+        with self._lock:
+            self.poll_times.append(time.monotonic())
+            state = self.states.pop(0) if len(self.states) > 1 else self.states[0]
+            if QueryExecutionId in self.stopped:
+                state = 'CANCELLED'
+        status = {'State': state}
+        if self.reason:
+            status['StateChangeReason'] = self.reason
+        execution = {'QueryExecutionId': QueryExecutionId, 'Status': status}
+        if self.output_location:
+            execution['ResultConfiguration'] = {'OutputLocation': self.output_location}
+        if state == 'SUCCEEDED':
+            execution['Statistics'] = {'ResultReuseInformation': {'ReusedPreviousResult': self.reused}}
+        return {'QueryExecution': execution}
+
+    def stop_query_execution(self, QueryExecutionId):
+        with self._lock:
+            self.stopped.append(QueryExecutionId)
+        return {}
+
+    def get_paginator(self, operation_name):
+        assert operation_name == 'get_query_results'
+        return self
+
+    def _metadata(self):
+        return {'ColumnInfo': [
+            {'Name': name, 'Type': column_type}
+            for name, column_type in zip(self.rows[0], self.column_types)
+        ]}
+
+    def get_query_results(self, QueryExecutionId, MaxResults=1000):
+        self.result_calls += 1
+        return {'ResultSet': {
+            'Rows': [{'Data': [{'VarCharValue': value} for value in row]} for row in self.rows[:MaxResults]],
+            'ResultSetMetadata': self._metadata(),
+        }}
+
+    def paginate(self, QueryExecutionId, PaginationConfig=None):
+        for offset in range(0, len(self.rows), self.page_size):
+            self.result_calls += 1
+            page = {'ResultSet': {'Rows': [
+                {'Data': [{'VarCharValue': value} for value in row]}
+                for row in self.rows[offset:offset + self.page_size]
+            ]}}
+            if offset == 0:
+                page['ResultSet']['ResultSetMetadata'] = self._metadata()
+            yield page
+
+
+class FakeStreamingBody:
+    def __init__(self, path: Path):
+        self._file = open(path, "rb")  # pylint: disable=consider-using-with
+
+    def iter_chunks(self, chunk_size: int = 1024):
+        while True:
+            chunk = self._file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def close(self):
+        self._file.close()
+
+
+class FakeS3Client:
+    """S3 stand-in serving objects from ``root/<bucket>/<key>`` on the local filesystem."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.get_calls = 0
+
+    def path(self, bucket: str, key: str) -> Path:
+        return self.root / bucket / key
+
+    def put_object(self, Bucket, Key, Body):
+        path = self.path(Bucket, Key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(Body)
+
+    def head_object(self, Bucket, Key):
+        return {'ContentLength': self.path(Bucket, Key).stat().st_size}
+
+    def get_object(self, Bucket, Key):
+        self.get_calls += 1
+        return {'Body': FakeStreamingBody(self.path(Bucket, Key))}
+
+
+class ByteTokenizer:
+    """
+    Tokenizer over UTF-8 bytes with the call/decode surface the recommendation
+    code uses from Hugging Face tokenizers; ids 0-2 are pad, eos and unk.
+    """
+
+    pad_token_id = 0
+    eos_token_id = 1
+    vocab_size = 259
+
+    def encode(self, text: str, max_length: int = None) -> List[int]:
+        ids = [byte + 3 for byte in text.encode("utf-8")]
+        if max_length is not None:
+            ids = ids[:max_length - 1]
+        return ids + [self.eos_token_id]
+
+    def __call__(self, texts, return_tensors="pt", padding=True, truncation=True, max_length=None):
+        import torch  # pylint: disable=import-outside-toplevel
+        encoded = [self.encode(text, max_length if truncation else None) for text in texts]
+        width = max(len(ids) for ids in encoded)
+        return {
+            "input_ids": torch.tensor([ids + [self.pad_token_id] * (width - len(ids)) for ids in encoded]),
+            "attention_mask": torch.tensor([[1] * len(ids) + [0] * (width - len(ids)) for ids in encoded]),
+        }
+
+    def decode(self, ids, skip_special_tokens=True) -> str:
+        values = ids.tolist() if hasattr(ids, "tolist") else list(ids)
+        data = bytes(value - 3 for value in values if value >= 3)
+        return data.decode("utf-8", errors="replace")
+
+    def batch_decode(self, sequences, skip_special_tokens=True) -> List[str]:
+        return [self.decode(ids, skip_special_tokens) for ids in sequences]
+
+
+def tiny_seq2seq_model(d_model: int = 256, num_layers: int = 4, fixed_length: int = None, seed: int = 0):
+    """
+    A randomly initialised T5 sized to make CPU generation cost realistic
+    without downloading weights. ``fixed_length`` forces every generation to
+    that many tokens so timings do not depend on when EOS happens to appear.
+    """
+    import torch  # pylint: disable=import-outside-toplevel
+    from transformers import T5Config, T5ForConditionalGeneration  # pylint: disable=import-outside-toplevel
+
+    torch.manual_seed(seed)
+    config = T5Config(
+        vocab_size=ByteTokenizer.vocab_size, d_model=d_model, d_kv=d_model // 4, d_ff=d_model * 4,
+        num_layers=num_layers, num_heads=4, decoder_start_token_id=ByteTokenizer.pad_token_id,
+        pad_token_id=ByteTokenizer.pad_token_id, eos_token_id=ByteTokenizer.eos_token_id,
+    )
+    model = T5ForConditionalGeneration(config).eval()
+    if fixed_length is not None:
+        model.generation_config.min_length = fixed_length
+    return model
+
+
+def echo_worker():
+    """
+    Inference worker setup for pool tests. The handler answers each text
+    with the worker's pid and torch thread count, after sleeping ``delay``
+    seconds; ``action`` makes it raise or kill the worker instead.
+    """
+    import os  # pylint: disable=import-outside-toplevel
+    import torch  # pylint: disable=import-outside-toplevel
+
+    def handle(texts, delay=0.0, action=None, **generation):
+        time.sleep(delay)
+        if action == "raise":
+            raise ValueError("cannot handle this input")
+        if action == "exit":
+            os._exit(3)
+        return [f"{text}|{os.getpid()}|{torch.get_num_threads()}" for text in texts]
+    return handle
+
+
+def failing_worker():
+    raise RuntimeError("model files are missing")
+
+
+def tiny_model_worker(d_model: int = 256, num_layers: int = 4, fixed_length: int = None):
+    """Inference worker setup that generates with ``tiny_seq2seq_model``."""
+    from app.services.inference_backends import generate_texts  # pylint: disable=import-outside-toplevel
+    return functools.partial(generate_texts, tiny_seq2seq_model(d_model, num_layers, fixed_length),
+                             ByteTokenizer(), "cpu")
+
+
+class ScriptedSeq2SeqModel:
+    """
+    Stands in for a seq2seq model whose ``generate`` spells out ``text`` in
+    ByteTokenizer ids, one token per ``step_delay`` seconds, feeding the
+    streamer and checking the stopping criteria the way transformers does.
+    ``steps`` counts the tokens produced so far.
+    """
+
+    def __init__(self, text: str, step_delay: float = 0.0):
+        self.text = text
+        self.step_delay = step_delay
+        self.steps = 0
+
+    def generate(self, input_ids, attention_mask=None, max_length=20, streamer=None, stopping_criteria=None,
+                 **kwargs):
+        import torch  # pylint: disable=import-outside-toplevel
+        sequence = [ByteTokenizer.pad_token_id]
+        if streamer is not None:
+            streamer.put(torch.tensor([sequence]))
+        for token in ByteTokenizer().encode(self.text)[:max_length - 1]:
+            time.sleep(self.step_delay)
+            sequence.append(token)
+            self.steps += 1
+            if streamer is not None:
+                streamer.put(torch.tensor([token]))
+            if stopping_criteria is not None and bool(stopping_criteria(torch.tensor([sequence]), None).all()):
+                break
+        if streamer is not None:
+            streamer.end()
+        return torch.tensor([sequence])
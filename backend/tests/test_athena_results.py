@@ -0,0 +1,101 @@
+import csv
+import time
+
+import pytest
+from app.core.config import settings
+from app.services.athena_results import CsvResultReader, converter_for, parse_s3_uri
+from app.services.athena_service import AthenaService
+from tests.fakes import FakeAthenaClient, FakeS3Client
+
+COLUMNS = ["line_item_resource_id", "line_item_product_code", "usage_hours", "total_cost", "is_spot"]
+COLUMN_TYPES = ["varchar", "varchar", "bigint", "double", "boolean"]
+
+
+def write_result_csv(s3, key, rows):
+    path = s3.path("athena-results", key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle, quoting=csv.QUOTE_ALL)
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
+    return f"s3://athena-results/{key}"
+
+
+def test_parse_s3_uri():
+    assert parse_s3_uri("s3://bucket/results/abc.csv") == ("bucket", "results/abc.csv")
+    with pytest.raises(ValueError):
+        parse_s3_uri("https://bucket/results/abc.csv")
+
+def test_converter_for_athena_types():
+    assert converter_for("bigint")("42") == 42
+    assert converter_for("decimal(38,10)")("1.5") == 1.5
+    assert converter_for("boolean")("true") is True
+    assert converter_for("varchar") is None
+    assert converter_for("timestamp") is None
+
+def test_csv_reader_types_rows_and_keeps_multiline_fields(tmp_path):
+    s3 = FakeS3Client(tmp_path)
+    location = write_result_csv(s3, "q1.csv", [
+        ["i-1", "AmazonEC2", "24", "1.25", "false"],
+        ["tag with\nnewline", "AmazonS3", "", "0.5", "true"],
+    ])
+    reader = CsvResultReader(s3, location, [converter_for(t) for t in COLUMN_TYPES], chunk_size=7)
+
+    rows = list(reader.iter_dicts())
+
+    assert rows == [
+        {"line_item_resource_id": "i-1", "line_item_product_code": "AmazonEC2",
+         "usage_hours": 24, "total_cost": 1.25, "is_spot": False},
+        {"line_item_resource_id": "tag with\nnewline", "line_item_product_code": "AmazonS3",
+         "usage_hours": None, "total_cost": 0.5, "is_spot": True},
+    ]
+
+def test_csv_reader_column_batches(tmp_path):
+    s3 = FakeS3Client(tmp_path)
+    location = write_result_csv(s3, "q2.csv", [[f"i-{n}", "AmazonEC2", str(n), "1.0", "false"] for n in range(25)])
+    reader = CsvResultReader(s3, location, [converter_for(t) for t in COLUMN_TYPES])
+
+    batches = list(reader.iter_column_batches(batch_size=10))
+
+    assert [len(batch["usage_hours"]) for batch in batches] == [10, 10, 5]
+    assert batches[2]["usage_hours"] == [20, 21, 22, 23, 24]
+
+def test_large_results_are_streamed_from_s3(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ATHENA_CSV_RESULT_MIN_BYTES", 1024)
+    row_count = 200000
+    s3 = FakeS3Client(tmp_path)
+    location = write_result_csv(s3, "large.csv", (
+        [f"i-{n:08d}", "AmazonEC2", str(n % 720), f"{n * 0.01:.2f}", "false"] for n in range(row_count)
+    ))
+    athena = FakeAthenaClient(['SUCCEEDED'], rows=[COLUMNS], column_types=COLUMN_TYPES,
+                              output_location=location)
+    service = AthenaService(client=athena, s3_client=s3)
+
+    started = time.perf_counter()
+    total_hours = 0
+    count = 0
+    for row in service.iter_query_results("fake-execution-1"):
+        total_hours += row["usage_hours"]
+        count += 1
+    elapsed = time.perf_counter() - started
+
+    assert count == row_count
+    assert total_hours == sum(n % 720 for n in range(row_count))
+    # One metadata call instead of 200 pages of GetQueryResults
+    assert athena.result_calls == 1
+    assert s3.get_calls == 1
+    assert elapsed < 10
+
+def test_small_results_use_paginated_api(tmp_path):
+    s3 = FakeS3Client(tmp_path)
+    rows = [COLUMNS, ["i-1", "AmazonEC2", "24", "1.25", "false"]]
+    location = write_result_csv(s3, "small.csv", rows[1:])
+    athena = FakeAthenaClient(['SUCCEEDED'], rows=rows, column_types=COLUMN_TYPES,
+                              output_location=location)
+    service = AthenaService(client=athena, s3_client=s3)
+
+    results = service.get_query_results("fake-execution-1")
+
+    assert results == [{"line_item_resource_id": "i-1", "line_item_product_code": "AmazonEC2",
+                        "usage_hours": 24, "total_cost": 1.25, "is_spot": False}]
+    assert s3.get_calls == 0
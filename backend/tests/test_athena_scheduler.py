@@ -0,0 +1,103 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.athena_scheduler import AthenaQueueFullError, AthenaScheduler, QueryPriority
+from app.services.athena_service import athena_service
+from tests.fakes import FakeAthenaClient
+
+client = TestClient(app)
+
+
+def test_slots_bound_concurrent_queries():
+    scheduler = AthenaScheduler(max_slots=2, max_queue=10)
+    running = []
+    peak = []
+
+    async def query():
+        async with scheduler.slot():
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.02)
+            running.pop()
+
+    async def main():
+        await asyncio.gather(*[query() for _ in range(6)])
+
+    asyncio.run(main())
+    assert max(peak) == 2
+    stats = scheduler.stats()
+    assert stats["completed"] == 6
+    assert stats["active"] == 0
+    assert stats["max_wait_seconds"] > 0
+
+def test_interactive_queries_run_before_queued_exports():
+    scheduler = AthenaScheduler(max_slots=1, max_queue=10)
+    order = []
+
+    async def query(name, priority):
+        async with scheduler.slot(priority):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        first = asyncio.ensure_future(query("running", QueryPriority.INTERACTIVE))
+        await asyncio.sleep(0)
+        queued = [
+            asyncio.ensure_future(query("export-1", QueryPriority.EXPORT)),
+            asyncio.ensure_future(query("export-2", QueryPriority.EXPORT)),
+            asyncio.ensure_future(query("dashboard", QueryPriority.INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.stats()["queue_depth"] == 3
+        await asyncio.gather(first, *queued)
+
+    asyncio.run(main())
+    assert order == ["running", "dashboard", "export-1", "export-2"]
+
+def test_full_queue_is_rejected_with_retry_hint():
+    scheduler = AthenaScheduler(max_slots=1, max_queue=1)
+
+    async def main():
+        holder = asyncio.ensure_future(scheduler.acquire())
+        await holder
+        waiter = asyncio.ensure_future(scheduler.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AthenaQueueFullError) as excinfo:
+            await scheduler.acquire()
+        scheduler.release(0.1)
+        await waiter
+        scheduler.release(0.1)
+        return excinfo.value
+
+    error = asyncio.run(main())
+    assert error.retry_after >= 1
+    assert scheduler.stats()["rejected"] == 1
+    assert scheduler.stats()["active"] == 0
+
+def test_cancelled_waiter_leaves_the_queue():
+    scheduler = AthenaScheduler(max_slots=1, max_queue=5)
+
+    async def main():
+        await scheduler.acquire()
+        waiter = asyncio.ensure_future(scheduler.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.stats()["queue_depth"] == 0
+        scheduler.release()
+
+    asyncio.run(main())
+    assert scheduler.stats()["active"] == 0
+
+def test_cur_route_returns_503_with_retry_after_when_queue_is_full():
+    fake = FakeAthenaClient(['SUCCEEDED'])
+    with patch.object(athena_service, '_client', fake), \
+            patch.object(athena_service, 'scheduler', AthenaScheduler(max_slots=0, max_queue=0)):
+        response = client.get("/api/aws/cur/top-resources")
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert fake.started == []
@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+import pytest
+from app.services.athena_service import (
+    AthenaQueryAbortedError,
+    AthenaQueryError,
+    AthenaQueryTimeoutError,
+    AthenaService,
+)
+from tests.fakes import FakeAthenaClient
+
+ROWS = [
+    ["line_item_product_code", "total_cost"],
+    ["AmazonEC2", "145.2"],
+    ["AmazonS3", "89.3"],
+]
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "ATHENA_POLL_INITIAL_DELAY", 0.01)
+    monkeypatch.setattr(settings, "ATHENA_POLL_MAX_DELAY", 0.08)
+
+
+def test_run_query_returns_as_soon_as_query_succeeds():
+    fake = FakeAthenaClient(['QUEUED', 'RUNNING', 'SUCCEEDED'], rows=ROWS)
+    service = AthenaService(client=fake)
+
+    started = time.perf_counter()
+    results = asyncio.run(service.run_query("SELECT 1"))
+    elapsed = time.perf_counter() - started
+
+    assert results == [
+        {"line_item_product_code": "AmazonEC2", "total_cost": "145.2"},
+        {"line_item_product_code": "AmazonS3", "total_cost": "89.3"},
+    ]
+    assert len(fake.poll_times) == 3
+    assert elapsed < 0.5
+    assert not fake.stopped
+
+def test_run_query_backs_off_between_polls():
+    fake = FakeAthenaClient(['RUNNING'] * 6 + ['SUCCEEDED'], rows=ROWS)
+    service = AthenaService(client=fake)
+
+    asyncio.run(service.run_query("SELECT 1"))
+
+    gaps = [later - earlier for earlier, later in zip(fake.poll_times, fake.poll_times[1:])]
+    assert gaps[1] > gaps[0]
+    assert gaps[3] > gaps[1]
+    # Capped at ATHENA_POLL_MAX_DELAY
+    assert max(gaps) < 0.08 * 2
+
+def test_run_query_stops_query_at_deadline():
+    fake = FakeAthenaClient(['RUNNING'])
+    service = AthenaService(client=fake)
+
+    with pytest.raises(AthenaQueryTimeoutError):
+        asyncio.run(service.run_query("SELECT 1", timeout=0.1))
+
+    assert fake.stopped == ["fake-execution-1"]
+
+def test_run_query_stops_query_when_client_disconnects():
+    fake = FakeAthenaClient(['RUNNING'])
+    service = AthenaService(client=fake)
+    checks = []
+
+    async def is_disconnected():
+        checks.append(True)
+        return len(checks) >= 3
+
+    with pytest.raises(AthenaQueryAbortedError):
+        asyncio.run(service.run_query("SELECT 1", is_disconnected=is_disconnected))
+
+    assert fake.stopped == ["fake-execution-1"]
+
+def test_run_query_stops_query_when_task_is_cancelled():
+    fake = FakeAthenaClient(['RUNNING'])
+    service = AthenaService(client=fake)
+
+    async def cancel_soon():
+        task = asyncio.ensure_future(service.run_query("SELECT 1"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The stop call runs in the background after cancellation
+        for _ in range(50):
+            if fake.stopped:
+                break
+            await asyncio.sleep(0.01)
+
+    asyncio.run(cancel_soon())
+
+    assert fake.stopped == ["fake-execution-1"]
+
+def test_run_query_raises_on_failed_query():
+    fake = FakeAthenaClient(['RUNNING', 'FAILED'], reason="SYNTAX_ERROR: line 1:8")
+    service = AthenaService(client=fake)
+
+    with pytest.raises(AthenaQueryError, match="SYNTAX_ERROR"):
+        asyncio.run(service.run_query("SELEC 1"))
+
+    assert not fake.stopped
+
+def test_get_query_results_skips_header_only_once():
+    fake = FakeAthenaClient(['SUCCEEDED'], rows=ROWS, page_size=1)
+    service = AthenaService(client=fake)
+
+    assert len(service.get_query_results("fake-execution-1")) == 2
@@ -1,9 +1,14 @@
+import asyncio
+import time
+import httpx
 import pytest
 from datetime import date, timedelta
 from fastapi.testclient import TestClient
 from unittest.mock import MagicMock, patch
 from botocore.exceptions import ClientError
 from app.main import app
+from app.services.aws_executor import aws_executor
+from app.services.single_flight import single_flight
 
 client = TestClient(app)
 
@@ -85,3 +90,161 @@ def test_get_aws_costs_access_denied():
 
         assert response.status_code == 403
         assert "Access denied" in response.json()["detail"]
+
+def test_get_aws_costs_concurrent_requests_overlap(mock_aws_response):
+    delay = 0.5
+    concurrency = 4
+
+    class SlowCostExplorer:
+        def get_cost_and_usage(self, **kwargs):
+            time.sleep(delay)
+            return mock_aws_response
+
+    async def fire_requests():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            return await asyncio.gather(*[
+                async_client.get("/api/aws/costs", params={
+                    "start_date": "2025-06-01",
+                    "end_date": "2025-06-02"
+                })
+                for _ in range(concurrency)
+            ])
+
+    with patch('boto3.client', return_value=SlowCostExplorer()):
+        started = time.perf_counter()
+        responses = asyncio.run(fire_requests())
+        elapsed = time.perf_counter() - started
+
+    assert all(response.status_code == 200 for response in responses)
+    # Sequential execution would take concurrency * delay
+    assert elapsed < delay * concurrency / 2
+
+def test_identical_concurrent_requests_share_one_upstream_call(mock_aws_response):
+    calls = []
+
+    class SlowCostExplorer:
+        def get_cost_and_usage(self, **kwargs):
+            calls.append(kwargs)
+            time.sleep(0.2)
+            return mock_aws_response
+
+    async def fire_requests():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            return await asyncio.gather(*[
+                async_client.get("/api/aws/costs", params={
+                    "start_date": "2025-06-01",
+                    "end_date": "2025-06-02"
+                })
+                for _ in range(5)
+            ])
+
+    single_flight.reset_stats()
+    with patch('boto3.client', return_value=SlowCostExplorer()):
+        responses = asyncio.run(fire_requests())
+
+    assert [response.json()["total_cost"] for response in responses] == [10.0] * 5
+    assert len(calls) == 1
+    assert single_flight.stats()["coalesced"] == 4
+
+def test_get_aws_costs_timeout(mock_aws_response):
+    class HangingCostExplorer:
+        def get_cost_and_usage(self, **kwargs):
+            time.sleep(0.5)
+            return mock_aws_response
+
+    with patch('boto3.client', return_value=HangingCostExplorer()), \
+         patch.object(aws_executor, 'default_timeout', 0.05):
+        response = client.get("/api/aws/costs", params={
+            "start_date": "2025-06-01",
+            "end_date": "2025-06-02"
+        })
+
+    assert response.status_code == 504
+
+def _ce_page(days, next_page_token=None):
+    page = {
+        'ResultsByTime': [
+            {
+                'TimePeriod': {'Start': day, 'End': day},
+                'Groups': [
+                    {
+                        'Keys': [service],
+                        'Metrics': {'UnblendedCost': {'Amount': str(amount), 'Unit': 'USD'}}
+                    }
+                    for service, amount in groups
+                ]
+            }
+            for day, groups in days
+        ]
+    }
+    if next_page_token:
+        page['NextPageToken'] = next_page_token
+    return page
+
+def test_get_aws_costs_follows_next_page_token_and_aggregates():
+    pages = [
+        _ce_page([
+            ('2025-06-01', [('Amazon EC2', 10.0), ('Amazon S3', 2.0)]),
+            ('2025-06-02', [('Amazon EC2', 5.0), ('AWS Lambda', 0.0)]),
+        ], next_page_token='page-2'),
+        _ce_page([
+            ('2025-06-03', [('Amazon EC2', 1.0), ('Amazon S3', 3.0)]),
+        ]),
+    ]
+    with patch('boto3.client') as mock_client:
+        mock_ce = MagicMock()
+        mock_ce.get_cost_and_usage.side_effect = pages
+        mock_client.return_value = mock_ce
+
+        response = client.get("/api/aws/costs", params={
+            "start_date": "2025-06-01",
+            "end_date": "2025-06-04"
+        })
+
+    assert response.status_code == 200
+    assert mock_ce.get_cost_and_usage.call_count == 2
+    assert mock_ce.get_cost_and_usage.call_args_list[1].kwargs['NextPageToken'] == 'page-2'
+    data = response.json()
+    assert data["total_cost"] == 21.0
+    assert data["costs_by_service"] == [
+        {"service_name": "Amazon EC2", "amount": 16.0, "currency": "USD"},
+        {"service_name": "Amazon S3", "amount": 5.0, "currency": "USD"},
+    ]
+    assert data["time_period_start"] == "2025-06-01"
+    assert data["time_period_end"] == "2025-06-04"
+    assert data["daily_costs"] is None
+
+def test_get_aws_costs_daily_aggregate():
+    page = _ce_page([
+        ('2025-06-01', [('Amazon EC2', 10.0), ('Amazon S3', 2.0)]),
+        ('2025-06-02', [('Amazon EC2', 5.0)]),
+    ])
+    with patch('boto3.client') as mock_client:
+        mock_ce = MagicMock()
+        mock_ce.get_cost_and_usage.return_value = page
+        mock_client.return_value = mock_ce
+
+        response = client.get("/api/aws/costs", params={
+            "start_date": "2025-06-01",
+            "end_date": "2025-06-03",
+            "aggregate": "daily"
+        })
+
+    assert response.status_code == 200
+    daily = response.json()["daily_costs"]
+    assert [day["date"] for day in daily] == ["2025-06-01", "2025-06-02"]
+    assert daily[0]["total_cost"] == 12.0
+    assert len(daily[0]["costs_by_service"]) == 2
+    assert daily[1]["costs_by_service"] == [
+        {"service_name": "Amazon EC2", "amount": 5.0, "currency": "USD"}
+    ]
+
+def test_get_aws_costs_invalid_aggregate():
+    response = client.get("/api/aws/costs", params={
+        "start_date": "2025-06-01",
+        "end_date": "2025-06-02",
+        "aggregate": "hourly"
+    })
+    assert response.status_code == 422
@@ -0,0 +1,90 @@
+import asyncio
+import re
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.main import app
+from app.services.athena_service import athena_service
+from tests.fakes import FakeAthenaClient
+
+client = TestClient(app)
+
+
+def test_top_resources_runs_query_through_athena():
+    fake = FakeAthenaClient(['RUNNING', 'SUCCEEDED'], rows=[
+        ["line_item_resource_id", "total_cost"],
+        ["i-0123456789abcdef0", "145.2"],
+    ])
+    with patch.object(athena_service, '_client', fake):
+        response = client.get("/api/aws/cur/top-resources", params={"limit": 5})
+
+    assert response.status_code == 200
+    assert response.json() == [{"line_item_resource_id": "i-0123456789abcdef0", "total_cost": "145.2"}]
+    assert len(fake.started) == 1
+
+def test_usage_by_operation_times_out_and_stops_query(monkeypatch):
+    monkeypatch.setattr(settings, "ATHENA_QUERY_TIMEOUT", 0.1)
+    fake = FakeAthenaClient(['RUNNING'])
+    with patch.object(athena_service, '_client', fake):
+        response = client.get("/api/aws/cur/usage-by-operation")
+
+    assert response.status_code == 504
+    assert fake.stopped == ["fake-execution-1"]
+
+def test_repeated_query_is_served_from_local_cache():
+    fake = FakeAthenaClient(['SUCCEEDED'], rows=[
+        ["line_item_operation", "total_cost"],
+        ["RunInstances", "12.5"],
+    ])
+    with patch.object(athena_service, '_client', fake):
+        first = client.get("/api/aws/cur/usage-by-operation", params={"limit": 5})
+        second = client.get("/api/aws/cur/usage-by-operation", params={"limit": 5})
+        other_limit = client.get("/api/aws/cur/usage-by-operation", params={"limit": 6})
+
+    assert first.headers["X-Result-Source"] == "fresh"
+    assert second.headers["X-Result-Source"] == "local-cache"
+    assert second.json() == first.json()
+    assert other_limit.headers["X-Result-Source"] == "fresh"
+    assert len(fake.started) == 2
+
+def test_cache_miss_asks_athena_to_reuse_recent_results():
+    fake = FakeAthenaClient(['SUCCEEDED'], reused=True)
+    with patch.object(athena_service, '_client', fake):
+        response = client.get("/api/aws/cur/top-resources")
+
+    assert response.status_code == 200
+    assert response.headers["X-Result-Source"] == "athena-reuse"
+    reuse = fake.started[0]['ResultReuseConfiguration']['ResultReuseByAgeConfiguration']
+    assert reuse == {'Enabled': True, 'MaxAgeInMinutes': settings.ATHENA_RESULT_REUSE_MAX_AGE_MINUTES}
+
+def test_filters_are_sent_as_execution_parameters():
+    fake = FakeAthenaClient(['SUCCEEDED'])
+    with patch.object(athena_service, '_client', fake):
+        response = client.get("/api/aws/cur/top-resources", params={"product_code": "AmazonEC2", "days": 7})
+
+    assert response.status_code == 200
+    started = fake.started[0]
+    assert "AmazonEC2" not in started['QueryString']
+    assert started['ExecutionParameters'][-1] == "'AmazonEC2'"
+    # line_item_usage_start_date is a varchar: its bounds are strings in the same format
+    assert re.fullmatch(r"'\d{4}-\d{2}-\d{2} 00:00:00'", started['ExecutionParameters'][0])
+
+def test_limit_out_of_range_is_rejected():
+    response = client.get("/api/aws/cur/top-resources", params={"limit": 5000})
+    assert response.status_code == 422
+
+def test_concurrent_identical_cur_queries_start_one_athena_query():
+    fake = FakeAthenaClient(['RUNNING', 'RUNNING', 'SUCCEEDED'])
+
+    async def run_concurrently():
+        return await asyncio.gather(*[
+            athena_service.run_cached_query("SELECT 1 FROM cur") for _ in range(4)
+        ])
+
+    with patch.object(athena_service, '_client', fake), \
+            patch.object(settings, 'ATHENA_POLL_INITIAL_DELAY', 0.01):
+        results = asyncio.run(run_concurrently())
+
+    assert len(fake.started) == 1
+    assert [source for _, source in results] == ["fresh"] * 4
@@ -1,3 +1,4 @@
+import threading
 import pytest
 from datetime import date
 from fastapi.testclient import TestClient
@@ -9,13 +10,20 @@ client = TestClient(app)
 
 @pytest.fixture
 def mock_azure_response():
+    class MockColumn:
+        def __init__(self, name):
+            self.name = name
+
     class MockResponse:
+        columns = [MockColumn(name) for name in ("Cost", "UsageDate", "ResourceGroupName", "Currency")]
+        next_link = None
+
         @property
         def rows(self):
             return [
-                [10.0, "resource-group-1", "USD"],
-                [20.0, "resource-group-2", "USD"],
-                [5.0, None, "USD"]  # Test unassigned resource group
+                [10.0, 20250601, "resource-group-1", "USD"],
+                [20.0, 20250601, "resource-group-2", "USD"],
+                [5.0, 20250602, None, "USD"]  # Test unassigned resource group
             ]
     return MockResponse()
 
@@ -33,8 +41,8 @@ def test_get_azure_costs_success(mock_azure_response, mock_env_vars):
     mock_mgmt_client.query.usage.return_value = mock_azure_response
 
     with patch('os.getenv', mock_env_vars.get), \
-         patch('app.api.azure_routes.ClientSecretCredential') as mock_credential, \
-         patch('app.api.azure_routes.CostManagementClient', return_value=mock_mgmt_client):
+         patch('app.services.client_registry.ClientSecretCredential') as mock_credential, \
+         patch('app.services.client_registry.CostManagementClient', return_value=mock_mgmt_client):
 
         response = client.get("/api/azure/costs", params={
             "start_date": "2025-06-01",
@@ -65,7 +73,7 @@ def test_get_azure_costs_invalid_dates():
 
 def test_get_azure_costs_authentication_error(mock_env_vars):
     with patch('os.getenv', mock_env_vars.get), \
-         patch('app.api.azure_routes.ClientSecretCredential', side_effect=ClientAuthenticationError("Auth failed")):
+         patch('app.services.client_registry.ClientSecretCredential', side_effect=ClientAuthenticationError("Auth failed")):
 
         response = client.get("/api/azure/costs", params={
             "start_date": "2025-06-01",
@@ -98,3 +106,66 @@ def test_get_azure_costs_missing_subscription():
         error = response.json()
         assert "detail" in error
         assert "AZURE_SUBSCRIPTION_ID is required" in error["detail"]
+
+def test_get_azure_costs_reuses_settled_days(mock_azure_response, mock_env_vars):
+    mock_mgmt_client = MagicMock()
+    mock_mgmt_client.query.usage.return_value = mock_azure_response
+
+    with patch('os.getenv', mock_env_vars.get), \
+         patch('app.services.client_registry.ClientSecretCredential'), \
+         patch('app.services.client_registry.CostManagementClient', return_value=mock_mgmt_client):
+        params = {"start_date": "2025-06-01", "end_date": "2025-06-02"}
+        first = client.get("/api/azure/costs", params=params)
+        second = client.get("/api/azure/costs", params=params)
+
+    assert first.json() == second.json()
+    assert mock_mgmt_client.query.usage.call_count == 1
+    assert first.json()["costs_by_resource_group"][0] == {
+        "resource_group": "resource-group-2", "amount": 20.0, "currency": "USD"
+    }
+
+def test_get_azure_costs_unexpected_columns(mock_env_vars):
+    class MockColumn:
+        def __init__(self, name):
+            self.name = name
+
+    class MockResponse:
+        columns = [MockColumn("Cost"), MockColumn("Currency")]
+        rows = [[10.0, "USD"]]
+        next_link = None
+
+    mock_mgmt_client = MagicMock()
+    mock_mgmt_client.query.usage.return_value = MockResponse()
+
+    with patch('os.getenv', mock_env_vars.get), \
+         patch('app.services.client_registry.ClientSecretCredential'), \
+         patch('app.services.client_registry.CostManagementClient', return_value=mock_mgmt_client):
+        response = client.get("/api/azure/costs", params={
+            "start_date": "2025-06-01",
+            "end_date": "2025-06-02"
+        })
+
+    assert response.status_code == 502
+    assert "UsageDate" in response.json()["detail"]
+
+def test_get_azure_costs_streams_windows_into_the_store_off_the_event_loop(mock_env_vars, monkeypatch):
+    from app.services.cost_store import DayWriter, cost_store
+
+    calls = []
+    for owner, name in ((cost_store, "missing_ranges"), (DayWriter, "add"), (DayWriter, "commit"),
+                        (cost_store, "iter_rows")):
+        def record(*args, _original=getattr(owner, name), _name=name, **kwargs):
+            calls.append((_name, threading.current_thread().name.startswith("azure-cost-query")))
+            return _original(*args, **kwargs)
+        monkeypatch.setattr(owner, name, record)
+
+    mock_mgmt_client = MagicMock()
+    mock_mgmt_client.query.usage.return_value = MagicMock(rows=[], next_link=None)
+    with patch('os.getenv', mock_env_vars.get), \
+         patch('app.services.client_registry.ClientSecretCredential'), \
+         patch('app.services.client_registry.CostManagementClient', return_value=mock_mgmt_client):
+        response = client.get("/api/azure/costs", params={"start_date": "2024-05-01", "end_date": "2024-06-30"})
+
+    assert response.status_code == 200
+    # One staged write per monthly window, then one commit for the range
+    assert calls == [("missing_ranges", True), ("add", True), ("add", True), ("commit", True), ("iter_rows", True)]
@@ -0,0 +1,107 @@
+import asyncio
+import time
+from datetime import date
+
+import pytest
+from app.services.azure_query_planner import (
+    AzureQueryPlanner,
+    UsageColumnsError,
+    aggregate_usage_rows,
+    merge_resource_groups,
+    plan_windows,
+    usage_query,
+)
+from tests.fakes import FakeCostManagementClient
+
+SCOPE = "/subscriptions/test-subscription"
+
+
+def test_plan_windows_splits_at_month_boundaries():
+    assert plan_windows(date(2025, 1, 15), date(2025, 3, 10)) == [
+        (date(2025, 1, 15), date(2025, 2, 1)),
+        (date(2025, 2, 1), date(2025, 3, 1)),
+        (date(2025, 3, 1), date(2025, 3, 10)),
+    ]
+
+def test_plan_windows_single_partial_month():
+    assert plan_windows(date(2025, 6, 1), date(2025, 6, 3)) == [(date(2025, 6, 1), date(2025, 6, 3))]
+    assert not plan_windows(date(2025, 6, 1), date(2025, 6, 1))
+
+def test_usage_query_serializes_inclusive_time_period():
+    body = usage_query(date(2025, 6, 1), date(2025, 6, 30)).serialize()
+    assert body["timePeriod"] == {"from": "2025-06-01T00:00:00.000Z", "to": "2025-06-30T23:59:59.000Z"}
+    assert body["dataset"]["grouping"] == [{"type": "Dimension", "name": "ResourceGroupName"}]
+
+def test_fetch_rows_follows_next_link_and_merges_resource_groups():
+    fake = FakeCostManagementClient(date(2025, 1, 1), days=120,
+                                    resource_groups=["prod-rg", "dev-rg", None], page_size=50)
+    planner = AzureQueryPlanner(max_concurrency=2)
+
+    rows = asyncio.run(planner.fetch_rows(fake, SCOPE, date(2025, 1, 1), date(2025, 5, 1)))
+    planner.shutdown()
+
+    assert len(rows) == 120 * 3
+    # Four monthly windows of ~90 rows each need two pages apiece
+    assert fake.calls == 8
+    assert fake.max_in_flight <= 2
+    totals, total_cost, currency = merge_resource_groups(rows)
+    assert totals == {"prod-rg": 120.0, "dev-rg": 240.0, "Unassigned": 360.0}
+    assert total_cost == 720.0
+    assert currency == "USD"
+
+def test_fetch_rows_runs_windows_concurrently():
+    fake = FakeCostManagementClient(date(2025, 1, 1), days=181,
+                                    resource_groups=["prod-rg"], latency=0.05)
+    planner = AzureQueryPlanner(max_concurrency=6)
+
+    asyncio.run(planner.fetch_rows(fake, SCOPE, date(2025, 1, 1), date(2025, 7, 1)))
+    planner.shutdown()
+
+    assert fake.max_in_flight > 1
+
+class _Column:
+    def __init__(self, name):
+        self.name = name
+
+def _columns(*names):
+    return [_Column(name) for name in names]
+
+def test_aggregate_usage_rows_finds_columns_by_name():
+    rows = [
+        ["USD", "prod-rg", 20250601, 10.0],
+        ["USD", "prod-rg", 20250601, 5.0],
+        ["USD", None, 20250602, 2.0],
+        ["USD", "", 20250602, 1.0],
+        ["USD", "dev-rg", 20250602, 0.0],
+    ]
+    result = aggregate_usage_rows(_columns("Currency", "ResourceGroupName", "UsageDate", "Cost"), rows)
+    assert sorted(result) == [
+        ("2025-06-01", "prod-rg", 15.0, "USD"),
+        ("2025-06-02", "Unassigned", 3.0, "USD"),
+    ]
+
+def test_aggregate_usage_rows_accepts_pretax_cost_and_string_dates():
+    rows = [[1.5, "2025-06-01T00:00:00", "prod-rg", "EUR"]]
+    result = aggregate_usage_rows(_columns("PreTaxCost", "UsageDate", "ResourceGroupName", "Currency"), rows)
+    assert result == [("2025-06-01", "prod-rg", 1.5, "EUR")]
+
+def test_aggregate_usage_rows_rejects_missing_columns():
+    with pytest.raises(UsageColumnsError, match="UsageDate"):
+        aggregate_usage_rows(_columns("Cost", "ResourceGroupName", "Currency"), [[1.0, "prod-rg", "USD"]])
+
+def test_aggregate_usage_rows_large_subscription():
+    resource_groups = [f"rg-{index}" for index in range(200)]
+    rows = [
+        [1.0, 20250601 + day, resource_group, "USD"]
+        for day in range(30)
+        for resource_group in resource_groups
+        for _ in range(10)
+    ]
+    started = time.perf_counter()
+    result = aggregate_usage_rows(_columns("Cost", "UsageDate", "ResourceGroupName", "Currency"), rows)
+    elapsed = time.perf_counter() - started
+
+    assert len(rows) == 60000
+    assert len(result) == 30 * 200
+    assert all(amount == 10.0 for _, _, amount, _ in result)
+    assert elapsed < 1.0
@@ -0,0 +1,71 @@
+import time
+from unittest.mock import MagicMock, patch
+
+from azure.core.credentials import AccessToken
+from app.services.client_registry import CachedTokenCredential, ClientRegistry
+
+
+def test_aws_client_is_reused_for_same_credentials():
+    registry = ClientRegistry(max_pool_connections=4)
+    with patch('boto3.client', side_effect=lambda *a, **kw: MagicMock()) as mock_client:
+        first = registry.get_aws_client('ce', 'us-east-1', 'AKIA1', 'secret')
+        second = registry.get_aws_client('ce', 'us-east-1', 'AKIA1', 'secret')
+
+    assert first is second
+    assert mock_client.call_count == 1
+    assert mock_client.call_args.kwargs['config'].max_pool_connections == 4
+
+def test_aws_client_is_scoped_by_service_and_region():
+    registry = ClientRegistry(max_pool_connections=4)
+    with patch('boto3.client', side_effect=lambda *a, **kw: MagicMock()) as mock_client:
+        ce_client = registry.get_aws_client('ce', 'us-east-1', 'AKIA1', 'secret')
+        athena_client = registry.get_aws_client('athena', 'us-east-1', 'AKIA1', 'secret')
+        other_region = registry.get_aws_client('ce', 'eu-west-1', 'AKIA1', 'secret')
+
+    assert len({id(ce_client), id(athena_client), id(other_region)}) == 3
+    assert mock_client.call_count == 3
+
+def test_aws_client_is_rebuilt_when_secret_rotates():
+    registry = ClientRegistry(max_pool_connections=4)
+    with patch('boto3.client', side_effect=lambda *a, **kw: MagicMock()):
+        old_client = registry.get_aws_client('ce', 'us-east-1', 'AKIA1', 'old-secret')
+        new_client = registry.get_aws_client('ce', 'us-east-1', 'AKIA1', 'new-secret')
+
+    assert old_client is not new_client
+    old_client.close.assert_called_once()
+
+def test_azure_client_is_reused_and_rebuilt_on_rotation():
+    registry = ClientRegistry(max_pool_connections=4)
+    with patch('app.services.client_registry.ClientSecretCredential') as mock_credential, \
+         patch('app.services.client_registry.CostManagementClient',
+               side_effect=lambda *a, **kw: MagicMock()):
+        first = registry.get_azure_cost_client('tenant', 'client', 'secret')
+        second = registry.get_azure_cost_client('tenant', 'client', 'secret')
+        rotated = registry.get_azure_cost_client('tenant', 'client', 'rotated-secret')
+
+    assert first is second
+    assert rotated is not first
+    assert mock_credential.call_count == 2
+
+def test_cached_token_credential_reuses_token_until_expiry():
+    inner = MagicMock()
+    inner.get_token.side_effect = [
+        AccessToken("token-1", int(time.time()) + 3600),
+        AccessToken("token-2", int(time.time()) + 3600),
+    ]
+    credential = CachedTokenCredential(inner)
+
+    assert credential.get_token("https://management.azure.com/.default").token == "token-1"
+    assert credential.get_token("https://management.azure.com/.default").token == "token-1"
+    assert inner.get_token.call_count == 1
+
+def test_cached_token_credential_refreshes_expiring_token():
+    inner = MagicMock()
+    inner.get_token.side_effect = [
+        AccessToken("token-1", int(time.time()) + 60),
+        AccessToken("token-2", int(time.time()) + 3600),
+    ]
+    credential = CachedTokenCredential(inner)
+
+    credential.get_token("https://management.azure.com/.default")
+    assert credential.get_token("https://management.azure.com/.default").token == "token-2"
@@ -0,0 +1,153 @@
+import threading
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.cost_store import CostStore
+
+client = TestClient(app)
+
+TODAY = date(2025, 6, 30)
+
+
+def test_missing_ranges_merges_adjacent_days():
+    store = CostStore(":memory:", settle_days=3)
+    ranges = store.missing_ranges('aws', 'acct', date(2025, 6, 1), date(2025, 6, 5), today=TODAY)
+    assert ranges == [(date(2025, 6, 1), date(2025, 6, 5))]
+    assert store.stats() == {"hits": 0, "misses": 4}
+
+def test_settled_days_are_served_from_store():
+    store = CostStore(":memory:", settle_days=3)
+    store.replace_days('aws', 'acct', date(2025, 6, 1), date(2025, 6, 3), [
+        ('2025-06-01', 'Amazon EC2', 10.0, 'USD'),
+    ])
+
+    ranges = store.missing_ranges('aws', 'acct', date(2025, 6, 1), date(2025, 6, 5), today=TODAY)
+
+    # Day 2 was fetched with no costs and still counts as stored
+    assert ranges == [(date(2025, 6, 3), date(2025, 6, 5))]
+    assert store.stats() == {"hits": 2, "misses": 2}
+    assert store.load('aws', 'acct', date(2025, 6, 1), date(2025, 6, 5)) == [
+        ('2025-06-01', 'Amazon EC2', 10.0, 'USD')
+    ]
+
+def test_unsettled_days_are_always_refetched():
+    store = CostStore(":memory:", settle_days=3)
+    store.replace_days('aws', 'acct', date(2025, 6, 25), date(2025, 6, 30), [])
+
+    ranges = store.missing_ranges('aws', 'acct', date(2025, 6, 25), date(2025, 6, 30), today=TODAY)
+
+    assert ranges == [(date(2025, 6, 27), date(2025, 6, 30))]
+
+def test_replace_days_overwrites_open_days():
+    store = CostStore(":memory:", settle_days=3)
+    store.replace_days('azure', 'sub', date(2025, 6, 1), date(2025, 6, 2), [
+        ('2025-06-01', 'prod-rg', 1.0, 'USD'),
+        ('2025-06-01', 'dev-rg', 2.0, 'USD'),
+    ])
+    store.replace_days('azure', 'sub', date(2025, 6, 1), date(2025, 6, 2), [
+        ('2025-06-01', 'prod-rg', 5.0, 'USD'),
+    ])
+
+    assert store.load('azure', 'sub', date(2025, 6, 1), date(2025, 6, 2)) == [
+        ('2025-06-01', 'prod-rg', 5.0, 'USD')
+    ]
+
+def test_writer_replaces_days_only_on_commit():
+    store = CostStore(":memory:", settle_days=3)
+    store.replace_days('aws', 'acct', date(2025, 6, 1), date(2025, 6, 3), [('2025-06-01', 'Amazon EC2', 1.0, 'USD')])
+
+    writer = store.writer('aws', 'acct', date(2025, 6, 1), date(2025, 6, 3))
+    writer.add([('2025-06-01', 'Amazon EC2', 2.0, 'USD')])
+    writer.add(iter([('2025-06-02', 'Amazon S3', 3.0, 'USD')]))
+    # Readers keep seeing the old rows while pages are staged
+    assert store.load('aws', 'acct', date(2025, 6, 1), date(2025, 6, 3)) == [('2025-06-01', 'Amazon EC2', 1.0, 'USD')]
+    writer.commit()
+    assert store.load('aws', 'acct', date(2025, 6, 1), date(2025, 6, 3)) == [
+        ('2025-06-01', 'Amazon EC2', 2.0, 'USD'), ('2025-06-02', 'Amazon S3', 3.0, 'USD')
+    ]
+
+    abandoned = store.writer('aws', 'acct', date(2025, 6, 1), date(2025, 6, 3))
+    abandoned.add([('2025-06-01', 'Amazon EC2', 9.0, 'USD')])
+    abandoned.discard()
+    assert store.load('aws', 'acct', date(2025, 6, 1), date(2025, 6, 2)) == [('2025-06-01', 'Amazon EC2', 2.0, 'USD')]
+
+def test_stores_are_scoped_by_provider_and_account():
+    store = CostStore(":memory:", settle_days=3)
+    store.replace_days('aws', 'acct-1', date(2025, 6, 1), date(2025, 6, 2), [])
+
+    assert store.missing_ranges('aws', 'acct-2', date(2025, 6, 1), date(2025, 6, 2), today=TODAY)
+    assert store.missing_ranges('azure', 'acct-1', date(2025, 6, 1), date(2025, 6, 2), today=TODAY)
+
+@pytest.mark.parametrize("in_memory", [True, False])
+def test_reading_rows_does_not_block_the_store(tmp_path, in_memory):
+    store = CostStore(":memory:" if in_memory else str(tmp_path / "costs.sqlite3"), settle_days=3)
+    store.replace_days('aws', 'acct', date(2025, 6, 1), date(2025, 6, 3), [
+        ('2025-06-01', 'Amazon EC2', 1.0, 'USD'), ('2025-06-02', 'Amazon EC2', 2.0, 'USD'),
+    ])
+    rows = store.iter_rows('aws', 'acct', date(2025, 6, 1), date(2025, 6, 3))
+    assert next(rows) == ('2025-06-01', 'Amazon EC2', 1.0, 'USD')
+
+    # A consumer that is still iterating, or stopped early, leaves the store usable
+    writer = threading.Thread(target=store.replace_days,
+                              args=('aws', 'acct', date(2025, 6, 3), date(2025, 6, 4), []), daemon=True)
+    writer.start()
+    writer.join(timeout=5)
+    assert not writer.is_alive()
+    assert list(rows) == [('2025-06-02', 'Amazon EC2', 2.0, 'USD')]
+
+def test_overlapping_aws_requests_only_fetch_new_days(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_REGION", "us-east-1")
+
+    def get_cost_and_usage(**kwargs):
+        start = kwargs['TimePeriod']['Start']
+        return {'ResultsByTime': [{
+            'TimePeriod': {'Start': start, 'End': kwargs['TimePeriod']['End']},
+            'Groups': [{
+                'Keys': ['Amazon EC2'],
+                'Metrics': {'UnblendedCost': {'Amount': '1.0', 'Unit': 'USD'}}
+            }]
+        }]}
+
+    mock_ce = MagicMock()
+    mock_ce.get_cost_and_usage.side_effect = get_cost_and_usage
+    with patch('boto3.client', return_value=mock_ce):
+        first = client.get("/api/aws/costs", params={"start_date": "2025-06-01", "end_date": "2025-06-10"})
+        second = client.get("/api/aws/costs", params={"start_date": "2025-06-05", "end_date": "2025-06-15"})
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert mock_ce.get_cost_and_usage.call_count == 2
+    assert mock_ce.get_cost_and_usage.call_args.kwargs['TimePeriod'] == {
+        'Start': '2025-06-10', 'End': '2025-06-15'
+    }
+
+    stats = client.get("/metrics").json()["cost_store"]
+    assert stats == {"hits": 5, "misses": 14}
+
+def test_aws_cost_route_keeps_the_store_off_the_event_loop(monkeypatch):
+    from app.services.cost_store import DayWriter, cost_store
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_REGION", "us-east-1")
+    calls = []
+    for owner, name in ((cost_store, "missing_ranges"), (DayWriter, "add"), (DayWriter, "commit"),
+                        (cost_store, "iter_rows")):
+        def record(*args, _original=getattr(owner, name), _name=name, **kwargs):
+            calls.append((_name, threading.current_thread().name.startswith("aws-sdk")))
+            return _original(*args, **kwargs)
+        monkeypatch.setattr(owner, name, record)
+
+    mock_ce = MagicMock()
+    mock_ce.get_cost_and_usage.return_value = {'ResultsByTime': []}
+    with patch('boto3.client', return_value=mock_ce):
+        response = client.get("/api/aws/costs", params={"start_date": "2025-06-01", "end_date": "2025-06-03"})
+
+    assert response.status_code == 200
+    assert calls == [("missing_ranges", True), ("add", True), ("commit", True), ("iter_rows", True)]
@@ -0,0 +1,121 @@
+import sqlite3
+from datetime import date, datetime
+
+import pytest
+from app.services.athena_service import sql_literal
+from app.services.cur_query_builder import CurQueryBuilder, CurQueryError, billing_periods, trailing_days
+from app.services.result_cache import normalize_sql
+
+START = date(2024, 12, 15)
+END = date(2025, 1, 14)
+
+
+def test_top_resources_golden_sql():
+    query = CurQueryBuilder("my_cur_report").top_resources(START, END, limit=5, product_code="AmazonEC2")
+
+    assert normalize_sql(query.sql) == (
+        "SELECT line_item_resource_id, line_item_product_code, line_item_usage_type, "
+        "SUM(line_item_unblended_cost) AS total_cost, line_item_currency_code "
+        "FROM \"my_cur_report\" "
+        "WHERE ((year = '2024' AND month IN ('12')) OR (year = '2025' AND month IN ('1'))) "
+        "AND line_item_usage_start_date >= ? AND line_item_usage_start_date < ? "
+        "AND line_item_line_item_type = 'Usage' AND line_item_unblended_cost > 0 "
+        "AND line_item_product_code = ? "
+        "GROUP BY line_item_resource_id, line_item_product_code, line_item_usage_type, line_item_currency_code "
+        "ORDER BY total_cost DESC LIMIT 5"
+    )
+    assert query.parameters == ["2024-12-15 00:00:00", "2025-01-14 00:00:00", "AmazonEC2"]
+
+def test_usage_by_operation_golden_sql_for_cur2_partitions():
+    query = CurQueryBuilder("cur2", partition_scheme="billing_period").usage_by_operation(
+        date(2025, 5, 20), date(2025, 6, 19), limit=10
+    )
+
+    assert normalize_sql(query.sql) == (
+        "SELECT line_item_operation, line_item_product_code, SUM(line_item_unblended_cost) AS total_cost "
+        "FROM \"cur2\" "
+        "WHERE billing_period IN ('2025-05', '2025-06') "
+        "AND line_item_usage_start_date >= ? AND line_item_usage_start_date < ? "
+        "AND line_item_line_item_type = 'Usage' "
+        "GROUP BY line_item_operation, line_item_product_code "
+        "ORDER BY total_cost DESC LIMIT 10"
+    )
+    assert query.parameters == ["2025-05-20 00:00:00", "2025-06-19 00:00:00"]
+
+def test_no_function_is_applied_to_the_usage_timestamp():
+    for scheme in ("year_month", "billing_period", "none"):
+        sql = CurQueryBuilder("t", scheme).top_resources(START, END).sql
+        assert "date_parse" not in sql
+        assert "current_date" not in sql
+
+@pytest.mark.parametrize("limit", [0, -1, 1001, "10; DROP TABLE t", 2.5, True])
+def test_invalid_limits_are_rejected(limit):
+    with pytest.raises(CurQueryError):
+        CurQueryBuilder("t").top_resources(START, END, limit=limit)
+
+def test_filter_values_are_parameters_not_sql():
+    hostile = "AmazonEC2' OR '1'='1"
+    query = CurQueryBuilder("t").usage_by_operation(START, END, product_code=hostile)
+    assert hostile not in query.sql
+    assert query.parameters[-1] == hostile
+    assert sql_literal(hostile) == "'AmazonEC2'' OR ''1''=''1'"
+    assert sql_literal(datetime(2025, 1, 14)) == "TIMESTAMP '2025-01-14 00:00:00'"
+
+def test_billing_periods_and_trailing_days():
+    assert billing_periods(date(2024, 11, 30), date(2025, 2, 1)) == [(2024, 11), (2024, 12), (2025, 1)]
+    assert trailing_days(30, today=date(2025, 6, 30)) == (date(2025, 5, 31), date(2025, 7, 1))
+
+
+CUR_ROWS = [
+    # year, month, start, type, resource, product, usage type, operation, cost
+    ("2024", "11", "2024-11-30 23:00:00", "Usage", "i-old", "AmazonEC2", "BoxUsage", "RunInstances", 500.0),
+    ("2024", "12", "2024-12-14 23:00:00", "Usage", "i-old", "AmazonEC2", "BoxUsage", "RunInstances", 400.0),
+    ("2024", "12", "2024-12-15 00:00:00", "Usage", "i-1", "AmazonEC2", "BoxUsage", "RunInstances", 10.0),
+    ("2024", "12", "2024-12-31 12:00:00", "Usage", "i-1", "AmazonEC2", "BoxUsage", "RunInstances", 5.0),
+    ("2025", "1", "2025-01-02 08:00:00", "Usage", "bucket", "AmazonS3", "TimedStorage", "PutObject", 7.0),
+    ("2025", "1", "2025-01-03 08:00:00", "Tax", "i-1", "AmazonEC2", "Tax", "", 99.0),
+    ("2025", "1", "2025-01-13 23:59:59", "Usage", "db-1", "AmazonRDS", "InstanceUsage", "CreateDBInstance", 3.0),
+    ("2025", "1", "2025-01-14 00:00:00", "Usage", "db-1", "AmazonRDS", "InstanceUsage", "CreateDBInstance", 300.0),
+]
+
+
+@pytest.fixture
+def cur_db():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE "my_cur_report" (
+            year TEXT, month TEXT, line_item_usage_start_date TEXT, line_item_line_item_type TEXT,
+            line_item_resource_id TEXT, line_item_product_code TEXT, line_item_usage_type TEXT,
+            line_item_operation TEXT, line_item_unblended_cost REAL, line_item_currency_code TEXT
+        )
+    """)
+    conn.executemany('INSERT INTO "my_cur_report" VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, \'USD\')', CUR_ROWS)
+    yield conn
+    conn.close()
+
+
+def run(conn, query):
+    """Substitutes the parameters as the literal text Athena receives in ExecutionParameters."""
+    pieces = query.sql.split("?")
+    assert len(pieces) == len(query.parameters) + 1
+    sql = pieces[0] + "".join(sql_literal(value) + piece for value, piece in zip(query.parameters, pieces[1:]))
+    return conn.execute(sql).fetchall()
+
+
+def test_top_resources_against_fixture_cur(cur_db):
+    rows = run(cur_db, CurQueryBuilder("my_cur_report").top_resources(START, END))
+    assert rows == [
+        ("i-1", "AmazonEC2", "BoxUsage", 15.0, "USD"),
+        ("bucket", "AmazonS3", "TimedStorage", 7.0, "USD"),
+        ("db-1", "AmazonRDS", "InstanceUsage", 3.0, "USD"),
+    ]
+
+def test_usage_by_operation_against_fixture_cur(cur_db):
+    builder = CurQueryBuilder("my_cur_report")
+    assert run(cur_db, builder.usage_by_operation(START, END, limit=2)) == [
+        ("RunInstances", "AmazonEC2", 15.0),
+        ("PutObject", "AmazonS3", 7.0),
+    ]
+    assert run(cur_db, builder.usage_by_operation(START, END, product_code="AmazonRDS")) == [
+        ("CreateDBInstance", "AmazonRDS", 3.0),
+    ]
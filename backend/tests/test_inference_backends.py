@@ -0,0 +1,136 @@
+import difflib
+import json
+import threading
+from pathlib import Path
+
+import pytest
+import torch
+
+from app.api import recommendation_routes as rec_mod
+from app.services.generation_streaming import generate_streaming
+from app.services.inference_backends import (OnnxSeq2SeqModel, export_onnx, load_model, onnx_export_supported,
+                                             quantize_int8)
+from app.services.model_manager import ModelManager
+from tests.fakes import ByteTokenizer, tiny_seq2seq_model
+
+DATASET = Path(__file__).resolve().parents[2] / "nlp" / "data" / "synthetic_cloud_costs.jsonl"
+
+# int8 must stay this close to fp32 when both are fed the reference outputs
+INT8_MAX_RELATIVE_LOGIT_ERROR = 0.05
+INT8_MIN_TOKEN_AGREEMENT = 0.95
+INT8_MIN_TEXT_SIMILARITY = 0.8
+
+
+@pytest.fixture(scope="module")
+def synthetic_pairs():
+    with open(DATASET, encoding="utf-8") as handle:
+        rows = [json.loads(line) for line in handle if line.strip()]
+    return [row["input"] for row in rows], [row["output"] for row in rows]
+
+
+@pytest.fixture(scope="module")
+def fitted_model(synthetic_pairs):
+    """A tiny T5 overfitted to the synthetic dataset, so its outputs are real text rather than padding."""
+    inputs, outputs = synthetic_pairs
+    tokenizer = ByteTokenizer()
+    model = tiny_seq2seq_model(d_model=64, num_layers=2)
+    encoded = tokenizer(inputs, max_length=64)
+    labels = tokenizer(outputs, max_length=32)["input_ids"]
+    labels[labels == tokenizer.pad_token_id] = -100
+    optimizer = torch.optim.Adam(model.parameters(), lr=3e-3)
+    model.train()
+    for _ in range(150):
+        loss = model(**encoded, labels=labels).loss
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+    return model.eval()
+
+
+@pytest.fixture(scope="module")
+def onnx_model(fitted_model, tmp_path_factory):
+    # Optional dependencies from requirements-onnx.txt
+    for package in ("onnxruntime", "onnx", "onnxscript"):
+        pytest.importorskip(package)
+    if not onnx_export_supported():
+        pytest.skip(f"ONNX export requires torch 2.6 or newer; found {torch.__version__}")
+    output_dir = tmp_path_factory.mktemp("onnx")
+    export_onnx(fitted_model, str(output_dir))
+    return OnnxSeq2SeqModel(str(output_dir))
+
+
+def _generate(model, texts, max_length=32):
+    tokenizer = ByteTokenizer()
+    with torch.inference_mode():
+        return model.generate(**tokenizer(texts, max_length=64), max_length=max_length)
+
+def test_onnx_backend_matches_fp32_on_synthetic_dataset(fitted_model, onnx_model, synthetic_pairs):
+    inputs, _ = synthetic_pairs
+    expected = _generate(fitted_model, inputs)
+    assert ByteTokenizer().batch_decode(expected)[0].startswith("Switch EC2")
+    assert torch.equal(_generate(onnx_model, inputs), expected)
+
+def test_onnx_backend_matches_fp32_for_single_inputs_and_short_limits(fitted_model, onnx_model, synthetic_pairs):
+    inputs, _ = synthetic_pairs
+    for texts, max_length in (([inputs[2]], 32), (inputs, 5), (["Lambda 1200 invocations", "x"], 12)):
+        expected = _generate(fitted_model, texts, max_length)
+        actual = _generate(onnx_model, texts, max_length)
+        assert actual.shape == expected.shape
+        assert torch.equal(actual, expected)
+
+def test_onnx_backend_streams_words_and_honours_stopping_criteria(fitted_model, onnx_model, synthetic_pairs):
+    inputs, _ = synthetic_pairs
+    expected = ByteTokenizer().batch_decode(_generate(fitted_model, inputs[:1]))[0]
+    words = []
+    generate_streaming(onnx_model, ByteTokenizer(), "cpu", inputs[0], words.append, threading.Event(),
+                       input_max_length=64, max_length=32)
+    assert len(words) > 1
+    assert "".join(words) == expected
+
+    cancelled = threading.Event()
+    cancelled.set()
+    words = []
+    generate_streaming(onnx_model, ByteTokenizer(), "cpu", inputs[0], words.append, cancelled,
+                       input_max_length=64, max_length=32)
+    # Stopped right after the first token
+    assert "".join(words) == expected[:1]
+
+def test_onnx_backend_counts_max_new_tokens_after_the_start_token(fitted_model, onnx_model, synthetic_pairs):
+    inputs, _ = synthetic_pairs
+    encoded = ByteTokenizer()(inputs, max_length=64)
+    with torch.inference_mode():
+        expected = fitted_model.generate(**encoded, max_new_tokens=4)
+    assert torch.equal(onnx_model.generate(**encoded, max_new_tokens=4), expected)
+    with pytest.raises(ValueError, match="greedily"):
+        onnx_model.generate(**encoded, num_beams=2)
+
+def test_int8_backend_stays_within_tolerance_of_fp32(fitted_model, synthetic_pairs):
+    inputs, outputs = synthetic_pairs
+    tokenizer = ByteTokenizer()
+    quantized = quantize_int8(fitted_model)
+    encoded = tokenizer(inputs, max_length=64)
+    labels = tokenizer(outputs, max_length=32)["input_ids"]
+    with torch.inference_mode():
+        reference = fitted_model(**encoded, labels=labels).logits
+        logits = quantized(**encoded, labels=labels).logits
+    assert ((logits - reference).norm() / reference.norm()).item() < INT8_MAX_RELATIVE_LOGIT_ERROR
+    agreement = (logits.argmax(-1) == reference.argmax(-1)).float().mean().item()
+    assert agreement >= INT8_MIN_TOKEN_AGREEMENT
+
+    expected = tokenizer.batch_decode(_generate(fitted_model, inputs))
+    actual = tokenizer.batch_decode(_generate(quantized, inputs))
+    similarity = [difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(expected, actual)]
+    assert sum(similarity) / len(similarity) >= INT8_MIN_TEXT_SIMILARITY
+
+def test_unknown_backend_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Unknown recommender backend"):
+        ModelManager(str(tmp_path), backend="tensorrt")
+    with pytest.raises(ValueError, match="Unknown recommender backend"):
+        load_model(str(tmp_path), "fp16")
+
+def test_recommendation_cache_key_depends_on_backend(monkeypatch):
+    cost_data = {"EC2": 1250.0}
+    monkeypatch.setattr(rec_mod.model_manager, "backend", "torch")
+    fp32_key = rec_mod.cache_key(cost_data)
+    monkeypatch.setattr(rec_mod.model_manager, "backend", "int8")
+    assert rec_mod.cache_key(cost_data) != fp32_key
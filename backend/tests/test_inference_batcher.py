@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from app.services.inference_batcher import InferenceBatcher
+
+
+def test_concurrent_inputs_share_one_batch():
+    batches = []
+
+    def process(items):
+        batches.append(list(items))
+        return [item.upper() for item in items]
+
+    batcher = InferenceBatcher(process, max_batch_size=8, max_wait_ms=50)
+
+    async def main():
+        return await asyncio.gather(*[batcher.run(f"item-{n}") for n in range(5)])
+
+    results = asyncio.run(main())
+    batcher.shutdown(wait=True)
+
+    assert results == [f"ITEM-{n}" for n in range(5)]
+    assert batches == [[f"item-{n}" for n in range(5)]]
+    assert batcher.stats()["avg_batch_size"] == 5
+
+def test_batches_are_capped_at_max_size():
+    batches = []
+    gate = threading.Event()
+
+    def process(items):
+        gate.wait()
+        batches.append(len(items))
+        return items
+
+    batcher = InferenceBatcher(process, max_batch_size=3, max_wait_ms=20)
+    futures = [batcher.submit(n) for n in range(7)]
+    gate.set()
+
+    assert [future.result(timeout=5) for future in futures] == list(range(7))
+    batcher.shutdown(wait=True)
+    assert max(batches) <= 3
+    assert sum(batches) == 7
+
+def test_lone_input_waits_at_most_the_batch_window():
+    batcher = InferenceBatcher(lambda items: items, max_batch_size=32, max_wait_ms=20)
+    started = time.perf_counter()
+    assert batcher.submit("only").result(timeout=5) == "only"
+    batcher.shutdown(wait=True)
+    assert time.perf_counter() - started < 0.5
+
+def test_batch_failure_reaches_every_caller():
+    def process(items):
+        raise RuntimeError("inference failed")
+
+    batcher = InferenceBatcher(process, max_batch_size=4, max_wait_ms=20)
+    futures = [batcher.submit(n) for n in range(3)]
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="inference failed"):
+            future.result(timeout=5)
+    # The worker survives a failed batch
+    batcher.process_batch = lambda items: items
+    assert batcher.submit("next").result(timeout=5) == "next"
+    batcher.shutdown(wait=True)
+
+def test_workers_run_batches_side_by_side():
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def process(items):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.1)
+        with lock:
+            running[0] -= 1
+        return items
+
+    batcher = InferenceBatcher(process, max_batch_size=1, max_wait_ms=0, workers=2)
+    futures = [batcher.submit(n) for n in range(4)]
+    assert [future.result(timeout=5) for future in futures] == [0, 1, 2, 3]
+    batcher.shutdown(wait=True)
+    assert peak[0] == 2
+
+def test_single_inputs_run_before_queued_batches():
+    order = []
+    gate = threading.Event()
+
+    def process(items):
+        gate.wait()
+        order.append(list(items))
+        return items
+
+    batcher = InferenceBatcher(process, max_batch_size=8, max_wait_ms=0)
+    chunks = [batcher.submit_batch([f"chunk-{n}a", f"chunk-{n}b"]) for n in range(3)]
+    while batcher.stats()["queued"] > 2:  # the worker has started on the first chunk
+        time.sleep(0.01)
+    single = batcher.submit("interactive")
+    gate.set()
+
+    assert single.result(timeout=5) == "interactive"
+    assert [chunk.result(timeout=5) for chunk in chunks] == [[f"chunk-{n}a", f"chunk-{n}b"] for n in range(3)]
+    batcher.shutdown(wait=True)
+    assert order == [["chunk-0a", "chunk-0b"], ["interactive"], ["chunk-1a", "chunk-1b"], ["chunk-2a", "chunk-2b"]]
+
+def test_shutdown_finishes_queued_batches():
+    batcher = InferenceBatcher(lambda items: items, max_batch_size=8, max_wait_ms=0)
+    chunks = [batcher.submit_batch([n]) for n in range(3)]
+    batcher.shutdown(wait=True)
+    assert [chunk.result(timeout=5) for chunk in chunks] == [[0], [1], [2]]
@@ -0,0 +1,87 @@
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import model_manager as manager_mod
+from app.services.inference_pool import InferencePool, InferenceWorkerError, worker_cores
+from tests.fakes import echo_worker, failing_worker
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = InferencePool(echo_worker, workers=2, threads_per_worker=1, pin_cores=False, poll_interval=0.1)
+    pool.start()
+    pool.wait_ready(timeout=120)
+    yield pool
+    pool.shutdown()
+
+
+def _worker_pid(result: str) -> int:
+    return int(result.split("|")[1])
+
+def test_jobs_run_in_worker_processes_with_fixed_thread_count(pool):
+    results = [pool.submit([f"text-{n}"]).result(timeout=30) for n in range(4)]
+    for (result,), n in zip(results, range(4)):
+        text, pid, threads = result.split("|")
+        assert text == f"text-{n}"
+        assert int(pid) != os.getpid()
+        assert threads == "1"
+
+def test_jobs_go_to_the_least_loaded_worker(pool):
+    slow = pool.submit(["slow"], delay=0.5)
+    fast = pool.submit(["fast"])
+    fast_pid = _worker_pid(fast.result(timeout=30)[0])
+    # The slow job still occupies its worker, so the next one joins the idle worker
+    again = pool.submit(["again"])
+    assert _worker_pid(again.result(timeout=30)[0]) == fast_pid
+    assert _worker_pid(slow.result(timeout=30)[0]) != fast_pid
+    assert pool.stats()["dispatched"] >= 3
+
+def test_job_errors_are_raised_to_the_caller(pool):
+    with pytest.raises(InferenceWorkerError, match="cannot handle this input"):
+        pool.submit(["bad"], action="raise").result(timeout=30)
+    assert pool.submit(["good"]).result(timeout=30)[0].startswith("good|")
+
+def test_dead_worker_fails_its_job_and_is_restarted(pool):
+    restarts = pool.stats()["restarts"]
+    with pytest.raises(InferenceWorkerError, match="exited"):
+        pool.submit(["crash"], action="exit").result(timeout=30)
+    deadline = time.monotonic() + 120
+    while pool.stats()["restarts"] == restarts and time.monotonic() < deadline:
+        time.sleep(0.05)
+    pool.wait_ready(timeout=120)
+    assert pool.stats()["ready"] == 2
+    assert [pool.submit([f"after-{n}"]).result(timeout=30) for n in range(2)]
+
+def test_failed_worker_setup_is_reported():
+    pool = InferencePool(failing_worker, workers=1, threads_per_worker=1, poll_interval=0.1)
+    pool.start()
+    try:
+        with pytest.raises(InferenceWorkerError, match="model files are missing"):
+            pool.wait_ready(timeout=120)
+        with pytest.raises(InferenceWorkerError, match="no ready workers"):
+            pool.submit(["text"])
+    finally:
+        pool.shutdown()
+
+def test_workers_are_pinned_to_separate_cores_only_when_there_are_enough():
+    cores = list(range(8))
+    assert [worker_cores(index, 4, 2, cores) for index in range(4)] == [[0, 1], [2, 3], [4, 5], [6, 7]]
+    assert worker_cores(0, 4, 4, cores) is None
+
+def test_batch_recommendations_run_on_the_worker_pool(pool, monkeypatch):
+    monkeypatch.setattr(manager_mod.model_manager, "pool", pool)
+    # Distinct after the cache buckets numbers to two significant digits
+    cost_data = [{"EC2": 100 * (n + 1)} for n in range(5)]
+    response = client.post("/api/recommendations/batch", json={"cost_data": cost_data})
+    assert response.status_code == 200
+    recommendations = response.json()["recommendations"]
+    assert [recommendation.split("|")[0] for recommendation in recommendations] == [
+        f"EC2: {100 * (n + 1)}" for n in range(5)
+    ]
+    assert all(_worker_pid(recommendation) != os.getpid() for recommendation in recommendations)
@@ -0,0 +1,73 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import model_manager as manager_mod
+from app.services.model_manager import FAILED, LOADING, READY, UNAVAILABLE, ModelManager
+
+client = TestClient(app)
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def test_importing_the_app_does_not_import_torch():
+    code = "import sys, app.main; print('torch' in sys.modules, 'transformers' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["False", "False"]
+
+def test_missing_model_directory_is_unavailable(tmp_path):
+    manager = ModelManager(str(tmp_path / "missing"))
+    manager.start()
+    assert manager.wait(timeout=5) is False
+    assert manager.status()["state"] == UNAVAILABLE
+
+def test_background_load_reports_timings(tmp_path, monkeypatch):
+    import transformers
+    (tmp_path / "config.json").write_text("{}")
+    monkeypatch.setattr(transformers.AutoTokenizer, "from_pretrained", lambda path: "tokenizer")
+
+    class FakeModel:
+        def to(self, device):
+            return self
+        def eval(self):
+            return self
+
+    monkeypatch.setattr(transformers.AutoModelForSeq2SeqLM, "from_pretrained", lambda path: FakeModel())
+    manager = ModelManager(str(tmp_path))
+    manager.start()
+
+    assert manager.wait(timeout=30) is True
+    status = manager.status()
+    assert status["state"] == READY
+    assert status["total_seconds"] >= status["load_seconds"] >= 0
+
+def test_failed_load_reports_error(tmp_path):
+    (tmp_path / "config.json").write_text("not a model config")
+    manager = ModelManager(str(tmp_path))
+    manager.start()
+
+    assert manager.wait(timeout=60) is False
+    status = manager.status()
+    assert status["state"] == FAILED
+    assert status["error"]
+
+def test_ready_endpoint_waits_for_loading_model(monkeypatch):
+    monkeypatch.setattr(manager_mod.model_manager, "_state", LOADING)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["components"]["recommendation_model"]["state"] == LOADING
+
+    monkeypatch.setattr(manager_mod.model_manager, "_state", UNAVAILABLE)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+    assert response.json()["components"]["api"]["ready"] is True
+
+def test_recommendations_return_503_while_model_loads(monkeypatch):
+    monkeypatch.setattr(manager_mod.model_manager, "_state", LOADING)
+    response = client.post("/api/recommendations", json={"cost_data": {"EC2": "high usage"}})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
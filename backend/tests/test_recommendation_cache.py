@@ -0,0 +1,62 @@
+import time
+
+from app.services.recommendation_cache import RecommendationCache
+from app.services.recommender import bucket_number, canonicalize_cost_data
+from app.services.result_cache import ResultCache
+
+GENERATION = {"input_max_length": 64, "max_length": 32}
+
+
+def make_cache(path=""):
+    return RecommendationCache(ResultCache(ttl=60, max_entries=100, max_bytes=1 << 20), path=path)
+
+
+def test_numbers_are_bucketed_to_significant_digits():
+    assert bucket_number(1234.56, 2) == 1200
+    assert bucket_number(1229.9, 2) == 1200
+    assert bucket_number(0.04567, 2) == 0.046
+    assert bucket_number(0, 2) == 0
+
+def test_canonical_input_ignores_key_order_and_small_differences():
+    first = canonicalize_cost_data({"S3": 45.32, "EC2": "high usage"}, 2)
+    second = canonicalize_cost_data({"EC2": "high usage", "S3": 45.1}, 2)
+    assert first == second == {"EC2": "high usage", "S3": 45}
+    assert list(first) == ["EC2", "S3"]
+
+def test_key_covers_model_version_and_generation_settings():
+    key = RecommendationCache.key("EC2: high usage", "v1", GENERATION)
+    assert key == RecommendationCache.key("EC2: high usage", "v1", dict(reversed(list(GENERATION.items()))))
+    assert key != RecommendationCache.key("EC2: high usage", "v2", GENERATION)
+    assert key != RecommendationCache.key("EC2: high usage", "v1", {**GENERATION, "max_length": 64})
+
+def test_hits_report_rate_and_latency_saved():
+    cache = make_cache()
+    key = cache.key("EC2: high usage", "v1", GENERATION)
+    assert cache.get(key) is None
+    cache.set(key, "Use reserved instances", 0.25)
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        assert cache.get(key) == "Use reserved instances"
+    per_hit = (time.perf_counter() - started) / 1000
+
+    stats = cache.stats()
+    assert stats["hits"] == 1000
+    assert round(stats["hit_rate"], 3) == round(1000 / 1001, 3)
+    assert round(stats["latency_saved_seconds"], 6) == 250.0
+    assert per_hit < 0.001
+
+def test_entries_persist_across_restarts(tmp_path):
+    path = str(tmp_path / "cache" / "recommendations.json")
+    cache = make_cache(path)
+    cache.set("key", "Delete unattached EBS volumes", 0.3)
+    assert cache.save() == 1
+
+    restarted = make_cache(path)
+    assert restarted.load() == 1
+    assert restarted.get("key") == "Delete unattached EBS volumes"
+
+def test_unreadable_cache_file_is_ignored(tmp_path):
+    path = tmp_path / "recommendations.json"
+    path.write_text("not json")
+    assert make_cache(str(path)).load() == 0
@@ -0,0 +1,103 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.recommendation_rules import (DEFAULT_RULES, KeywordIndex, Rule, RuleEngine, cost_findings,
+                                               recommendation_rules)
+
+client = TestClient(app)
+
+
+def test_keyword_index_finds_overlapping_whole_word_keywords():
+    index = KeywordIndex(["ebs", "unattached", "load balancer", "load balancers", "ip", "elastic ip"])
+    assert index.find("12 Load Balancers idle, EBS unattached") == {"load balancers", "ebs", "unattached"}
+    assert index.find("unattached Elastic IP") == {"unattached", "elastic ip", "ip"}
+    # Keywords inside longer words do not count
+    assert index.find("webs shipped, one load balancer") == {"load balancer"}
+
+
+def test_cost_findings_split_values_and_skip_what_the_model_never_sees():
+    assert cost_findings({"EC2": "idle, low CPU", "S3": 0, "RDS": 120.5, "Tags": ["x"], "Flag": True}) == [
+        ("EC2: idle", None), ("EC2: low CPU", None), ("RDS: 120.5", 120.5),
+    ]
+    assert cost_findings("EBS unattached; S3 cold") == [("EBS unattached", None), ("S3 cold", None)]
+
+
+def test_rules_answer_only_when_every_item_is_covered():
+    engine = RuleEngine(DEFAULT_RULES, min_confidence=0.8)
+
+    match = engine.match({"EBS": "40 volumes unattached", "Elastic IPs": "6 unattached"})
+    assert match.recommendation == "Snapshot and delete the unattached EBS volumes. Release the unattached Elastic IPs."
+    assert match.rules == ("unattached-ebs", "unattached-eip")
+    assert match.confidence == 0.95
+
+    assert engine.match({"EBS": "unattached", "EC2": "high usage"}) is None
+    assert engine.match({"EC2": "idle, high usage"}) is None
+    assert engine.match({}) is None
+
+
+def test_negated_signals_leave_the_item_uncovered():
+    engine = RuleEngine(DEFAULT_RULES, min_confidence=0.8)
+
+    assert engine.match({"EBS": "no unattached volumes"}) is None
+    assert engine.match({"RDS": "not idle"}) is None
+    assert engine.match({"EC2": "never idle"}) is None
+    assert engine.match({"Elastic IPs": "none without an instance, 6 aren't unused"}) is None
+    assert engine.match({"EC2": "stopped, not idle"}) is None
+    # Negations only reach forward, and may be part of a signal itself
+    assert engine.match({"EBS": "unattached volumes with no snapshots"}).rules == ("unattached-ebs",)
+    assert engine.match({"S3": "90% not accessed"}).rules == ("cold-s3",)
+    assert engine.match({"Load balancer": "no targets"}).rules == ("idle-load-balancer",)
+    assert engine.match({"EBS": "40 volumes unattached"}).rules == ("unattached-ebs",)
+
+
+def test_cost_thresholds_and_minimum_confidence():
+    engine = RuleEngine(DEFAULT_RULES, min_confidence=0.8)
+    assert engine.match({"EC2": 12000}).rules == ("ec2-spend",)
+    assert engine.match({"EC2": 9000}) is None
+    # A keyword rule beats a threshold rule when both apply
+    assert engine.match({"EC2 idle": 12000}).rules == ("idle-ec2",)
+
+    strict = RuleEngine(DEFAULT_RULES, min_confidence=0.9)
+    assert strict.match({"EC2": 12000}) is None
+    assert strict.match({"EBS": "unattached", "EC2": 12000}) is None
+
+
+def test_stats_report_the_fast_path_share():
+    engine = RuleEngine([Rule("cold-s3", ("s3",), "Use Glacier.", 0.9, signals=("cold",))], min_confidence=0.8)
+    engine.match({"S3": "cold"})
+    engine.match({"S3": "hot"})
+
+    assert engine.stats() == {"rules": 1, "checked": 2, "matched": 1, "fast_path_share": 0.5, "hits": {"cold-s3": 1}}
+
+
+def test_rule_answers_skip_the_model(monkeypatch):
+    import app.api.recommendation_routes as rec_mod
+    monkeypatch.setattr(rec_mod.model_manager, "model", None)
+    monkeypatch.setattr(rec_mod.model_manager, "tokenizer", None)
+    checked = recommendation_rules.stats()["checked"]
+
+    response = client.post("/api/recommendations", json={"cost_data": {"EBS": "unattached"}})
+    assert response.status_code == 200
+    assert response.json() == {"recommendation": "Snapshot and delete the unattached EBS volumes.",
+                               "source": "rules", "confidence": 0.95}
+
+    batch = client.post("/api/recommendations/batch", json={"cost_data": [{"S3": "cold"}, {"EC2": 20000}]})
+    assert batch.json()["sources"] == ["rules", "rules"]
+    assert batch.json()["confidences"] == [0.9, 0.8]
+
+    events = client.post("/api/recommendations/stream", json={"cost_data": {"Elastic IP": "unused"}}).text
+    assert '"source": "rules"' in events
+
+    assert client.get("/metrics").json()["recommendation_rules"]["checked"] == checked + 4
+    # Anything the rules cannot answer still needs the model
+    assert client.post("/api/recommendations", json={"cost_data": {"EC2": "high usage"}}).status_code == 500
+
+
+def test_rules_can_be_disabled(monkeypatch):
+    import app.api.recommendation_routes as rec_mod
+    monkeypatch.setattr(rec_mod.settings, "RECOMMENDER_RULES_ENABLED", False)
+    monkeypatch.setattr(rec_mod.model_manager, "model", None)
+    monkeypatch.setattr(rec_mod.model_manager, "tokenizer", None)
+
+    response = client.post("/api/recommendations", json={"cost_data": {"EBS": "unattached"}})
+    assert response.status_code == 500
@@ -18,9 +18,9 @@ def test_recommendation_success(monkeypatch):
         def decode(self, ids, skip_special_tokens=True):
             return "Use reserved instances for EC2"
     import app.api.recommendation_routes as rec_mod
-    monkeypatch.setattr(rec_mod, "MODEL", DummyModel())
-    monkeypatch.setattr(rec_mod, "TOKENIZER", DummyTokenizer())
-    monkeypatch.setattr(rec_mod, "DEVICE", "cpu")
+    monkeypatch.setattr(rec_mod.model_manager, "model", DummyModel())
+    monkeypatch.setattr(rec_mod.model_manager, "tokenizer", DummyTokenizer())
+    monkeypatch.setattr(rec_mod.model_manager, "device", "cpu")
 
     payload = {"cost_data": {"EC2": "high usage", "S3": "infrequent access"}}
     response = client.post("/api/recommendations", json=payload)
@@ -30,8 +30,8 @@ def test_recommendation_success(monkeypatch):
 
 def test_recommendation_model_not_loaded(monkeypatch):
     import app.api.recommendation_routes as rec_mod
-    monkeypatch.setattr(rec_mod, "MODEL", None)
-    monkeypatch.setattr(rec_mod, "TOKENIZER", None)
+    monkeypatch.setattr(rec_mod.model_manager, "model", None)
+    monkeypatch.setattr(rec_mod.model_manager, "tokenizer", None)
     payload = {"cost_data": {"EC2": "high usage"}}
     response = client.post("/api/recommendations", json=payload)
     assert response.status_code == 500
@@ -48,10 +48,215 @@ def test_recommendation_inference_error(monkeypatch):
         def decode(self, ids, skip_special_tokens=True):
             return ""
     import app.api.recommendation_routes as rec_mod
-    monkeypatch.setattr(rec_mod, "MODEL", DummyModel())
-    monkeypatch.setattr(rec_mod, "TOKENIZER", DummyTokenizer())
-    monkeypatch.setattr(rec_mod, "DEVICE", "cpu")
+    monkeypatch.setattr(rec_mod.model_manager, "model", DummyModel())
+    monkeypatch.setattr(rec_mod.model_manager, "tokenizer", DummyTokenizer())
+    monkeypatch.setattr(rec_mod.model_manager, "device", "cpu")
     payload = {"cost_data": {"EC2": "high usage"}}
     response = client.post("/api/recommendations", json=payload)
     assert response.status_code == 500
     assert response.json()["detail"] == "Failed to generate recommendation."
+
+def test_concurrent_recommendations_share_a_batched_generate(monkeypatch):
+    import asyncio
+    import httpx
+    import app.api.recommendation_routes as rec_mod
+    from tests.fakes import ByteTokenizer
+
+    calls = []
+
+    class EchoModel:
+        device = "cpu"
+        def generate(self, input_ids, attention_mask, **kwargs):
+            calls.append(input_ids.shape[0])
+            return input_ids
+
+    monkeypatch.setattr(rec_mod.model_manager, "model", EchoModel())
+    monkeypatch.setattr(rec_mod.model_manager, "tokenizer", ByteTokenizer())
+    monkeypatch.setattr(rec_mod.model_manager, "device", "cpu")
+    monkeypatch.setattr(rec_mod.recommendation_batcher, "max_wait", 0.2)
+
+    async def fire_requests():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            return await asyncio.gather(*[
+                async_client.post("/api/recommendations", json={"cost_data": {"EC2": n + 1}})
+                for n in range(4)
+            ])
+
+    responses = asyncio.run(fire_requests())
+
+    assert [response.json()["recommendation"] for response in responses] == [
+        f"EC2: {n + 1}" for n in range(4)
+    ]
+    assert calls == [4]
+
+def test_length_sorted_chunks_group_similar_lengths():
+    from app.api.recommendation_routes import length_sorted_chunks
+    texts = ["a" * 50, "b", "c" * 20, "d" * 2, "e" * 49]
+    assert length_sorted_chunks(texts, 2) == [[1, 3], [2, 4], [0]]
+
+def _patch_echo_model(monkeypatch, batch_sizes):
+    import app.api.recommendation_routes as rec_mod
+    from tests.fakes import ByteTokenizer
+
+    class EchoModel:
+        device = "cpu"
+        def generate(self, input_ids, attention_mask, **kwargs):
+            batch_sizes.append((input_ids.shape[0], int(attention_mask.sum()), attention_mask.numel()))
+            return input_ids
+
+    monkeypatch.setattr(rec_mod.model_manager, "model", EchoModel())
+    monkeypatch.setattr(rec_mod.model_manager, "tokenizer", ByteTokenizer())
+    monkeypatch.setattr(rec_mod.model_manager, "device", "cpu")
+    monkeypatch.setattr(rec_mod.settings, "RECOMMENDER_BATCH_CHUNK_SIZE", 3)
+
+def test_batch_recommendations_keep_request_order(monkeypatch):
+    batch_sizes = []
+    _patch_echo_model(monkeypatch, batch_sizes)
+    cost_data = [{"Service" + "x" * (n * 7 % 11): n + 1} for n in range(8)]
+
+    response = client.post("/api/recommendations/batch", json={"cost_data": cost_data})
+
+    assert response.status_code == 200
+    assert response.json()["recommendations"] == [
+        ", ".join(f"{k}: {v}" for k, v in item.items()) for item in cost_data
+    ]
+    assert [size for size, _, _ in batch_sizes] == [3, 3, 2]
+    # Length bucketing keeps padding well below that of arrival-order chunks
+    padded = sum(total - real for _, real, total in batch_sizes)
+    assert padded < 30
+
+def test_batch_recommendations_stream_ndjson(monkeypatch):
+    import json
+    batch_sizes = []
+    _patch_echo_model(monkeypatch, batch_sizes)
+    cost_data = [{"EC2": n + 1} for n in range(5)]
+
+    with client.stream("POST", "/api/recommendations/batch", params={"stream": True},
+                       json={"cost_data": cost_data}) as response:
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert sorted(line["index"] for line in lines) == list(range(5))
+    assert all(line["recommendation"] == f"EC2: {line['index'] + 1}" for line in lines)
+
+def test_batch_recommendations_reject_empty_batch():
+    response = client.post("/api/recommendations/batch", json={"cost_data": []})
+    assert response.status_code == 422
+
+def test_equivalent_requests_are_served_from_cache(monkeypatch):
+    batch_sizes = []
+    _patch_echo_model(monkeypatch, batch_sizes)
+
+    first = client.post("/api/recommendations", json={"cost_data": {"S3": 1234.5, "EC2": 310}})
+    second = client.post("/api/recommendations", json={"cost_data": {"EC2": 311, "S3": 1229}})
+    batch = client.post("/api/recommendations/batch", json={"cost_data": [
+        {"EC2": 309, "S3": 1240}, {"RDS": 80},
+    ]})
+
+    assert second.json()["recommendation"] == first.json()["recommendation"]
+    # The echo model shows the cached text was generated from the canonical input
+    assert first.json()["recommendation"] == "EC2: 310, S3: 1200"
+    assert (first.json()["source"], second.json()["source"]) == ("model", "cache")
+    assert batch.json()["recommendations"][0] == first.json()["recommendation"]
+    assert batch.json()["sources"] == ["cache", "model"]
+    # Only the first request and the new RDS input reached the model
+    assert [size for size, _, _ in batch_sizes] == [1, 1]
+
+def _patch_scripted_model(monkeypatch, text, step_delay=0.0):
+    import app.api.recommendation_routes as rec_mod
+    from tests.fakes import ByteTokenizer, ScriptedSeq2SeqModel
+
+    model = ScriptedSeq2SeqModel(text, step_delay)
+    monkeypatch.setattr(rec_mod.model_manager, "model", model)
+    monkeypatch.setattr(rec_mod.model_manager, "tokenizer", ByteTokenizer())
+    monkeypatch.setattr(rec_mod.model_manager, "device", "cpu")
+    return model
+
+def _sse_events(body):
+    import json
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+def test_stream_recommendation_sends_words_then_done(monkeypatch):
+    _patch_scripted_model(monkeypatch, "Use spot instances for CI.")
+
+    response = client.post("/api/recommendations/stream", json={"cost_data": {"EC2": 1250}})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(response.text)
+
+    tokens = [data["text"] for event, data in events if event == "token"]
+    assert tokens[:3] == ["Use ", "spot ", "instances "]
+    assert events[-1] == ("done", {"recommendation": "Use spot instances for CI.", "source": "model",
+                                   "confidence": None})
+    assert "".join(tokens) == events[-1][1]["recommendation"]
+
+    # The finished text is cached and replayed as one token
+    cached = _sse_events(client.post("/api/recommendations/stream", json={"cost_data": {"EC2": 1249}}).text)
+    assert cached == [("token", {"text": "Use spot instances for CI."}),
+                      ("done", {"recommendation": "Use spot instances for CI.", "source": "cache",
+                                "confidence": None})]
+
+def test_stream_recommendation_accepts_get_with_json_query(monkeypatch):
+    import json
+    _patch_scripted_model(monkeypatch, "Delete idle volumes.")
+
+    response = client.get("/api/recommendations/stream", params={"cost_data": json.dumps({"EBS": 40})})
+    assert _sse_events(response.text)[-1][1]["recommendation"] == "Delete idle volumes."
+    assert client.get("/api/recommendations/stream", params={"cost_data": "{not json"}).status_code == 422
+    assert client.get("/api/recommendations/stream", params={"cost_data": "[1, 2]"}).status_code == 422
+
+def test_stream_recommendation_reports_generation_failure(monkeypatch):
+    model = _patch_scripted_model(monkeypatch, "unused")
+    monkeypatch.setattr(model, "generate", lambda **kwargs: (_ for _ in ()).throw(RuntimeError("boom")))
+
+    events = _sse_events(client.post("/api/recommendations/stream", json={"cost_data": {"EC2": 1}}).text)
+    assert events == [("error", {"detail": "Failed to generate recommendation."})]
+
+def test_stream_recommendation_stops_generating_when_client_disconnects(monkeypatch):
+    import asyncio
+    import json
+    import time
+    import app.api.recommendation_routes as rec_mod
+
+    model = _patch_scripted_model(monkeypatch, "word " * 40, step_delay=0.02)
+    cancelled_before = rec_mod.recommendation_streamer.stats()["cancelled"]
+    body = json.dumps({"cost_data": {"EC2": 77}}).encode()
+    chunks = []
+
+    async def disconnect_after_first_word():
+        first_chunk = asyncio.Event()
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await first_chunk.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                chunks.append(message["body"])
+                first_chunk.set()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": "/api/recommendations/stream", "raw_path": b"/api/recommendations/stream",
+            "root_path": "", "query_string": b"", "client": ("test", 1), "server": ("test", 80),
+            "headers": [(b"content-type", b"application/json"), (b"host", b"test")],
+        }
+        await app(scope, receive, send)
+
+    asyncio.run(disconnect_after_first_word())
+    time.sleep(0.2)
+
+    assert chunks and chunks[0].startswith(b"event: token")
+    # max_length 32 allows 31 tokens; generation stopped well before that
+    assert model.steps < 20
+    assert rec_mod.recommendation_streamer.stats()["cancelled"] == cancelled_before + 1
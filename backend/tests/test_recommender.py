@@ -0,0 +1,81 @@
+import pytest
+import transformers
+
+from app.api.recommendation_routes import canonical_input
+from app.core.config import settings
+from app.services import recommender as recommender_mod
+from app.services.recommender import Recommender, cost_data_to_text
+from tests.fakes import ByteTokenizer, tiny_seq2seq_model
+
+COST_DATA = [{"EC2": 100 + n, "S3": "infrequent access" if n % 2 else "hot"} for n in range(7)]
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    tiny_seq2seq_model(d_model=32, num_layers=1).save_pretrained(tmp_path)
+    loads = []
+
+    def from_pretrained(path):
+        loads.append(path)
+        return ByteTokenizer()
+
+    monkeypatch.setattr(transformers.AutoTokenizer, "from_pretrained", from_pretrained)
+    recommender_mod._load.cache_clear()
+    yield tmp_path, loads
+    recommender_mod._load.cache_clear()
+
+
+def test_load_reads_the_model_once_per_directory_and_device(model_dir):
+    path, loads = model_dir
+    first = Recommender.load(str(path))
+    beams = Recommender.load(str(path), num_beams=2, max_new_tokens=5)
+    assert beams.model is first.model
+    assert beams.generation == {"input_max_length": 64, "max_new_tokens": 5, "num_beams": 2}
+    assert len(loads) == 1
+    assert Recommender.load(str(path), device="cpu").model is not first.model
+    assert len(loads) == 2
+
+def test_recommend_many_matches_recommend_in_input_order(model_dir):
+    path, _ = model_dir
+    recommender = Recommender.load(str(path), max_length=8)
+    expected = [recommender.recommend(cost_data) for cost_data in COST_DATA]
+    batches = []
+    generate = recommender.generate
+    recommender.generate = lambda texts: batches.append(len(texts)) or generate(texts)
+    assert list(recommender.recommend_many(iter(COST_DATA), batch_size=3)) == expected
+    assert batches == [3, 3, 1]
+
+def test_generation_settings_reach_generate(model_dir):
+    path, _ = model_dir
+    calls = []
+    recommender = Recommender.load(str(path), max_new_tokens=4, num_beams=3)
+    generate = recommender.model.generate
+    recommender.model.generate = lambda **kwargs: calls.append(kwargs) or generate(**kwargs)
+    try:
+        recommender.recommend({"EC2": 1})
+    finally:
+        del recommender.model.generate
+    assert calls[0]["max_new_tokens"] == 4
+    assert calls[0]["num_beams"] == 3
+    assert "max_length" not in calls[0]
+
+def test_significant_digits_build_the_same_prompt_as_the_api(model_dir):
+    path, _ = model_dir
+    prompts = []
+    for significant_digits in (None, settings.RECOMMENDER_CACHE_SIGNIFICANT_DIGITS):
+        recommender = Recommender.load(str(path), significant_digits=significant_digits)
+        recommender.generate = lambda texts: prompts.append(texts) or ["" for _ in texts]
+        recommender.recommend({"S3": 1234.56, "EC2": "idle"})
+        list(recommender.recommend_many([{"S3": 1234.56, "EC2": "idle"}]))
+    assert prompts[0] == prompts[1] == ["S3: 1234.56, EC2: idle"]
+    assert prompts[2] == prompts[3] == [canonical_input({"EC2": "idle", "S3": 1229.9})] == ["EC2: idle, S3: 1200"]
+
+def test_cost_data_to_text_skips_zero_and_non_scalar_costs():
+    assert cost_data_to_text({"EC2": 10, "S3": 0, "RDS": "idle", "Tags": ["a"]}) == "EC2: 10, RDS: idle"
+    assert cost_data_to_text("EC2: high usage") == "EC2: high usage"
+
+def test_invalid_settings_are_rejected():
+    with pytest.raises(ValueError, match="num_beams"):
+        Recommender(None, None, "cpu", num_beams=0)
+    with pytest.raises(ValueError, match="batch_size"):
+        list(Recommender(None, None, "cpu").recommend_many([{}], batch_size=0))
@@ -0,0 +1,41 @@
+import time
+
+from app.services.result_cache import ResultCache, normalize_sql, query_cache_key
+
+
+def test_normalize_sql_ignores_formatting_but_not_literals():
+    assert normalize_sql("SELECT  a,\n\tb\nFROM t ;") == "SELECT a, b FROM t"
+    assert normalize_sql("SELECT * FROM t WHERE x = 'two  spaces'") == "SELECT * FROM t WHERE x = 'two  spaces'"
+    assert query_cache_key("SELECT 1\n") == query_cache_key("  SELECT   1;")
+    assert query_cache_key("SELECT ?", [10]) != query_cache_key("SELECT ?", [20])
+
+def test_entries_expire_after_ttl():
+    cache = ResultCache(ttl=0.05, max_entries=10, max_bytes=1024)
+    cache.set("a", [1])
+    assert cache.get("a") == [1]
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = ResultCache(ttl=60, max_entries=2, max_bytes=1024)
+    cache.set("a", [1])
+    cache.set("b", [2])
+    cache.get("a")
+    cache.set("c", [3])
+    assert cache.get("b") is None
+    assert cache.get("a") == [1]
+    assert cache.get("c") == [3]
+    assert cache.stats()["evictions"] == 1
+
+def test_byte_budget_bounds_the_cache():
+    cache = ResultCache(ttl=60, max_entries=100, max_bytes=100)
+    cache.set("a", "x" * 40)
+    cache.set("b", "y" * 40)
+    cache.set("c", "z" * 40)
+    stats = cache.stats()
+    assert stats["bytes"] <= 100
+    assert cache.get("a") is None
+    # A value bigger than the whole budget is never stored
+    assert cache.set("huge", "x" * 200) is False
+    assert cache.get("b") is not None
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from app.services.single_flight import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"total": 42}
+
+    async def main():
+        return await asyncio.gather(*[flight.do(("costs", "2025-06"), fetch) for _ in range(5)])
+
+    results = asyncio.run(main())
+
+    assert results == [{"total": 42}] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "executed": 1, "coalesced": 4}
+
+def test_failure_reaches_every_waiter_and_is_not_cached():
+    flight = SingleFlight()
+    attempts = []
+
+    async def failing():
+        attempts.append(1)
+        await asyncio.sleep(0.02)
+        raise RuntimeError("upstream throttled")
+
+    async def main():
+        results = await asyncio.gather(*[flight.do("key", failing) for _ in range(3)],
+                                       return_exceptions=True)
+        with pytest.raises(RuntimeError):
+            await flight.do("key", failing)
+        return results
+
+    results = asyncio.run(main())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(attempts) == 2
+
+def test_cancelled_waiter_leaves_call_running_for_others():
+    flight = SingleFlight()
+    finished = []
+
+    async def fetch():
+        try:
+            await asyncio.sleep(0.05)
+            return "rows"
+        finally:
+            finished.append(asyncio.current_task().cancelled())
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", fetch))
+        second = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(main()) == ("rows", True)
+    assert finished == [False]
+
+def test_call_is_cancelled_when_every_waiter_leaves():
+    flight = SingleFlight()
+    cancelled = []
+
+    async def fetch():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        waiters = [asyncio.ensure_future(flight.do("key", fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert cancelled == [True]
+    assert flight.stats()["in_flight"] == 0
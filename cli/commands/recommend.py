@@ -6,6 +6,8 @@ from requests.exceptions import RequestException
 from cli.utils.api_client import APIClient
 from cli.utils.display import (
     display_recommendation,
+    display_recommendation_stream,
+    collect_stream,
     display_json,
     print_error,
     print_info
@@ -30,6 +32,12 @@ def recommend(
         "-f",
         help="Output format: table or json"
     ),
+    stream: bool = typer.Option(
+        False,
+        "--stream",
+        "-s",
+        help="Print the recommendation word by word as it is generated"
+    ),
     api_url: str = typer.Option(
         None,
         "--api-url",
@@ -77,6 +85,15 @@ def recommend(
     client = APIClient(base_url)
     
     try:
+        if stream:
+            events = client.stream_recommendation(cost_dict)
+            if output_format == "json":
+                # Only the final result is valid JSON output
+                display_json(collect_stream(events))
+            else:
+                display_recommendation_stream(events)
+            return
+        
         # Get recommendation
         data = client.get_recommendation(cost_dict)
         
@@ -1,6 +1,7 @@
 """API client for CloudSathi backend."""
 import os
-from typing import Dict, Any, Optional
+import json
+from typing import Dict, Any, Iterator, Optional, Tuple
 import requests
 from requests.exceptions import RequestException, ConnectionError, Timeout
 
@@ -125,6 +126,55 @@ class APIClient:
                 raise RequestException(f"API Error: {error_detail}") from exc
             raise
 
+    def stream_recommendation(self, cost_data: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Stream a cost optimization recommendation as it is generated.
+        
+        Args:
+            cost_data: Dictionary containing cost information
+            
+        Yields:
+            (event, data) pairs: "token" events with {"text"}, then a "done"
+            event with {"recommendation"} or an "error" event with {"detail"}
+            
+        Raises:
+            RequestException: If API request fails
+        """
+        url = f"{self.base_url}/api/recommendations/stream"
+        payload = {"cost_data": cost_data}
+        
+        try:
+            # The read timeout applies between events, not to the whole stream
+            with self.session.post(url, json=payload, stream=True, timeout=30,
+                                   headers={"Accept": "text/event-stream"}) as response:
+                response.raise_for_status()
+                event, data = "message", []
+                for line in response.iter_lines(decode_unicode=True):
+                    if line:
+                        field, _, value = line.partition(":")
+                        if field == "event":
+                            event = value.strip()
+                        elif field == "data":
+                            data.append(value[1:] if value.startswith(" ") else value)
+                        continue
+                    if data:
+                        yield event, json.loads("\n".join(data))
+                    event, data = "message", []
+        except ConnectionError as exc:
+            raise RequestException(
+                f"Failed to connect to API at {self.base_url}. "
+                "Is the server running?"
+            ) from exc
+        except Timeout as exc:
+            raise RequestException("Request timed out") from exc
+        except RequestException as exc:
+            if hasattr(exc, 'response') and exc.response is not None:
+                try:
+                    error_detail = exc.response.json().get('detail', str(exc))
+                except Exception:
+                    error_detail = exc.response.text or str(exc)
+                raise RequestException(f"API Error: {error_detail}") from exc
+            raise
+
     def health_check(self) -> bool:
         """Check if API is reachable.
         
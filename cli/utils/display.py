@@ -1,6 +1,7 @@
 """Display utilities using Rich for beautiful terminal output."""
 import json
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+from requests.exceptions import RequestException
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
@@ -151,3 +152,48 @@ def display_recommendation(data: Dict[str, Any]) -> None:
         padding=(1, 2)
     )
     console.print(panel)
+
+
+def display_recommendation_stream(events: Iterator[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Print a recommendation word by word as it streams in.
+    
+    Args:
+        events: (event, data) pairs from APIClient.stream_recommendation
+        
+    Returns:
+        Data of the final "done" event
+        
+    Raises:
+        RequestException: If the server reports an error mid-stream
+    """
+    console.print("[bold yellow]💡 Cost Optimization Recommendation[/bold yellow]")
+    try:
+        return collect_stream(events, on_token=lambda text: console.print(
+            text, end="", style="bold green", highlight=False, markup=False
+        ))
+    finally:
+        console.print()
+
+
+def collect_stream(events: Iterator[Tuple[str, Dict[str, Any]]],
+                   on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Consume a recommendation stream and return its final result.
+    
+    Args:
+        events: (event, data) pairs from APIClient.stream_recommendation
+        on_token: Called with the text of each token event
+        
+    Returns:
+        Data of the final "done" event
+        
+    Raises:
+        RequestException: If the server reports an error or the stream ends early
+    """
+    for event, data in events:
+        if event == "token" and on_token is not None:
+            on_token(data.get("text", ""))
+        elif event == "error":
+            raise RequestException(f"API Error: {data.get('detail', 'stream failed')}")
+        elif event == "done":
+            return data
+    raise RequestException("Stream ended before the recommendation was complete")
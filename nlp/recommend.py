@@ -1,20 +1,20 @@
-import torch
-from transformers import EncoderDecoderModel, DistilBertTokenizerFast
+import sys
+from pathlib import Path
 
-def load_recommender(model_dir="nlp/model"):
-    tokenizer = DistilBertTokenizerFast.from_pretrained(model_dir)
-    model = EncoderDecoderModel.from_pretrained(model_dir)
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model = model.to(device)
-    return model, tokenizer, device
+# The inference code lives with the API that serves it
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+# pylint: disable=wrong-import-position
+from app.services.recommender import Recommender, cost_data_to_text  # noqa: E402,F401
 
-def generate_recommendation(cost_data_json, model_dir="nlp/model"):
-    model, tokenizer, device = load_recommender(model_dir)
-    # Assume cost_data_json is a dict or str
-    if isinstance(cost_data_json, dict):
-        input_text = ", ".join(f"{k}: {v}" for k, v in cost_data_json.items())
-    else:
-        input_text = str(cost_data_json)
-    inputs = tokenizer([input_text], return_tensors="pt", padding=True, truncation=True, max_length=64).to(device)
-    summary_ids = model.generate(**inputs, max_length=32)
-    return tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+def load_recommender(model_dir="nlp/model", backend="torch", device=None, **generation):
+    """
+    Returns a Recommender for model_dir; the model is read from disk once per
+    process. backend is torch (fp32), int8 (dynamically quantized) or onnx
+    (run scripts/export_onnx.py first). generation takes max_length,
+    max_new_tokens, num_beams, input_max_length and significant_digits.
+    """
+    return Recommender.load(model_dir, backend, device, **generation)
+
+def generate_recommendation(cost_data_json, model_dir="nlp/model", backend="torch", **generation):
+    # cost_data_json is a dict or str
+    return load_recommender(model_dir, backend, **generation).recommend(cost_data_json)
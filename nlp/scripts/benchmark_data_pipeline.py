@@ -0,0 +1,134 @@
+"""Compare the old in-memory, pad-to-max data loading with data_pipeline.
+
+Each mode runs in its own process so peak RSS is measured separately:
+- legacy: JSONL read into lists, every example padded to the maximum length,
+  batches drawn at random (what the training scripts used to do).
+- pipeline: prepare_dataset (cold, then cached) with dynamic padding and the
+  length-grouped sampler.
+
+For each it reports preparation time, peak RSS, the padded tokens one epoch
+feeds the model, and an epoch time extrapolated from ``--steps`` training
+steps of a small T5. From nlp/scripts:
+
+    python benchmark_data_pipeline.py --data ../data/synthetic_cloud_costs.jsonl --tokenizer ../model
+"""
+import argparse
+import gzip
+import json
+import multiprocessing
+import resource
+import shutil
+import tempfile
+import time
+
+import torch
+from torch.utils.data import DataLoader, RandomSampler
+from transformers import (AutoTokenizer, DataCollatorForSeq2Seq, T5Config, T5ForConditionalGeneration,
+                          Trainer, TrainingArguments)
+
+from data_pipeline import data_files, prepare_dataset, training_arguments
+
+INPUT_MAX_LENGTH = 64
+OUTPUT_MAX_LENGTH = 32
+
+
+def legacy_dataset(path, tokenizer):
+    from datasets import Dataset  # pylint: disable=import-outside-toplevel
+
+    data = []
+    for file in data_files(path):
+        with (gzip.open(file, "rt") if file.endswith(".gz") else open(file)) as f:
+            data.extend(json.loads(line) for line in f)
+    dataset = Dataset.from_dict({"input": [d["input"] for d in data], "output": [d["output"] for d in data]})
+
+    def preprocess(batch):
+        model_inputs = tokenizer(batch["input"], max_length=INPUT_MAX_LENGTH, truncation=True, padding="max_length")
+        labels = tokenizer(text_target=batch["output"], max_length=OUTPUT_MAX_LENGTH, truncation=True,
+                           padding="max_length")
+        model_inputs["labels"] = labels["input_ids"]
+        return model_inputs
+
+    return dataset.map(preprocess, batched=True, remove_columns=dataset.column_names)
+
+
+def small_model(tokenizer):
+    torch.manual_seed(0)
+    return T5ForConditionalGeneration(T5Config(
+        vocab_size=len(tokenizer), d_model=128, d_kv=32, d_ff=512, num_layers=2, num_heads=4,
+        decoder_start_token_id=tokenizer.pad_token_id, pad_token_id=tokenizer.pad_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+    ))
+
+
+def measure_epoch(dataloader, model, steps):
+    """Padded tokens over the whole epoch, and its time extrapolated from the first ``steps`` batches."""
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-4)
+    tokens, batches, elapsed = 0, 0, 0.0
+    for batch in dataloader:
+        tokens += batch["input_ids"].numel() + batch["labels"].numel()
+        if batches < steps:
+            batch = {k: v for k, v in batch.items() if k in ("input_ids", "attention_mask", "labels")}
+            started = time.perf_counter()
+            model(**batch).loss.backward()
+            optimizer.step()
+            optimizer.zero_grad()
+            elapsed += time.perf_counter() - started
+        batches += 1
+    return tokens, elapsed / max(1, min(steps, batches)) * batches
+
+
+def run(mode, args, results):
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+    model = small_model(tokenizer)
+    collator = DataCollatorForSeq2Seq(tokenizer, model=model)
+    started = time.perf_counter()
+    if mode == "legacy":
+        dataset = legacy_dataset(args.data, tokenizer)
+        dataloader = DataLoader(dataset, batch_size=args.batch_size, sampler=RandomSampler(dataset),
+                                collate_fn=collator)
+    else:
+        dataset = prepare_dataset(args.data, tokenizer, INPUT_MAX_LENGTH, OUTPUT_MAX_LENGTH,
+                                  cache_dir=args.cache_dir, num_proc=args.num_proc)
+        trainer = Trainer(model=model, train_dataset=dataset, data_collator=collator,
+                          args=TrainingArguments(**training_arguments(
+                              output_dir=tempfile.mkdtemp(), per_device_train_batch_size=args.batch_size,
+                              report_to=[])))
+        dataloader = trainer.get_train_dataloader()
+    prepare_seconds = time.perf_counter() - started
+    tokens, epoch_seconds = measure_epoch(dataloader, model, args.steps)
+    results.put({
+        "mode": mode,
+        "prepare_seconds": prepare_seconds,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "epoch_tokens": tokens,
+        "epoch_seconds": epoch_seconds,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="../data/synthetic_cloud_costs.jsonl")
+    parser.add_argument("--tokenizer", default="t5-small", help="Tokenizer name or directory")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--steps", type=int, default=50, help="Training steps timed per mode")
+    parser.add_argument("--num-proc", type=int, default=None, help="Tokenizer processes (default: all cores)")
+    args = parser.parse_args()
+    args.cache_dir = tempfile.mkdtemp(prefix="tokenized-")
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    print(f"{'mode':16} {'prepare s':>10} {'peak RSS MB':>12} {'epoch tokens':>14} {'epoch s':>10}")
+    try:
+        for mode, label in (("legacy", "legacy"), ("pipeline", "pipeline cold"), ("pipeline", "pipeline cached")):
+            process = context.Process(target=run, args=(mode, args, results))
+            process.start()
+            result = results.get()
+            process.join()
+            print(f"{label:16} {result['prepare_seconds']:10.2f} {result['peak_rss_mb']:12.0f} "
+                  f"{result['epoch_tokens']:14d} {result['epoch_seconds']:10.1f}")
+    finally:
+        shutil.rmtree(args.cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
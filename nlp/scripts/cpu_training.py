@@ -0,0 +1,109 @@
+"""Multi-process data-parallel training on CPU-only machines.
+
+One training process leaves most cores of a large CPU node idle: its batches
+are small and PyTorch's intra-op threads scale poorly past a handful of
+cores. ``--workers N`` runs N processes instead, each with an equal share of
+the cores, and averages gradients between them with torch DDP over gloo.
+Launching under ``torchrun`` works too; ``launch_workers`` only starts
+torchrun itself when the script was run directly.
+
+The global batch is workers x ``--batch-size`` x ``--grad-accum``. bf16
+autocast is used when the CPU has native bf16 instructions (AVX512-BF16 or
+AMX); elsewhere it is emulated and slower than fp32. ``ThroughputCallback``
+reports tokens per second across all workers.
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict
+
+from transformers import TrainerCallback
+
+from data_pipeline import training_arguments
+
+
+def add_cpu_training_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--workers", type=int, default=1, help="Training processes (DDP over gloo when > 1)")
+    parser.add_argument("--batch-size", type=int, default=2, help="Examples per worker per step")
+    parser.add_argument("--grad-accum", type=int, default=1, help="Steps to accumulate before each update")
+    parser.add_argument("--bf16", choices=["auto", "on", "off"], default="auto",
+                        help="bf16 autocast; auto enables it when the CPU supports it natively")
+    parser.add_argument("--epochs", type=float, default=10)
+    parser.add_argument("--learning-rate", type=float, default=5e-5)
+
+
+def cpu_supports_bf16() -> bool:
+    """Whether the CPU has native bf16 matmul instructions."""
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as handle:
+            flags = handle.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def launch_workers(workers: int) -> bool:
+    """
+    Re-runs this script under torchrun with ``workers`` processes, each
+    limited to its share of the cores, and returns True once they finish.
+    Returns False when there is nothing to launch: one worker, or already a
+    torchrun worker.
+    """
+    if workers <= 1 or "LOCAL_RANK" in os.environ:
+        return False
+    # pylint: disable=import-outside-toplevel
+    from torch.distributed.run import main as torchrun
+
+    # torchrun would otherwise default every worker to a single thread
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    os.environ.setdefault("OMP_NUM_THREADS", str(max(1, cores // workers)))
+    torchrun(["--standalone", f"--nproc_per_node={workers}", sys.argv[0], *sys.argv[1:]])
+    return True
+
+
+def cpu_training_arguments(args: argparse.Namespace, **overrides: Any) -> Dict[str, Any]:
+    """
+    TrainingArguments keywords for ``add_cpu_training_arguments`` options,
+    on top of the data pipeline's. With a GPU, training stays on it in fp16.
+    """
+    import torch  # pylint: disable=import-outside-toplevel
+
+    common = {
+        "per_device_train_batch_size": args.batch_size,
+        "gradient_accumulation_steps": args.grad_accum,
+        "num_train_epochs": args.epochs,
+        "learning_rate": args.learning_rate,
+    }
+    if torch.cuda.is_available():
+        return training_arguments(fp16=True, **common, **overrides)
+    if "OMP_NUM_THREADS" in os.environ:
+        torch.set_num_threads(int(os.environ["OMP_NUM_THREADS"]))
+    if int(os.environ.get("WORLD_SIZE", "1")) > 1:
+        common["ddp_backend"] = "gloo"
+    bf16 = args.bf16 == "on" or (args.bf16 == "auto" and cpu_supports_bf16())
+    return training_arguments(use_cpu=True, bf16=bf16, **common, **overrides)
+
+
+class ThroughputCallback(TrainerCallback):
+    """Logs tokens per second over all workers, from the tokens in one epoch of the dataset."""
+
+    def __init__(self, tokens_per_epoch: int):
+        self.tokens_per_epoch = tokens_per_epoch
+        self.started = 0.0
+
+    def _report(self, state, label: str) -> None:
+        elapsed = time.perf_counter() - self.started
+        tokens = self.tokens_per_epoch * (state.epoch or 0)
+        if state.is_world_process_zero and elapsed > 0:
+            print(f"[{label}] step {state.global_step}: {tokens:,.0f} tokens in {elapsed:.1f}s, "
+                  f"{tokens / elapsed:,.0f} tokens/s")
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self.started = time.perf_counter()
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        self._report(state, "throughput")
+
+    def on_train_end(self, args, state, control, **kwargs):
+        self._report(state, f"throughput, {args.world_size} worker(s)")
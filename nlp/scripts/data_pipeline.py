@@ -0,0 +1,155 @@
+"""Tokenized training data for the recommender scripts.
+
+Reading the JSONL into Python lists and padding every example to the maximum
+length makes RAM grow with the corpus and spends most of each batch on
+padding. ``prepare_dataset`` instead:
+
+* streams the JSONL (one file, a glob, or a directory of gzip shards from
+  generate_corpus.py) into an Arrow dataset on disk, ``chunk_bytes`` at a
+  time;
+* tokenizes it with ``num_proc`` processes, without padding, and records each
+  example's input and label lengths in ``length`` and ``label_length``;
+* saves the result under ``cache_dir`` keyed by a fingerprint of the tokenizer,
+  the data file and the length limits, so later runs load it memory-mapped
+  instead of tokenizing again.
+
+``training_arguments`` then turns on the length-grouped sampler, and
+``DataCollatorForSeq2Seq`` pads each batch only to its longest example.
+"""
+import glob
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional
+
+from datasets import Dataset, Features, Sequence, Value, load_dataset, load_from_disk
+
+from generate_corpus import MANIFEST_FILE
+
+# Bump when the tokenized format changes, so old caches are not reused
+PIPELINE_VERSION = 3
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", ".tokenized")
+DEFAULT_CHUNK_BYTES = 16 << 20
+
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    """Changes whenever the tokenizer would produce different ids."""
+    digest = hashlib.sha256(type(tokenizer).__name__.encode())
+    if getattr(tokenizer, "is_fast", False):
+        digest.update(tokenizer.backend_tokenizer.to_str().encode())
+    else:
+        digest.update(json.dumps(sorted(tokenizer.get_vocab().items())).encode())
+    digest.update(json.dumps(tokenizer.special_tokens_map, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def data_files(data_path: str) -> List[str]:
+    """
+    The JSONL files behind ``data_path``: a file, a glob, or a directory. In
+    a directory written by generate_corpus.py, its manifest lists the
+    shards, so leftovers of an earlier run are never mixed in; otherwise
+    every .jsonl(.gz) file in it is used.
+    """
+    manifest_path = os.path.join(data_path, MANIFEST_FILE)
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, encoding="utf-8") as handle:
+            files = [os.path.join(data_path, shard["file"]) for shard in json.load(handle)["shards"]]
+        missing = [path for path in files if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(f"{manifest_path} lists missing shards: {', '.join(missing)}")
+    elif os.path.isdir(data_path):
+        files = sorted(glob.glob(os.path.join(data_path, "*.jsonl")) +
+                       glob.glob(os.path.join(data_path, "*.jsonl.gz")))
+    elif os.path.exists(data_path):
+        files = [data_path]
+    else:
+        files = sorted(glob.glob(data_path))
+    if not files:
+        raise FileNotFoundError(f"No JSONL data found at {data_path}")
+    return [os.path.abspath(path) for path in files]
+
+
+def dataset_fingerprint(files: List[str], tokenizer, input_max_length: int, output_max_length: int) -> str:
+    """
+    Cache key for the tokenized dataset. Data files are identified by their
+    path, size and modification time; hashing a multi-gigabyte corpus on
+    every run would cost about as much as tokenizing it.
+    """
+    stats = [os.stat(path) for path in files]
+    key = {
+        "version": PIPELINE_VERSION,
+        "data": [[path, stat.st_size, stat.st_mtime_ns] for path, stat in zip(files, stats)],
+        "tokenizer": tokenizer_fingerprint(tokenizer),
+        "input_max_length": input_max_length,
+        "output_max_length": output_max_length,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def prepare_dataset(data_path: str, tokenizer, input_max_length: int = 64, output_max_length: int = 32,
+                    cache_dir: str = DEFAULT_CACHE_DIR, num_proc: Optional[int] = None,
+                    chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Dataset:
+    """
+    Returns the tokenized dataset for ``data_path`` (JSONL rows with "input"
+    and "output"; see ``data_files``), with input_ids, attention_mask,
+    labels, length and label_length columns. It is built once per fingerprint and
+    memory-mapped from ``cache_dir`` afterwards.
+    """
+    files = data_files(data_path)
+    target = os.path.join(cache_dir, dataset_fingerprint(files, tokenizer, input_max_length, output_max_length))
+    if os.path.isdir(target):
+        return load_from_disk(target)
+
+    num_proc = num_proc or os.cpu_count() or 1
+    # Shards are decompressed and parsed in parallel too
+    raw = load_dataset("json", data_files=files, split="train", chunksize=chunk_bytes,
+                       cache_dir=os.path.join(cache_dir, "raw"),
+                       num_proc=min(num_proc, len(files)) if len(files) > 1 else None)
+
+    def tokenize(batch: Dict[str, Any]) -> Dict[str, Any]:
+        model_inputs = tokenizer(batch["input"], max_length=input_max_length, truncation=True)
+        labels = tokenizer(text_target=batch["output"], max_length=output_max_length, truncation=True)
+        model_inputs["labels"] = labels["input_ids"]
+        model_inputs["length"] = [len(ids) for ids in model_inputs["input_ids"]]
+        model_inputs["label_length"] = [len(ids) for ids in model_inputs["labels"]]
+        return model_inputs
+
+    # Declared rather than inferred, so a batch of empty sequences cannot fix a column's type
+    features = Features({
+        **{name: Sequence(Value("int8" if name in ("attention_mask", "token_type_ids") else "int32"))
+           for name in tokenizer.model_input_names},
+        "labels": Sequence(Value("int32")),
+        "length": Value("int32"),
+        "label_length": Value("int32"),
+    })
+    tokenized = raw.map(tokenize, batched=True, num_proc=num_proc if len(raw) > 1 else None,
+                        remove_columns=raw.column_names, features=features, desc="Tokenizing")
+    # Written to a temporary directory first, so an interrupted run leaves no partial cache
+    partial = f"{target}.partial-{os.getpid()}"
+    tokenized.save_to_disk(partial)
+    os.replace(partial, target)
+    shutil.rmtree(os.path.join(cache_dir, "raw"), ignore_errors=True)
+    return load_from_disk(target)
+
+
+def training_arguments(**overrides: Any) -> Dict[str, Any]:
+    """
+    TrainingArguments keywords that batch examples of similar length
+    together. Unused columns must stay removed: the sampler reads
+    ``length`` from the dataset, but the model must not receive it.
+    """
+    return {
+        "group_by_length": True,
+        "length_column_name": "length",
+        "remove_unused_columns": True,
+        **overrides,
+    }
+
+
+def dataset_tokens(dataset: Dataset) -> int:
+    """Input plus label tokens in one pass over ``dataset``, excluding padding."""
+    import pyarrow.compute as pc  # pylint: disable=import-outside-toplevel
+
+    # Summed in Arrow, without materialising the columns as Python lists
+    return sum(pc.sum(dataset.data.column(name)).as_py() or 0 for name in ("length", "label_length"))
@@ -0,0 +1,278 @@
+"""Distill the trained recommender into a much smaller student model.
+
+Sequence-level distillation: the teacher generates a recommendation for
+every corpus input, and the student, a model of the same kind with fewer
+layers and a smaller d_model that shares the teacher's tokenizer and
+vocabulary, is trained to reproduce those outputs. A T5 teacher gets a T5
+student; a bert2bert EncoderDecoder teacher (train_distilbert.py) gets a
+smaller EncoderDecoder. The student then only has to learn what the
+teacher actually says, which a small model does far better than learning
+the original references.
+
+The first ``--eval-examples`` inputs are held out. On them the script
+reports ROUGE-1/2/L and exact match of student against teacher, and
+single-request generation latency (p50/p99) for both. The student and its
+tokenizer are saved to ``--output-dir`` with the report in
+distillation.json, next to the teacher outputs. Later runs reuse those
+only when the data, the held-out count and the teacher are unchanged.
+Point RECOMMENDER_MODEL_PATH (or nlp/recommend.py's model_dir) at it to
+serve the student. Training accepts the same --workers,
+--batch-size, --grad-accum and --bf16 options as train_t5.py. From
+nlp/scripts:
+
+    python distill.py --teacher ../model --data ../data/corpus --output-dir ../model-student
+"""
+import argparse
+import copy
+import glob
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence
+
+import torch
+from transformers import (AutoModelForSeq2SeqLM, AutoTokenizer, DataCollatorForSeq2Seq, EncoderDecoderConfig,
+                          PretrainedConfig, T5Config, Trainer, TrainingArguments)
+
+from cpu_training import ThroughputCallback, add_cpu_training_arguments, cpu_training_arguments, launch_workers
+from data_pipeline import data_files, dataset_tokens, prepare_dataset
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from recommend import Recommender  # noqa: E402 pylint: disable=wrong-import-position
+
+INPUT_MAX_LENGTH = 64
+OUTPUT_MAX_LENGTH = 32
+# Formatted with labels_fingerprint
+TEACHER_OUTPUTS_FILE = "teacher_outputs-{}.jsonl.gz"
+REPORT_FILE = "distillation.json"
+
+
+def read_inputs(data_path: str) -> Iterator[str]:
+    for path in data_files(data_path):
+        with (gzip.open(path, "rt", encoding="utf-8") if path.endswith(".gz") else open(path, encoding="utf-8")) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)["input"]
+
+
+def labels_fingerprint(data_path: str, eval_examples: int, teacher: str) -> str:
+    """
+    Identifies one set of teacher outputs: the data files and the teacher's
+    files by path, size and modification time (as the tokenized dataset
+    cache does), how many leading inputs were held out, and the generation
+    lengths. A new split or teacher gets fresh labels, so held-out inputs
+    never end up in the training set.
+    """
+    def files(paths: List[str]) -> List[list]:
+        return [[path, stat.st_size, stat.st_mtime_ns] for path, stat in zip(paths, map(os.stat, paths))]
+
+    if os.path.isdir(teacher):
+        teacher_key = [os.path.abspath(teacher),
+                       files(sorted(entry.path for entry in os.scandir(teacher) if entry.is_file()))]
+    else:
+        # A hub model id has no local files; its name is all there is
+        teacher_key = [teacher, []]
+    key = {
+        "data": files(data_files(data_path)),
+        "eval_examples": eval_examples,
+        "teacher": teacher_key,
+        "input_max_length": INPUT_MAX_LENGTH,
+        "output_max_length": OUTPUT_MAX_LENGTH,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _scaled_bert_config(config, layers: int, d_model: int, heads: int):
+    """A BERT or DistilBERT encoder/decoder config with fewer layers and a smaller hidden size."""
+    config = copy.deepcopy(config)
+    # DistilBERT maps these names onto n_layers, dim and n_heads
+    config.num_hidden_layers = layers
+    config.hidden_size = d_model
+    config.num_attention_heads = heads
+    if config.model_type == "distilbert":
+        config.hidden_dim = d_model * 4
+    else:
+        config.intermediate_size = d_model * 4
+    return config
+
+
+def student_config(teacher_config, layers: int, d_model: int, heads: int) -> PretrainedConfig:
+    """The teacher's config scaled down; vocabulary and special tokens stay the same."""
+    if teacher_config.model_type in ("t5", "mt5"):
+        config = T5Config.from_dict(teacher_config.to_dict())
+        config.num_layers = config.num_decoder_layers = layers
+        config.d_model = d_model
+        config.num_heads = heads
+        config.d_kv = d_model // heads
+        config.d_ff = d_model * 4
+        return config
+    if teacher_config.model_type == "encoder-decoder":
+        config = EncoderDecoderConfig.from_encoder_decoder_configs(
+            _scaled_bert_config(teacher_config.encoder, layers, d_model, heads),
+            _scaled_bert_config(teacher_config.decoder, layers, d_model, heads),
+        )
+        for name in ("decoder_start_token_id", "pad_token_id", "eos_token_id", "bos_token_id"):
+            setattr(config, name, getattr(teacher_config, name, None))
+        return config
+    raise ValueError(f"Only T5 and EncoderDecoder teachers can be distilled, not {teacher_config.model_type!r}")
+
+
+def write_teacher_outputs(teacher: Recommender, inputs: Iterator[str], path: str, batch_size: int) -> int:
+    """Writes {"input", "output": teacher's generation} rows; returns how many."""
+    written = 0
+    partial = f"{path}.partial"
+    with gzip.open(partial, "wt", encoding="utf-8") as handle:
+        while True:
+            batch = list(itertools.islice(inputs, batch_size))
+            if not batch:
+                break
+            for text, output in zip(batch, teacher.generate(batch)):
+                handle.write(json.dumps({"input": text, "output": output}) + "\n")
+            written += len(batch)
+            if written % (batch_size * 100) == 0:
+                print(f"Teacher labelled {written:,} inputs")
+    os.replace(partial, path)
+    return written
+
+
+def _ngrams(tokens: Sequence[str], n: int) -> Counter:
+    return Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+
+def _f1(overlap: float, predicted: int, reference: int) -> float:
+    if not predicted or not reference or not overlap:
+        return 0.0
+    precision, recall = overlap / predicted, overlap / reference
+    return 2 * precision * recall / (precision + recall)
+
+
+def _lcs(a: Sequence[str], b: Sequence[str]) -> int:
+    previous = [0] * (len(b) + 1)
+    for token in a:
+        current = [0]
+        for j, other in enumerate(b):
+            current.append(previous[j] + 1 if token == other else max(previous[j + 1], current[j]))
+        previous = current
+    return previous[-1]
+
+
+def rouge(prediction: str, reference: str) -> Dict[str, float]:
+    """ROUGE-1, ROUGE-2 and ROUGE-L F1 over lowercased whitespace tokens."""
+    predicted, expected = prediction.lower().split(), reference.lower().split()
+    scores = {}
+    for n in (1, 2):
+        p, r = _ngrams(predicted, n), _ngrams(expected, n)
+        scores[f"rouge{n}"] = _f1(sum((p & r).values()), sum(p.values()), sum(r.values()))
+    scores["rougeL"] = _f1(_lcs(predicted, expected), len(predicted), len(expected))
+    return scores
+
+
+def parity(predictions: List[str], references: List[str]) -> Dict[str, float]:
+    per_example = [rouge(p, r) for p, r in zip(predictions, references)]
+    report = {name: statistics.fmean(score[name] for score in per_example) for name in ("rouge1", "rouge2", "rougeL")}
+    report["exact_match"] = statistics.fmean(p.strip() == r.strip() for p, r in zip(predictions, references))
+    return report
+
+
+def latency(recommender: Recommender, inputs: List[str]) -> Dict[str, float]:
+    """Milliseconds per single-input generate call, the way the API serves requests."""
+    recommender.generate(inputs[:1])  # warm up
+    timings = []
+    for text in inputs:
+        started = time.perf_counter()
+        recommender.generate([text])
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {"p50_ms": timings[len(timings) // 2], "p99_ms": timings[min(len(timings) - 1, int(len(timings) * 0.99))]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--teacher", default="../model", help="Trained teacher model directory")
+    parser.add_argument("--data", default="../data/synthetic_cloud_costs.jsonl",
+                        help="JSONL file, glob, or directory of shards from generate_corpus.py")
+    parser.add_argument("--output-dir", default="../model-student")
+    parser.add_argument("--layers", type=int, default=2, help="Encoder and decoder layers of the student")
+    parser.add_argument("--d-model", type=int, default=256)
+    parser.add_argument("--heads", type=int, default=4)
+    parser.add_argument("--eval-examples", type=int, default=500, help="Held-out inputs for parity and latency")
+    parser.add_argument("--teacher-batch-size", type=int, default=64)
+    add_cpu_training_arguments(parser)
+    # A student trained from scratch needs a far higher rate than fine-tuning
+    parser.set_defaults(learning_rate=1e-3, epochs=3)
+    args = parser.parse_args()
+    if launch_workers(args.workers):
+        return
+
+    tokenizer = AutoTokenizer.from_pretrained(args.teacher)
+    teacher = Recommender(AutoModelForSeq2SeqLM.from_pretrained(args.teacher).eval(), tokenizer, torch.device("cpu"),
+                          input_max_length=INPUT_MAX_LENGTH, max_length=OUTPUT_MAX_LENGTH)
+    os.makedirs(args.output_dir, exist_ok=True)
+    training_args = TrainingArguments(**cpu_training_arguments(
+        args,
+        output_dir=os.path.join(args.output_dir, "checkpoints"),
+        save_strategy="no",
+        logging_steps=50,
+        report_to=[]
+    ))
+
+    inputs = read_inputs(args.data)
+    eval_inputs = list(itertools.islice(inputs, args.eval_examples))
+    labels_path = os.path.join(args.output_dir, TEACHER_OUTPUTS_FILE.format(
+        labels_fingerprint(args.data, args.eval_examples, args.teacher)))
+    with training_args.main_process_first(desc="teacher labelling"):
+        # Labelling is the slow part, so it only reruns when its inputs change
+        if not os.path.exists(labels_path):
+            for stale in glob.glob(os.path.join(args.output_dir, TEACHER_OUTPUTS_FILE.format("*") + "*")):
+                os.remove(stale)
+            count = write_teacher_outputs(teacher, inputs, labels_path, args.teacher_batch_size)
+            print(f"Teacher labelled {count:,} training inputs")
+        dataset = prepare_dataset(labels_path, tokenizer, INPUT_MAX_LENGTH, OUTPUT_MAX_LENGTH)
+
+    student_model = AutoModelForSeq2SeqLM.from_config(
+        student_config(teacher.model.config, args.layers, args.d_model, args.heads)
+    )
+    student_model.generation_config = teacher.model.generation_config
+    trainer = Trainer(
+        model=student_model,
+        args=training_args,
+        train_dataset=dataset,
+        data_collator=DataCollatorForSeq2Seq(tokenizer, model=student_model),
+        callbacks=[ThroughputCallback(dataset_tokens(dataset))],
+    )
+    trainer.train()
+    if not training_args.should_save:
+        return
+    shutil.rmtree(training_args.output_dir, ignore_errors=True)  # save_strategy="no" leaves it empty
+
+    student_model.eval()
+    student = Recommender(student_model, tokenizer, torch.device("cpu"),
+                          input_max_length=INPUT_MAX_LENGTH, max_length=OUTPUT_MAX_LENGTH)
+    report = {
+        "parameters": {"teacher": teacher.model.num_parameters(), "student": student_model.num_parameters()},
+        "eval_examples": len(eval_inputs),
+    }
+    if eval_inputs:
+        expected = list(teacher.recommend_many(eval_inputs, batch_size=args.teacher_batch_size))
+        predicted = list(student.recommend_many(eval_inputs, batch_size=args.teacher_batch_size))
+        report["parity"] = parity(predicted, expected)
+        sample = eval_inputs[:200]
+        report["latency"] = {"teacher": latency(teacher, sample), "student": latency(student, sample)}
+
+    student_model.save_pretrained(args.output_dir)
+    tokenizer.save_pretrained(args.output_dir)
+    with open(os.path.join(args.output_dir, REPORT_FILE), "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
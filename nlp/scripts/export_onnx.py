@@ -0,0 +1,57 @@
+"""Export the trained recommender to ONNX for RECOMMENDER_BACKEND=onnx.
+
+Writes the encoder, first-step decoder and KV-cache decoder graphs plus the
+tokenizer into <model-dir>/onnx, then checks that greedy ONNX Runtime output
+matches fp32 PyTorch on the synthetic dataset. From nlp/scripts:
+
+    python export_onnx.py --model-dir ../model
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import torch
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend"))
+# pylint: disable=wrong-import-position
+from app.services.inference_backends import ONNX_DIR, OnnxSeq2SeqModel, export_onnx  # noqa: E402
+
+
+def load_inputs(path):
+    with open(path) as f:
+        return [json.loads(line)["input"] for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-dir", default="../model")
+    parser.add_argument("--output-dir", help="defaults to <model-dir>/onnx")
+    parser.add_argument("--data", default="../data/synthetic_cloud_costs.jsonl",
+                        help="inputs to compare ONNX and PyTorch outputs on")
+    parser.add_argument("--opset", type=int, default=18)
+    args = parser.parse_args()
+    output_dir = args.output_dir or os.path.join(args.model_dir, ONNX_DIR)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model_dir)
+    model = AutoModelForSeq2SeqLM.from_pretrained(args.model_dir).eval()
+    for path in export_onnx(model, output_dir, opset_version=args.opset):
+        print(f"Wrote {path}")
+    tokenizer.save_pretrained(output_dir)
+
+    texts = load_inputs(args.data)
+    inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=64)
+    with torch.inference_mode():
+        expected = tokenizer.batch_decode(model.generate(**inputs, max_length=32), skip_special_tokens=True)
+    actual = tokenizer.batch_decode(OnnxSeq2SeqModel(output_dir).generate(**inputs, max_length=32),
+                                    skip_special_tokens=True)
+    matches = sum(a == b for a, b in zip(expected, actual))
+    print(f"ONNX output matches PyTorch on {matches}/{len(texts)} inputs from {args.data}")
+    if matches != len(texts):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
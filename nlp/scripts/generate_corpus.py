@@ -0,0 +1,229 @@
+"""Generate a large synthetic (input, output) corpus for the recommender.
+
+Each example describes one AWS or Azure account as 1-4 usage findings
+(service mix, utilization, idle resources, storage tiers, ...) and pairs it
+with the matching recommendations, in the format of
+nlp/data/synthetic_cloud_costs.jsonl.
+
+Examples are written as gzip JSONL shards by a pool of processes, with a
+manifest.json listing them. Every shard draws from its own generator seeded
+by ``--seed`` and the shard index, so the corpus is identical whatever
+``--processes`` is. Training reads the output directory directly, one
+chunk at a time, and only the shards in the manifest; shards an earlier run
+left in the same directory are deleted. From nlp/scripts:
+
+    python generate_corpus.py --examples 5000000 --shards 64 --output-dir ../data/corpus
+    python train_t5.py --data ../data/corpus
+"""
+import argparse
+import glob
+import gzip
+import json
+import multiprocessing
+import os
+import random
+import time
+from typing import Callable, Dict, List, Tuple
+
+MANIFEST_FILE = "manifest.json"
+
+Finding = Tuple[str, str]  # (usage description, recommendation)
+
+
+def _cost(rng: random.Random) -> str:
+    return f"at ${rng.choice([rng.randint(20, 500), rng.randint(500, 5000), rng.randint(5000, 60000)])}/month"
+
+
+# AWS findings
+
+def aws_ec2_utilization(rng: random.Random) -> Finding:
+    family = rng.choice(["m5", "m6i", "c5", "c6g", "r5", "t3"])
+    size = rng.choice(["large", "xlarge", "2xlarge", "4xlarge"])
+    count = rng.randint(1, 200)
+    cpu = rng.randint(2, 95)
+    usage = f"EC2 {count}x {family}.{size} avg CPU {cpu}% {_cost(rng)}"
+    if cpu < 20:
+        return usage, f"Downsize the {family}.{size} instances or consolidate them; CPU rarely exceeds {cpu}%."
+    if cpu > 70:
+        return usage, "Cover the steady EC2 baseline with a Compute Savings Plan or Reserved Instances."
+    return usage, "Enable EC2 Auto Scaling so capacity follows demand."
+
+
+def aws_ec2_batch(rng: random.Random) -> Finding:
+    hours = rng.randint(100, 20000)
+    return (f"EC2 batch and CI jobs on-demand {hours} instance-hours",
+            "Switch interruptible batch and CI workloads to spot instances.")
+
+
+def aws_rds(rng: random.Random) -> Finding:
+    engine = rng.choice(["PostgreSQL", "MySQL", "SQL Server", "Oracle"])
+    cpu = rng.randint(1, 40)
+    if rng.random() < 0.5:
+        return (f"RDS {engine} running 24/7, CPU {cpu}%",
+                "Downsize the RDS instance or move it to Aurora Serverless.")
+    return (f"RDS {engine} dev database running nights and weekends",
+            "Stop non-production RDS instances outside working hours.")
+
+
+def aws_ebs(rng: random.Random) -> Finding:
+    volumes = rng.randint(1, 300)
+    size = rng.randint(10, 50000)
+    if rng.random() < 0.5:
+        return (f"EBS {volumes} volumes unattached, {size} GB",
+                "Snapshot and delete the unattached EBS volumes.")
+    return (f"EBS {volumes} gp2 volumes, {size} GB",
+            "Migrate gp2 volumes to gp3 for about 20% lower cost.")
+
+
+def aws_s3(rng: random.Random) -> Finding:
+    size = rng.randint(1, 900)
+    cold = rng.randint(10, 95)
+    usage = f"S3 {size} TB Standard, {cold}% not accessed in 90 days"
+    if cold > 60:
+        return usage, "Add an S3 lifecycle rule to move cold objects to Glacier."
+    if cold > 30:
+        return usage, "Move infrequently accessed S3 data to Standard-IA."
+    return usage, "Use S3 Intelligent-Tiering for data with unpredictable access."
+
+
+def aws_idle(rng: random.Random) -> Finding:
+    count = rng.randint(1, 40)
+    resource, action = rng.choice([
+        ("Elastic IPs unattached", "Release the unattached Elastic IPs."),
+        ("load balancers with no targets", "Delete load balancers that have no registered targets."),
+        ("NAT gateways with little traffic", "Consolidate NAT gateways or use VPC endpoints for AWS services."),
+        ("stopped EC2 instances older than 30 days", "Terminate long-stopped EC2 instances after snapshotting them."),
+    ])
+    return f"{count} {resource}", action
+
+
+def aws_lambda(rng: random.Random) -> Finding:
+    invocations = rng.randint(1, 900)
+    memory = rng.choice([1024, 2048, 3008, 4096, 10240])
+    used = rng.randint(5, 60)
+    return (f"Lambda {invocations}M invocations, {memory} MB memory, {used}% used",
+            "Right-size Lambda memory and run functions on arm64 (Graviton).")
+
+
+def aws_transfer(rng: random.Random) -> Finding:
+    return (f"data transfer out {rng.randint(1, 500)} TB {_cost(rng)}",
+            "Serve static content through CloudFront to cut data transfer costs.")
+
+
+# Azure findings
+
+def azure_vm(rng: random.Random) -> Finding:
+    series = rng.choice(["D4s_v5", "D8s_v5", "E8s_v5", "F16s_v2", "D16as_v5"])
+    count = rng.randint(1, 150)
+    cpu = rng.randint(1, 90)
+    usage = f"Azure VM {count}x {series} avg CPU {cpu}%"
+    if cpu < 5:
+        return usage, "Deallocate idle Azure VMs and enable auto-shutdown."
+    if cpu < 25:
+        return usage, "Resize Azure VM to a smaller instance type or B-series."
+    return usage, "Buy Azure Reserved VM Instances for steady workloads."
+
+
+def azure_disks(rng: random.Random) -> Finding:
+    disks = rng.randint(1, 200)
+    if rng.random() < 0.5:
+        return (f"Azure {disks} managed disks unattached",
+                "Delete unattached Azure managed disks.")
+    return (f"Azure {disks} Premium SSD disks, low IOPS",
+            "Move low-IOPS disks from Premium SSD to Standard SSD.")
+
+
+def azure_blob(rng: random.Random) -> Finding:
+    size = rng.randint(1, 800)
+    cold = rng.randint(10, 95)
+    usage = f"Azure Blob {size} TB hot tier, {cold}% rarely accessed"
+    if cold > 60:
+        return usage, "Apply a lifecycle policy that moves old blobs to the Archive tier."
+    return usage, "Move rarely accessed blobs to the Cool tier."
+
+
+def azure_sql(rng: random.Random) -> Finding:
+    dtu = rng.randint(1, 30)
+    return (f"Azure SQL Database {dtu}% DTU used",
+            "Switch Azure SQL Database to the serverless tier or a lower service tier.")
+
+
+def azure_app_service(rng: random.Random) -> Finding:
+    plans = rng.randint(1, 30)
+    return (f"Azure App Service {plans} plans mostly idle",
+            "Consolidate apps onto fewer App Service plans and scale them down.")
+
+
+PROVIDERS: Dict[str, List[Callable[[random.Random], Finding]]] = {
+    "aws": [aws_ec2_utilization, aws_ec2_batch, aws_rds, aws_ebs, aws_s3, aws_idle, aws_lambda, aws_transfer],
+    "azure": [azure_vm, azure_disks, azure_blob, azure_sql, azure_app_service],
+}
+
+
+def generate_example(rng: random.Random) -> Dict[str, str]:
+    patterns = PROVIDERS[rng.choice(["aws", "aws", "azure"])]
+    findings = [pattern(rng) for pattern in rng.sample(patterns, rng.randint(1, 4))]
+    return {
+        "input": ", ".join(usage for usage, _ in findings),
+        "output": " ".join(recommendation for _, recommendation in findings),
+    }
+
+
+def shard_file(index: int, shards: int) -> str:
+    return f"train-{index:05d}-of-{shards:05d}.jsonl.gz"
+
+
+def write_shard(output_dir: str, seed: int, index: int, shards: int, examples: int) -> Dict[str, object]:
+    """Writes one shard; its content depends only on ``seed``, ``index`` and ``examples``."""
+    rng = random.Random(f"{seed}-{index}")
+    path = os.path.join(output_dir, shard_file(index, shards))
+    partial = f"{path}.partial"
+    # mtime=0 keeps the gzip bytes identical between runs
+    with open(partial, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as handle:
+        for _ in range(examples):
+            handle.write((json.dumps(generate_example(rng)) + "\n").encode("utf-8"))
+    os.replace(partial, path)
+    return {"file": os.path.basename(path), "examples": examples}
+
+
+def _write_shard(args: Tuple) -> Dict[str, object]:
+    return write_shard(*args)
+
+
+def generate_corpus(output_dir: str, examples: int, shards: int, seed: int = 0,
+                    processes: int = 0) -> Dict[str, object]:
+    """Writes ``examples`` spread evenly over ``shards`` gzip JSONL files and returns the manifest."""
+    os.makedirs(output_dir, exist_ok=True)
+    shards = max(1, min(shards, examples))
+    jobs = [(output_dir, seed, index, shards, examples // shards + (index < examples % shards))
+            for index in range(shards)]
+    with multiprocessing.Pool(processes or os.cpu_count() or 1) as pool:
+        written = sorted(pool.imap_unordered(_write_shard, jobs), key=lambda shard: shard["file"])
+    manifest = {"seed": seed, "examples": examples, "shards": written}
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2)
+    # Shards of an earlier run with a different --shards count
+    current = {shard["file"] for shard in written}
+    for path in glob.glob(os.path.join(output_dir, "train-*-of-*.jsonl.gz*")):
+        if os.path.basename(path) not in current:
+            os.remove(path)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--examples", type=int, default=1_000_000)
+    parser.add_argument("--shards", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=0, help="Writer processes (default: all cores)")
+    parser.add_argument("--output-dir", default="../data/corpus")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    manifest = generate_corpus(args.output_dir, args.examples, args.shards, args.seed, args.processes)
+    print(f"Wrote {manifest['examples']:,} examples in {len(manifest['shards'])} shards to {args.output_dir} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,59 @@
+import argparse
 import os
-import json
-import torch
-from transformers import DistilBertTokenizerFast, EncoderDecoderModel, Trainer, TrainingArguments, TextDataset, DataCollatorForLanguageModeling
-from datasets import load_dataset, Dataset
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from transformers import DistilBertTokenizerFast, EncoderDecoderModel, Trainer, TrainingArguments, DataCollatorForSeq2Seq
+import sys
+from pathlib import Path
 
-# Load synthetic dataset
-def load_jsonl_dataset(path):
-    with open(path) as f:
-        data = [json.loads(line) for line in f]
-    return Dataset.from_dict({"input": [d["input"] for d in data], "output": [d["output"] for d in data]})
-
-def load_recommender(model_dir="nlp/model"):
-    tokenizer = AutoTokenizer.from_pretrained(model_dir)
-    model = AutoModelForSeq2SeqLM.from_pretrained(model_dir)
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model = model.to(device)
-    return model, tokenizer, device
-
-def generate_recommendation(cost_data_json, model_dir="nlp/model"):
-    model, tokenizer, device = load_recommender(model_dir)
-    if isinstance(cost_data_json, dict):
-        input_text = ", ".join(f"{k}: {v}" for k, v in cost_data_json.items())
-    else:
-        input_text = str(cost_data_json)
-    inputs = tokenizer([input_text], return_tensors="pt", padding=True, truncation=True, max_length=64).to(device)
-    summary_ids = model.generate(**inputs, max_length=32)
-    return tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+# Inference for the trained model goes through the shared Recommender
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from recommend import generate_recommendation, load_recommender  # noqa: E402,F401 pylint: disable=wrong-import-position
+from cpu_training import (  # noqa: E402 pylint: disable=wrong-import-position
+    ThroughputCallback, add_cpu_training_arguments, cpu_training_arguments, launch_workers
+)
+from data_pipeline import dataset_tokens, prepare_dataset  # noqa: E402 pylint: disable=wrong-import-position
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="../data/synthetic_cloud_costs.jsonl",
+                        help="JSONL file, glob, or directory of shards from generate_corpus.py")
+    add_cpu_training_arguments(parser)
+    args = parser.parse_args()
+    if launch_workers(args.workers):
+        return
+
     model_name = "distilbert-base-uncased"
     tokenizer = DistilBertTokenizerFast.from_pretrained(model_name)
     model = EncoderDecoderModel.from_encoder_decoder_pretrained(model_name, model_name)
 
-    dataset = load_jsonl_dataset("../data/synthetic_cloud_costs.jsonl")
-    def preprocess(batch):
-        inputs = tokenizer(batch["input"], padding="max_length", truncation=True, max_length=64, return_tensors="pt")
-        outputs = tokenizer(batch["output"], padding="max_length", truncation=True, max_length=32, return_tensors="pt")
-        batch["input_ids"] = inputs.input_ids[0]
-        batch["attention_mask"] = inputs.attention_mask[0]
-        batch["labels"] = outputs.input_ids[0]
-        return batch
-    dataset = dataset.map(preprocess)
+    # The decoder starts from [CLS] and pads with [PAD], as in bert2bert
+    model.config.decoder_start_token_id = tokenizer.cls_token_id
+    model.config.pad_token_id = tokenizer.pad_token_id
 
-    training_args = TrainingArguments(
+    training_args = TrainingArguments(**cpu_training_arguments(
+        args,
         output_dir="../model",
-        per_device_train_batch_size=2,
-        num_train_epochs=10,
         save_steps=10,
         save_total_limit=1,
         logging_steps=5,
-        report_to=[],
-        fp16=torch.cuda.is_available(),
-        remove_unused_columns=False
-    )
+        report_to=[]
+    ))
+
+    # Tokenized once and cached, by the first worker while the others wait;
+    # batches are padded only to their longest example
+    with training_args.main_process_first(desc="tokenizing"):
+        dataset = prepare_dataset(args.data, tokenizer,
+                                  input_max_length=64, output_max_length=32)
+
     trainer = Trainer(
         model=model,
         args=training_args,
         train_dataset=dataset,
-        data_collator=DataCollatorForLanguageModeling(tokenizer, mlm=False)
+        callbacks=[ThroughputCallback(dataset_tokens(dataset))],
+        data_collator=DataCollatorForSeq2Seq(tokenizer, model=model)
     )
     trainer.train()
+    if not training_args.should_save:
+        return
     model.save_pretrained("../model")
     tokenizer.save_pretrained("../model")
 
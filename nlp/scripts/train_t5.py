@@ -1,62 +1,53 @@
+import argparse
 import os
-import json
-import torch
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, Trainer, TrainingArguments, DataCollatorForSeq2Seq
-from datasets import Dataset
 
-def load_jsonl_dataset(path):
-    with open(path) as f:
-        data = [json.loads(line) for line in f]
-    return Dataset.from_dict({"input": [d["input"] for d in data], "output": [d["output"] for d in data]})
+from cpu_training import ThroughputCallback, add_cpu_training_arguments, cpu_training_arguments, launch_workers
+from data_pipeline import dataset_tokens, prepare_dataset
 
 def main():
-    model_name = "t5-small"
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-
-    dataset = load_jsonl_dataset("../data/synthetic_cloud_costs.jsonl")
-
-    def preprocess(batch):
-        model_inputs = tokenizer(
-            batch["input"],
-            max_length=64,
-            truncation=True,
-            padding="max_length"
-        )
-        with tokenizer.as_target_tokenizer():
-            labels = tokenizer(
-                batch["output"],
-                max_length=32,
-                truncation=True,
-                padding="max_length"
-            )
-        model_inputs["labels"] = labels["input_ids"]
-        return model_inputs
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="../data/synthetic_cloud_costs.jsonl",
+                        help="JSONL file, glob, or directory of shards from generate_corpus.py")
+    parser.add_argument("--model-name", default="t5-small", help="Model to fine-tune: hub name or directory")
+    parser.add_argument("--output-dir", default="../model")
+    add_cpu_training_arguments(parser)
+    args = parser.parse_args()
+    if launch_workers(args.workers):
+        return
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model_name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(args.model_name)
+
+    training_args = TrainingArguments(**cpu_training_arguments(
+        args,
+        output_dir=args.output_dir,
+        save_steps=10,
+        save_total_limit=1,
+        logging_steps=5,
+        report_to=[]
+    ))
 
-    dataset = dataset.map(preprocess, batched=True, remove_columns=dataset.column_names)
+    # Tokenized once and cached, by the first worker while the others wait;
+    # batches are padded only to their longest example
+    with training_args.main_process_first(desc="tokenizing"):
+        dataset = prepare_dataset(args.data, tokenizer,
+                                  input_max_length=64, output_max_length=32)
 
     data_collator = DataCollatorForSeq2Seq(tokenizer, model=model)
 
-    training_args = TrainingArguments(
-        output_dir="../model",
-        per_device_train_batch_size=2,
-        num_train_epochs=10,
-        save_steps=10,
-        save_total_limit=1,
-        logging_steps=5,
-        report_to=[],
-        fp16=torch.cuda.is_available(),
-        remove_unused_columns=False
-    )
     trainer = Trainer(
         model=model,
         args=training_args,
         train_dataset=dataset,
         data_collator=data_collator,
+        callbacks=[ThroughputCallback(dataset_tokens(dataset))],
     )
     trainer.train()
-    model.save_pretrained("../model")
-    tokenizer.save_pretrained("../model")
+    if not training_args.should_save:
+        return
+    model.save_pretrained(args.output_dir)
+    tokenizer.save_pretrained(args.output_dir)
 
     # Optionally push to Hugging Face Hub
     if os.getenv("HF_TOKEN"):